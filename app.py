@@ -2,13 +2,13 @@
 Flask Web Application for Telegram Bot Admin
 """
 import os
+import hmac
 import logging
 import threading
-import pandas as pd
-from flask import Flask, render_template, request, redirect, url_for, session, flash, send_file, jsonify
+import multiprocessing
+from flask import Flask, render_template, request, redirect, url_for, session, flash, send_file, jsonify, Response, stream_with_context
 from werkzeug.utils import secure_filename
 from functools import wraps
-from io import BytesIO, StringIO
 from datetime import datetime
 import config
 import tempfile
@@ -20,9 +20,16 @@ from database import db
 from bot_handler import bot, run_bot_forever, send_bulk_by_chatids, send_template_to_selected, send_personalized_from_rows, send_personalized_from_template, request_phone_number
 
 # Import optimization modules
-from task_queue import get_task_queue, update_task_progress
-from excel_processor import ExcelProcessor
-from message_sender import send_personalized_from_template_optimized, send_bulk_optimized
+from task_queue import get_task_queue, campaign_timeout, campaign_size_priority, PRIORITY_HIGH, PRIORITY_LOW, PRIORITY_NAMES
+from excel_processor import ExcelProcessor, XlsxExportWriter, CsvExportWriter, get_upload_cache, UPLOAD_EXTENSIONS
+from cpu_pool import run_cpu_bound
+from progress_events import stream_task_events, get_stream_slots
+from campaign_scheduler import get_campaign_scheduler
+from bot_webhook import WEBHOOK_ROUTE, SECRET_HEADER, webhook_secret, parse_update, configure_webhook
+from update_dispatcher import get_update_dispatcher
+from reply_cooldown import get_reply_cooldown
+from bot_health import get_bot_health
+import campaign_tasks  # Registers durable task types
 
 # Configure Logging
 logging.basicConfig(filename=LOG_FILE, level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -33,9 +40,25 @@ app.secret_key = os.getenv("FLASK_SECRET_KEY", "super_secret_key_change_this")
 ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD", "admin123")  # Default password
 
 # Start Bot Thread
-if not os.environ.get("WERKZEUG_RUN_MAIN"):  # Prevent double start in debug mode
-    bot_thread = threading.Thread(target=run_bot_forever, daemon=True)
-    bot_thread.start()
+# Prevent double start in debug mode, and in CPU pool processes that re-import this module
+if not os.environ.get("WERKZEUG_RUN_MAIN") and multiprocessing.parent_process() is None:
+    if config.BOT_MODE == "webhook":
+        # Updates arrive on telegram_webhook in every web worker
+        configure_webhook(bot)
+        get_update_dispatcher()
+    else:
+        bot_thread = threading.Thread(target=run_bot_forever, daemon=True)
+        bot_thread.start()
+    
+    # Cache the bot identity and keep checking that Telegram answers
+    get_bot_health()
+    
+    # Start the campaign scheduler so stored schedules fire after a restart
+    if config.SCHEDULER_ENABLED:
+        try:
+            get_campaign_scheduler()
+        except Exception as e:
+            logger.error(f"Campaign scheduler failed to start: {e}")
 
 # Login Decorator
 def login_required(f):
@@ -46,6 +69,53 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def requested_priority():
+    """Priority chosen on the send form, or None when left on auto"""
+    requested = request.form.get('priority', 'auto')
+    if requested in PRIORITY_NAMES:
+        return PRIORITY_NAMES[requested]
+    if request.form.get('send_at') == 'off_peak':
+        return PRIORITY_LOW
+    return None
+
+def campaign_priority(recipient_count):
+    """Priority chosen on the send form, or picked from campaign size when left on auto"""
+    priority = requested_priority()
+    return priority if priority is not None else campaign_size_priority(recipient_count)
+
+def requested_schedule():
+    """
+    When the send form asks to send later
+    
+    Returns:
+        (run_at UTC, cron expression or None), or None to send now
+        
+    Raises:
+        ValueError: If the time or cron expression is invalid
+    """
+    send_at = request.form.get('send_at', 'now')
+    if send_at == 'now':
+        return None
+    if not config.SCHEDULER_ENABLED:
+        raise ValueError("Scheduled sending is disabled")
+    scheduler = get_campaign_scheduler()
+    if send_at == 'at':
+        run_at = scheduler.to_utc(datetime.fromisoformat(request.form.get('run_at', '')))
+        return run_at, None
+    if send_at == 'cron':
+        cron = request.form.get('cron', '').strip()
+        return scheduler.next_cron_run(cron), cron
+    if send_at == 'off_peak':
+        return scheduler.next_off_peak(), None
+    raise ValueError(f"Unknown send time: {send_at}")
+
+def format_schedule_time(utc_time):
+    """Show a UTC schedule time in the scheduler's time zone"""
+    if utc_time is None:
+        return '-'
+    local = get_campaign_scheduler().to_local(utc_time)
+    return f"{local:%Y-%m-%d %H:%M} {config.SCHEDULER_TIMEZONE}"
+
 @app.route('/', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
@@ -62,24 +132,39 @@ def logout():
     session.pop('logged_in', None)
     return redirect(url_for('login'))
 
+@app.route(WEBHOOK_ROUTE, methods=['POST'])
+def telegram_webhook():
+    """Receive a bot update from Telegram and queue it on its chat's dispatcher lane"""
+    if config.BOT_MODE != "webhook":
+        return '', 404
+    if not hmac.compare_digest(request.headers.get(SECRET_HEADER, ''), webhook_secret()):
+        logger.warning(f"Webhook request with a wrong secret token from {request.remote_addr}")
+        return '', 403
+    
+    try:
+        update = parse_update(request.get_data(as_text=True))
+    except Exception as e:
+        logger.warning(f"Unparseable webhook update: {e}")
+        return '', 400
+    
+    # Full lane: Telegram retries the update later
+    if not get_update_dispatcher().dispatch(update, block=False):
+        return '', 503
+    return '', 200
+
 @app.route('/dashboard')
 @login_required
 def dashboard():
     users = db.get_users_simple()
     user_count = len(users)
     
-    # Get bot info
-    try:
-        bot_info = bot.get_me()
-        bot_name = bot_info.first_name
-        bot_username = bot_info.username
-        bot_status = "Online"
-    except:
-        bot_name = "Unknown"
-        bot_username = "Unknown"
-        bot_status = "Offline"
+    # Bot info from the background health probe (no Telegram call here)
+    bot_state = get_bot_health().get_state()
+    bot_name = bot_state['bot_name'] or "Unknown"
+    bot_username = bot_state['bot_username'] or "Unknown"
 
-    return render_template('dashboard.html', user_count=user_count, bot_name=bot_name, bot_username=bot_username, bot_status=bot_status)
+    return render_template('dashboard.html', user_count=user_count, bot_name=bot_name, bot_username=bot_username,
+                           bot_status=bot_state['status'], bot_state=bot_state)
 
 @app.route('/users')
 @login_required
@@ -238,34 +323,23 @@ def export_settings():
 @login_required
 def export_analytics():
     """Export analytics data as CSV"""
-    import csv
-    from io import StringIO
-
-    # Get user data
-    users = db.get_users_simple()
+    def fmt(value):
+        return value.strftime('%Y-%m-%d %H:%M:%S') if value else ''
 
-    # Create CSV
-    output = StringIO()
-    writer = csv.writer(output)
-    writer.writerow(['Chat ID', 'Name', 'Joined At', 'Last Activity', 'Message Count', 'Status'])
-
-    for user in users:
-        writer.writerow([
-            user[0],  # chat_id
-            user[1],  # name
-            user[2].strftime('%Y-%m-%d %H:%M:%S') if user[2] else '',  # joined_at
-            user[3].strftime('%Y-%m-%d %H:%M:%S') if user[3] else '',  # last_activity
-            user[4],  # message_count
-            user[5]   # status
-        ])
-
-    output.seek(0)
-    return send_file(
-        output,
-        mimetype='text/csv',
-        as_attachment=True,
-        download_name=f'analytics_export_{datetime.utcnow().strftime("%Y%m%d_%H%M%S")}.csv'
+    batches = db.iter_user_batches(
+        ['chat_id', 'name', 'joined_at', 'last_activity_at', 'message_count', 'status'],
+        sort=('last_activity_at', -1)
     )
+    with CsvExportWriter(['Chat ID', 'Name', 'Joined At', 'Last Activity', 'Message Count', 'Status']) as writer:
+        for batch in batches:
+            writer.write_rows(
+                (u['chat_id'], u.get('name', ''), fmt(u.get('joined_at')), fmt(u.get('last_activity_at')),
+                 u.get('message_count', 0), u.get('status', 'unknown'))
+                for u in batch
+            )
+
+    return send_export(writer, f'analytics_export_{datetime.utcnow().strftime("%Y%m%d_%H%M%S")}.csv',
+                       mimetype='text/csv')
 
 @app.route('/api/analytics/message_stats')
 @login_required
@@ -286,8 +360,8 @@ def api_message_stats():
             'successful_sends': db_stats['total_sent'],
             'failed_sends': db_stats['total_failed'],
             'total_users': user_count,
-            'active_tasks': sum(1 for t in task_queue.results.values() if t.status == 'running'),
-            'pending_tasks': sum(1 for t in task_queue.results.values() if t.status == 'pending'),
+            'active_tasks': task_queue.status_counts['running'],
+            'pending_tasks': task_queue.status_counts['pending'],
         }
         
         return jsonify(data)
@@ -303,57 +377,45 @@ def api_message_stats():
             'error': str(e)
         }), 500
 
+def send_export(writer, download_name, mimetype=None):
+    """Finish an export writer and send its temp file from disk"""
+    path = writer.close()
+    response = send_file(path, download_name=download_name, as_attachment=True, mimetype=mimetype)
+    # Werkzeug skips close callbacks for passthrough responses; the file is still streamed in blocks
+    response.direct_passthrough = False
+    
+    def remove_export():
+        # Runs after the response closed its file handle (required on Windows)
+        try:
+            os.remove(path)
+        except OSError as e:
+            logger.warning(f"Could not remove export file {path}: {e}")
+    
+    response.call_on_close(remove_export)
+    return response
+
 @app.route('/export')
 @login_required
 def export_users():
-    users = db.get_users_simple()
-    df = pd.DataFrame(users, columns=['chat_id', 'name'])
+    with XlsxExportWriter(['chat_id', 'name'], 'Users') as writer:
+        for batch in db.iter_user_batches(['chat_id', 'name'], sort=('last_activity_at', -1)):
+            writer.write_rows((u['chat_id'], u.get('name', '')) for u in batch)
     
-    output = BytesIO()
-    writer = pd.ExcelWriter(output, engine='openpyxl')
-    df.to_excel(writer, index=False, sheet_name='Users')
-    writer.close()
-    output.seek(0)
-    
-    return send_file(output, download_name="users_export.xlsx", as_attachment=True)
+    return send_export(writer, "users_export.xlsx")
 
 @app.route('/export/phones')
 @login_required
 def export_users_with_phones():
     """Export users with phone numbers to Excel"""
-    users = db.get_users_with_phones()
-    
-    # Prepare data for DataFrame
-    data = []
-    for chat_id, name, phone, phone_verified_at, joined_at in users:
-        # Only include users with phone numbers
-        if phone:
-            data.append({
-                'Chat ID': chat_id,
-                'Phone Number': phone
-            })
-    
-    df = pd.DataFrame(data)
-    
-    # Create Excel file
-    output = BytesIO()
-    writer = pd.ExcelWriter(output, engine='openpyxl')
-    df.to_excel(writer, index=False, sheet_name='Users with Phones')
-    
-    # Auto-adjust column widths
-    worksheet = writer.sheets['Users with Phones']
-    for idx, col in enumerate(df.columns):
-        max_length = max(
-            df[col].astype(str).apply(len).max(),
-            len(col)
-        ) + 2
-        worksheet.column_dimensions[chr(65 + idx)].width = max_length
-    
-    writer.close()
-    output.seek(0)
+    # Only users with phone numbers, with auto-adjusted column widths
+    batches = db.iter_user_batches(['chat_id', 'phone_number'],
+                                   query={'phone_number': {'$nin': [None, '']}})
+    with XlsxExportWriter(['Chat ID', 'Phone Number'], 'Users with Phones', autosize=True) as writer:
+        for batch in batches:
+            writer.write_rows((u['chat_id'], u['phone_number']) for u in batch)
     
     filename = f"users_phones_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.xlsx"
-    return send_file(output, download_name=filename, as_attachment=True)
+    return send_export(writer, filename)
 
 @app.route('/users/request_missing_phones', methods=['POST'])
 @login_required
@@ -398,31 +460,35 @@ def send_message():
             target_type = request.form.get('target_type')
             
             if target_type == 'all':
-                # Submit background task for bulk sending
-                users = db.get_users_simple()
-                chat_ids = [u[0] for u in users]
+                try:
+                    when = requested_schedule()
+                except ValueError as e:
+                    flash(f"Invalid schedule: {e}", 'danger')
+                    return render_template('send.html')
+                if when is not None:
+                    # Recipients (and, on auto, the priority) are resolved when the schedule fires
+                    run_at, cron = when
+                    get_campaign_scheduler().schedule("bulk_send", {'template': template},
+                                                      run_at=run_at, cron=cron, audience="all_users",
+                                                      priority=requested_priority(),
+                                                      name=f"Broadcast: {template[:40]}")
+                    flash(f"Broadcast scheduled for {format_schedule_time(run_at)}"
+                          f"{f', repeating {cron}' if cron else ''}.", 'info')
+                    return redirect(url_for('schedules'))
                 
+                # Submit background task for bulk sending
+                try:
+                    chat_ids = db.get_all_chat_ids()
+                except Exception as e:
+                    logger.error(f"Failed to load broadcast recipients: {e}")
+                    flash("Could not load the user list; nothing was sent", 'danger')
+                    return render_template('send.html')
                 task_id = str(uuid.uuid4())
                 task_queue = get_task_queue()
-                
-                def run_bulk_send(curr_task_id=task_id, cids=chat_ids, msg=template):
-                    """Wrapper for bulk send with progress"""
-                    def progress(current, total):
-                        pct = int((current / total) * 100)
-                        update_task_progress(curr_task_id, pct, f"Sending {current}/{total}")
-                        
-                    result = send_bulk_optimized(
-                        cids, 
-                        msg, 
-                        delay=config.SEND_DELAY,
-                        progress_callback=progress
-                    )
-                    
-                    # Persist stats to database
-                    db.update_system_stats(sent=result['sent'], failed=result['failed'])
-                    return result
-
-                task_queue.submit_task(task_id, run_bulk_send)
+                task_queue.submit_registered(task_id, "bulk_send", {
+                    'chat_ids': chat_ids,
+                    'template': template,
+                }, priority=campaign_priority(len(chat_ids)), timeout=campaign_timeout(len(chat_ids)))
                 
                 flash(f"Message send started in background (Task ID: {task_id[:8]}). Check status in dashboard.", 'info')
                 return redirect(url_for('task_status', task_id=task_id))
@@ -438,8 +504,10 @@ def send_message():
                 return render_template('send.html')
             
             try:
-                # Validate Excel file first (lightweight operation)
-                preview_result = ExcelProcessor.get_excel_preview(file_path)
+                # Validate against the preview cached at upload; re-read only if unknown
+                preview_result = get_upload_cache().get_preview(file_path)
+                if preview_result is None:
+                    preview_result = run_cpu_bound(ExcelProcessor.get_excel_preview, file_path)
                 if 'error' in preview_result:
                     flash(f"Error: {preview_result['error']}", 'danger')
                     return render_template('send.html')
@@ -455,46 +523,32 @@ def send_message():
                         flash(f"Column '{col}' not found in file", 'danger')
                         return render_template('send.html')
                 
+                row_count = preview_result.get('row_count', 0)
+                when = requested_schedule()
+                if when is not None:
+                    run_at, cron = when
+                    if cron:
+                        flash("Excel uploads can only be scheduled once; use 'All Users' for recurring sends", 'danger')
+                        return render_template('send.html')
+                    get_campaign_scheduler().schedule("excel_send", {
+                        'file_path': file_path,
+                        'target_column': target_column,
+                        'custom_columns': custom_columns,
+                        'template': template,
+                    }, run_at=run_at, priority=campaign_priority(row_count), timeout=campaign_timeout(row_count),
+                       name=f"Excel ({row_count} rows): {template[:40]}")
+                    flash(f"Excel send of {row_count} rows scheduled for {format_schedule_time(run_at)}.", 'info')
+                    return redirect(url_for('schedules'))
+                
                 # Submit background task for Excel processing and sending
                 task_id = str(uuid.uuid4())
                 task_queue = get_task_queue()
-                
-                def process_and_send_excel(curr_task_id=task_id):
-                    """Background task for Excel processing and sending"""
-                    try:
-                        # Read and prepare rows
-                        update_task_progress(curr_task_id, 5, "Reading Excel file...")
-                        df = ExcelProcessor.read_excel_chunked(file_path)
-                        
-                        update_task_progress(curr_task_id, 10, "Preparing data...")
-                        rows = ExcelProcessor.prepare_personalized_rows(
-                            df, target_column, custom_columns
-                        )
-                        
-                        def progress(current, total):
-                            # Scale progress from 10% to 100%
-                            pct = 10 + int((current / total) * 90)
-                            update_task_progress(curr_task_id, pct, f"Sending {current}/{total}")
-
-                        # Send with progress tracking
-                        result = send_personalized_from_template_optimized(
-                            template, rows, 
-                            delay=config.SEND_DELAY,
-                            progress_callback=progress
-                        )
-                        
-                        # Persist stats to database
-                        db.update_system_stats(sent=result['sent'], failed=result['failed'])
-                        
-                        return result
-                    finally:
-                        # Clean up temp file
-                        try:
-                            os.remove(file_path)
-                        except:
-                            pass
-                
-                task_queue.submit_task(task_id, process_and_send_excel)
+                task_queue.submit_registered(task_id, "excel_send", {
+                    'file_path': file_path,
+                    'target_column': target_column,
+                    'custom_columns': custom_columns,
+                    'template': template,
+                }, priority=campaign_priority(row_count), timeout=campaign_timeout(row_count))
                 flash(f"Excel processing started in background (Task ID: {task_id[:8]}). Processing {preview_result.get('row_count', 'N/A')} rows.", 'info')
                 return redirect(url_for('task_status', task_id=task_id))
                     
@@ -507,28 +561,32 @@ def send_message():
 @app.route('/preview-excel', methods=['POST'])
 @login_required
 def preview_excel():
-    """Preview Excel file and return column names and sample data"""
+    """Preview an uploaded .xlsx, .csv, .tsv or .parquet file and return column names and sample data"""
     try:
         if 'file' not in request.files:
             return jsonify({'error': 'No file provided'}), 400
         
         file = request.files['file']
         
-        if not file or not file.filename.endswith('.xlsx'):
-            return jsonify({'error': 'Please upload an .xlsx file'}), 400
+        extension = os.path.splitext(file.filename or '')[1].lower()
+        if not file or extension not in UPLOAD_EXTENSIONS:
+            return jsonify({'error': f"Please upload one of: {', '.join(UPLOAD_EXTENSIONS)}"}), 400
         
-        # Save to temporary file
-        temp_fd, temp_path = tempfile.mkstemp(suffix='.xlsx')
+        # Save to temporary file; the extension selects the reader
+        temp_fd, temp_path = tempfile.mkstemp(suffix=extension)
         os.close(temp_fd)
         file.save(temp_path)
         
-        # Use optimized Excel processor
-        result = ExcelProcessor.get_excel_preview(temp_path)
+        # Read the header and first rows in the CPU pool
+        result = run_cpu_bound(ExcelProcessor.get_excel_preview, temp_path)
         
         if 'error' in result:
             os.remove(temp_path)
             return jsonify({'error': result['error']}), 400
         
+        # Keep the preview so /send and the send task do not parse it again
+        get_upload_cache().put_preview(temp_path, result)
+        
         result['file_path'] = temp_path
         return jsonify(result)
     
@@ -536,6 +594,39 @@ def preview_excel():
         logger.error(f"Error previewing Excel file: {e}")
         return jsonify({'error': f'Error reading file: {str(e)}'}), 400
 
+@app.route('/api/dry-run', methods=['POST'])
+@login_required
+def api_dry_run():
+    """Queue a dry run that resolves every target and renders every message of an uploaded campaign"""
+    file_path = request.form.get('file_path')
+    target_column = request.form.get('target_column')
+    custom_columns = request.form.getlist('custom_columns')
+    template = request.form.get('template')
+    
+    if not file_path or not target_column or not template:
+        return jsonify({'error': 'Missing required fields: file path, target column, or template'}), 400
+    
+    preview = get_upload_cache().get_preview(file_path)
+    if preview is None:
+        return jsonify({'error': 'Upload not found; please preview the file again'}), 404
+    for col in [target_column] + custom_columns:
+        if col not in preview['columns']:
+            return jsonify({'error': f"Column '{col}' not found in file"}), 400
+    
+    # Target lookups hit the database; keep them off the request thread. Dry runs
+    # send nothing, so repeated clicks must not count as a submission loop
+    task_id = str(uuid.uuid4())
+    try:
+        get_task_queue().submit_registered(task_id, "dry_run", {
+            'file_path': file_path,
+            'target_column': target_column,
+            'custom_columns': custom_columns,
+            'template': template,
+        }, priority=PRIORITY_HIGH, trusted=True)
+    except RuntimeError as e:
+        return jsonify({'error': str(e)}), 503
+    return jsonify({'task_id': task_id}), 202
+
 @app.route('/task-status/<task_id>')
 @login_required
 def task_status(task_id):
@@ -554,18 +645,93 @@ def api_task_status(task_id):
     
     return jsonify(result.to_dict())
 
+def event_stream_response(task_id=None):
+    """Wrap a progress event stream in an SSE response, or 503 when all stream slots are taken"""
+    slots = get_stream_slots()
+    if not slots.acquire():
+        # EventSource gives up on a failed first connect and the page polls instead
+        logger.warning(f"Refused progress stream: {slots.limit} streams already open")
+        return Response("Too many open progress streams", status=503, headers={'Retry-After': '30'})
+    events = stream_task_events(get_task_queue(), task_id)
+    response = Response(stream_with_context(events), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',  # Disable proxy buffering
+    })
+    response.call_on_close(slots.release)
+    return response
+
+@app.route('/api/task-events/<task_id>')
+@login_required
+def api_task_events(task_id):
+    """SSE stream of progress for one task (polling /api/task-status/<id> is the fallback)"""
+    return event_stream_response(task_id)
+
+@app.route('/api/task-events')
+@login_required
+def api_dashboard_events():
+    """SSE stream of task changes and queue health for the dashboard"""
+    return event_stream_response()
+
+@app.route('/api/task/<task_id>/<action>', methods=['POST'])
+@login_required
+def api_task_control(task_id, action):
+    """Cancel, pause or resume a background task"""
+    task_queue = get_task_queue()
+    handlers = {
+        'cancel': task_queue.cancel_task,
+        'pause': task_queue.pause_task,
+        'resume': task_queue.resume_task,
+    }
+    if action not in handlers:
+        return jsonify({'error': f'Unknown action: {action}'}), 400
+    
+    if not handlers[action](task_id):
+        status = task_queue.get_status(task_id).status
+        return jsonify({'error': f'Cannot {action} task in status {status}'}), 409
+    
+    logger.info(f"Task {task_id}: {action} requested by admin")
+    return jsonify({'success': True, 'task': task_queue.get_status(task_id).to_dict()})
+
+@app.route('/schedules')
+@login_required
+def schedules():
+    """Scheduled and recurring campaigns"""
+    if not config.SCHEDULER_ENABLED:
+        flash('Scheduled sending is disabled', 'info')
+        return redirect(url_for('send_message'))
+    scheduler = get_campaign_scheduler()
+    return render_template('schedules.html',
+                         schedules=scheduler.list_schedules(),
+                         stats=scheduler.get_stats(),
+                         format_time=format_schedule_time)
+
+@app.route('/api/schedules/<schedule_id>/<action>', methods=['POST'])
+@login_required
+def api_schedule_control(schedule_id, action):
+    """Cancel, pause or resume a scheduled campaign"""
+    scheduler = get_campaign_scheduler()
+    handlers = {
+        'cancel': scheduler.cancel,
+        'pause': scheduler.pause,
+        'resume': scheduler.resume,
+    }
+    if action not in handlers:
+        return jsonify({'error': f'Unknown action: {action}'}), 400
+    
+    if not handlers[action](schedule_id):
+        return jsonify({'error': f'Cannot {action} this schedule'}), 409
+    
+    logger.info(f"Schedule {schedule_id}: {action} requested by admin")
+    return jsonify({'success': True})
+
 @app.route('/api/task-status')
 @login_required
 def api_recent_tasks():
     """API endpoint for recent tasks list"""
     task_queue = get_task_queue()
     
-    # Get all tasks and sort by creation time (newest first)
-    all_tasks = list(task_queue.results.values())
-    all_tasks.sort(key=lambda t: t.created_at, reverse=True)
-    
-    # Return last 10 tasks
-    recent_tasks = [task.to_dict() for task in all_tasks[:10]]
+    # Return last 10 tasks (newest first), shared across web workers
+    recent_tasks = [task.to_dict() for task in task_queue.recent_tasks(10)]
     
     return jsonify(recent_tasks)
 
@@ -620,7 +786,12 @@ def view_logs():
 def queue_health():
     """Get task queue health status"""
     queue = get_task_queue()
-    return jsonify(queue.get_health_status())
+    health = queue.get_health_status()
+    health['bot_mode'] = config.BOT_MODE
+    health['updates'] = get_update_dispatcher().get_stats()
+    health['auto_replies'] = get_reply_cooldown().get_stats()
+    health['bot'] = get_bot_health().get_state()
+    return jsonify(health)
 
 @app.route('/api/queue/pause', methods=['POST'])
 @login_required
@@ -2,20 +2,32 @@
 Telegram bot handlers and message processing
 """
 import telebot
-from telebot import types
+from telebot import types, apihelper
+import os
 import logging
 import time
 from functools import wraps
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
-from config import TELEGRAM_TOKEN, WELCOME_MESSAGE, SEND_DELAY
+from config import TELEGRAM_TOKEN, TELEGRAM_API_URL, WELCOME_MESSAGE, SEND_DELAY
 from database import db
+from reply_cooldown import get_reply_cooldown
 
 logger = logging.getLogger("telegram_app.bot")
 
+# Talk to another Bot API server (e.g. fake_telegram_api.py for load tests)
+if TELEGRAM_API_URL:
+    apihelper.API_URL = TELEGRAM_API_URL.rstrip('/') + "/bot{0}/{1}"
+    apihelper.FILE_URL = TELEGRAM_API_URL.rstrip('/') + "/file/bot{0}/{1}"
+    logger.info(f"Using Bot API server at {TELEGRAM_API_URL}")
+
 # Initialize bot with resilient connection settings
-bot = telebot.TeleBot(TELEGRAM_TOKEN, parse_mode="HTML")
+# Handlers run inline on the update dispatcher's per-chat lanes (update_dispatcher.py)
+bot = telebot.TeleBot(TELEGRAM_TOKEN, parse_mode="HTML", threaded=False)
+
+# Offset of the next update to fetch in polling mode (None = skip pending updates)
+_poll_offset = None
 
 # Configure session with retry strategy for better connection handling
 if not hasattr(bot, 'session') or bot.session is None:
@@ -65,6 +77,68 @@ def request_phone_number(chat_id):
         logger.error(f"Failed to request phone number from {chat_id}: {e}")
 
 
+def message_activity(message, has_phone):
+    """
+    Activity the handlers record for a message, or None if no handler takes it
+
+    Args:
+        message: Incoming message
+        has_phone: Whether the sender has a saved phone number
+    """
+    if message.content_type == 'contact':
+        return "contact_shared"
+    if message.content_type != 'text':
+        return None
+    # /start without a phone number is caught by phone_required as a plain message
+    if has_phone and telebot.util.extract_command(message.text) == "start":
+        return "start"
+    return "message"
+
+
+def prepare_update_batch(updates):
+    """
+    Do the database work of a polled batch of updates up front
+
+    Looks up the phone status of every sender with one $in query and records
+    every message's activity with one bulk write, so a burst costs two round
+    trips instead of a few per message. The results are attached to each
+    message (batch_has_phone, batch_activity_recorded) for the handlers;
+    messages without them, or a batch whose database work failed, are handled
+    with per-message queries as before.
+
+    Args:
+        updates: Updates from one getUpdates call, in order
+    """
+    messages = [update.message for update in updates if update.message is not None]
+    if not messages:
+        return
+
+    with_phone = db.get_chat_ids_with_phone([message.chat.id for message in messages])
+    if with_phone is None:
+        return
+
+    activities = []
+    for message in messages:
+        chat_id = message.chat.id
+        message.batch_has_phone = chat_id in with_phone
+        activity = message_activity(message, message.batch_has_phone)
+        if activity is not None:
+            activities.append((chat_id, message.from_user.first_name or "", activity))
+        # A user's own contact saves their phone for their later messages in the batch
+        if activity == "contact_shared" and message.contact.user_id == message.from_user.id:
+            with_phone.add(chat_id)
+
+    if db.record_activities(activities):
+        for message in messages:
+            message.batch_activity_recorded = True
+
+
+def _record_activity(message, activity_type):
+    """Record a message's activity unless its batch already did"""
+    if not getattr(message, 'batch_activity_recorded', False):
+        db.add_or_update_user(message.chat.id, message.from_user.first_name or "", activity_type)
+
+
 def phone_required(handler_func):
     """
     Decorator to check if user has phone number before processing
@@ -75,13 +149,16 @@ def phone_required(handler_func):
         chat_id = message.chat.id
         
         # Check if user has phone number
-        if not db.has_phone_number(chat_id):
+        has_phone = getattr(message, 'batch_has_phone', None)
+        if has_phone is None:
+            has_phone = db.has_phone_number(chat_id)
+        if not has_phone:
             # Ensure user exists in database first
-            name = message.from_user.first_name or ""
-            db.add_or_update_user(chat_id, name, "message")
+            _record_activity(message, "message")
             
-            # Request phone number
-            request_phone_number(chat_id)
+            # Request phone number (plain messages at most once per cooldown window)
+            if telebot.util.is_command(message.text) or get_reply_cooldown().allow(chat_id):
+                request_phone_number(chat_id)
             return  # Don't process the original handler
         
         # User has phone number, proceed with handler
@@ -98,10 +175,9 @@ def handle_contact(message):
     """
     try:
         chat_id = message.chat.id
-        name = message.from_user.first_name or ""
         
         # Ensure user exists in database
-        db.add_or_update_user(chat_id, name, "contact_shared")
+        _record_activity(message, "contact_shared")
         
         # Check if contact is user's own phone number
         if message.contact.user_id == message.from_user.id:
@@ -143,7 +219,7 @@ def on_start(message):
     try:
         chat_id = message.chat.id
         name = message.from_user.first_name or ""
-        db.add_or_update_user(chat_id, name, "start")
+        _record_activity(message, "start")
         bot.send_message(chat_id, WELCOME_MESSAGE)
         logger.info(f"New/updated user: {chat_id} | {name}")
     except Exception as e:
@@ -159,14 +235,45 @@ def on_message(message):
     """
     try:
         chat_id = message.chat.id
-        name = message.from_user.first_name or ""
-        db.add_or_update_user(chat_id, name, "message")
-        bot.send_message(chat_id, WELCOME_MESSAGE)
+        _record_activity(message, "message")
+        # Chatty users get one welcome per cooldown window
+        if get_reply_cooldown().allow(chat_id):
+            bot.send_message(chat_id, WELCOME_MESSAGE)
     except Exception as e:
         logger.exception(f"Error in message handler: {e}")
 
 
 
+def poll_updates(timeout=30, long_polling_timeout=60):
+    """
+    Long-poll Telegram and hand updates to the per-chat dispatcher
+
+    Each batch's database work is done up front (prepare_update_batch).
+    Dispatching blocks while a chat's lane is full, so a backlog slows
+    polling down instead of growing without bound. Updates already
+    dispatched are not fetched again after a reconnect.
+
+    Raises:
+        Connection and API errors from getUpdates (handled by run_bot_forever)
+    """
+    global _poll_offset
+    from update_dispatcher import get_update_dispatcher
+    dispatcher = get_update_dispatcher()
+
+    if _poll_offset is None:
+        # Skip updates that piled up while the bot was down
+        pending = bot.get_updates(offset=-1, timeout=1, long_polling_timeout=1)
+        _poll_offset = pending[-1].update_id + 1 if pending else 0
+
+    while os.environ.get('STOP_BOT') != '1':
+        updates = bot.get_updates(offset=_poll_offset, timeout=timeout,
+                                  long_polling_timeout=long_polling_timeout)
+        prepare_update_batch(updates)
+        for update in updates:
+            dispatcher.dispatch(update)
+            _poll_offset = update.update_id + 1
+
+
 def run_bot_forever():
     """Run bot with resilient polling loop and connection retry logic"""
     retry_count = 0
@@ -192,12 +299,7 @@ def run_bot_forever():
             logger.info(f"Starting bot polling... (retry: {retry_count})")
             # Reset retry count on successful connection
             retry_count = 0
-            bot.infinity_polling(
-                timeout=30,
-                long_polling_timeout=60,
-                skip_pending=True,
-                allowed_updates=None
-            )
+            poll_updates(timeout=30, long_polling_timeout=60)
         except (ConnectionError, requests.exceptions.ConnectionError, requests.exceptions.ReadTimeout) as e:
             # Handle connection errors with exponential backoff
             retry_count = min(retry_count + 1, max_retries)
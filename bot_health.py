@@ -0,0 +1,155 @@
+"""
+Cached bot identity and background getMe health probe
+Pages read the last probe result instead of calling Telegram, so they
+render at once even when the Bot API is slow or unreachable
+"""
+import time
+import logging
+import threading
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+import config
+
+logger = logging.getLogger("telegram_app.bot_health")
+
+STATUS_CHECKING = "Checking"
+STATUS_ONLINE = "Online"
+STATUS_OFFLINE = "Offline"
+
+# Global probe instance
+_bot_health = None
+
+
+def _redact_token(message: str) -> str:
+    """Hide the bot token that request errors include in their URL"""
+    token = config.TELEGRAM_TOKEN
+    if token and token in message:
+        message = message.replace(token, token.split(':')[0] + ":{TOKEN}")
+    return message
+
+
+class BotHealthProbe:
+    """
+    Calls getMe every interval on a background thread and keeps the result
+
+    The bot's identity from the last successful call stays cached while
+    later calls fail, so the dashboard can still name the bot it reports
+    offline.
+    """
+
+    def __init__(self, get_me: Callable, interval: float = 60):
+        """
+        Initialize probe
+
+        Args:
+            get_me: Callable returning the bot User (bot.get_me)
+            interval: Seconds between probes
+        """
+        self.get_me = get_me
+        self.interval = interval
+        self.running = False
+        self._thread: Optional[threading.Thread] = None
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+
+        self.bot_id: Optional[int] = None
+        self.bot_name: Optional[str] = None
+        self.bot_username: Optional[str] = None
+        self.online: Optional[bool] = None
+        self.last_latency_ms: Optional[float] = None
+        self.last_success_at: Optional[datetime] = None
+        self.last_error: Optional[str] = None
+        self.last_error_at: Optional[datetime] = None
+        self.consecutive_failures = 0
+        self.checks = 0
+
+    def start(self):
+        """Start probing; the first probe runs immediately"""
+        if self.running:
+            return
+        self.running = True
+        self._thread = threading.Thread(target=self._probe_loop, daemon=True, name="BotHealthProbe")
+        self._thread.start()
+        logger.info(f"Bot health probe started (every {self.interval}s)")
+
+    def stop(self):
+        """Stop probing"""
+        self.running = False
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _probe_loop(self):
+        while self.running:
+            self.probe()
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def probe(self) -> bool:
+        """
+        Call getMe once and record the outcome
+
+        Returns:
+            True if getMe succeeded
+        """
+        start = time.perf_counter()
+        try:
+            me = self.get_me()
+        except Exception as e:
+            latency_ms = (time.perf_counter() - start) * 1000
+            error = _redact_token(str(e))
+            with self._lock:
+                self.checks += 1
+                self.online = False
+                self.last_latency_ms = round(latency_ms, 1)
+                self.last_error = error
+                self.last_error_at = datetime.utcnow()
+                self.consecutive_failures += 1
+                failures = self.consecutive_failures
+            logger.warning(f"getMe failed after {latency_ms:.0f} ms ({failures} in a row): {error}")
+            return False
+
+        latency_ms = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self.checks += 1
+            self.online = True
+            self.bot_id = me.id
+            self.bot_name = me.first_name
+            self.bot_username = me.username
+            self.last_latency_ms = round(latency_ms, 1)
+            self.last_success_at = datetime.utcnow()
+            self.consecutive_failures = 0
+        return True
+
+    def get_state(self) -> Dict:
+        """Get the cached identity and last probe results"""
+        with self._lock:
+            if self.online is None:
+                status = STATUS_CHECKING
+            else:
+                status = STATUS_ONLINE if self.online else STATUS_OFFLINE
+            return {
+                'status': status,
+                'bot_id': self.bot_id,
+                'bot_name': self.bot_name,
+                'bot_username': self.bot_username,
+                'last_latency_ms': self.last_latency_ms,
+                'last_success_at': self.last_success_at.isoformat() if self.last_success_at else None,
+                'last_error': self.last_error,
+                'last_error_at': self.last_error_at.isoformat() if self.last_error_at else None,
+                'consecutive_failures': self.consecutive_failures,
+                'checks': self.checks,
+                'interval_seconds': self.interval,
+            }
+
+
+def get_bot_health() -> BotHealthProbe:
+    """Get or create (and start) the global bot health probe"""
+    global _bot_health
+    if _bot_health is None:
+        from bot_handler import bot
+        _bot_health = BotHealthProbe(bot.get_me, interval=config.BOT_HEALTH_INTERVAL)
+        _bot_health.start()
+    return _bot_health
@@ -0,0 +1,60 @@
+"""
+Webhook delivery of bot updates
+Telegram POSTs each update to a Flask route; the route checks the secret
+token and queues the update on the per-chat dispatcher, so the request
+returns at once and every web worker handles its share of updates
+"""
+import hashlib
+import logging
+
+from telebot import types
+
+import config
+
+logger = logging.getLogger("telegram_app.webhook")
+
+# Route Telegram delivers updates to
+WEBHOOK_ROUTE = "/telegram/webhook"
+
+# Header carrying the secret token given to setWebhook
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+def webhook_secret() -> str:
+    """
+    Secret token Telegram sends with every webhook request
+
+    WEBHOOK_SECRET if set, otherwise derived from the bot token so every
+    web worker agrees on it without extra configuration.
+    """
+    if config.WEBHOOK_SECRET:
+        return config.WEBHOOK_SECRET
+    return hashlib.sha256(config.TELEGRAM_TOKEN.encode()).hexdigest()
+
+
+def parse_update(body: str) -> types.Update:
+    """Parse a webhook request body into a telebot Update"""
+    return types.Update.de_json(body)
+
+
+def configure_webhook(bot) -> bool:
+    """
+    Point the bot's webhook at this app
+
+    Every web worker calls this at startup; setWebhook is idempotent.
+
+    Returns:
+        True if Telegram accepted the webhook
+    """
+    if not config.WEBHOOK_URL:
+        logger.error("BOT_MODE is webhook but WEBHOOK_URL is not set; no updates will arrive")
+        return False
+
+    url = config.WEBHOOK_URL.rstrip('/') + WEBHOOK_ROUTE
+    try:
+        bot.set_webhook(url=url, secret_token=webhook_secret(),
+                        max_connections=config.WEBHOOK_MAX_CONNECTIONS)
+        logger.info(f"Webhook set to {url}")
+        return True
+    except Exception as e:
+        logger.error(f"Failed to set webhook to {url}: {e}")
+        return False
@@ -0,0 +1,204 @@
+"""
+Pre-flight dry run of uploaded campaigns
+Resolves every target in bulk and renders every message without sending,
+so unresolvable rows and broken templates show up before the rate budget
+is spent
+"""
+from itertools import islice
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import config
+from excel_processor import TARGET_CHAT_ID, TARGET_MISSING, classify_target
+from send_scheduler import get_send_scheduler
+
+# Telegram rejects longer message texts
+MAX_MESSAGE_LENGTH = 4096
+
+# Example targets kept per problem category in the report
+SAMPLE_LIMIT = 10
+
+# Rows resolved together: one exact-phone query and one chat ID query per batch
+RESOLVE_BATCH = 1000
+
+
+class TargetResolver:
+    """
+    Resolves campaign targets with the lookups the sender uses
+
+    Phone/name targets match as Database.find_users_by_phone and then
+    Database.find_users_by_name match them for message_sender, so the
+    report shows the matches a real send would get. resolve() takes a
+    batch of targets: their exact phone matches come from one query
+    (Database.find_users_by_phones), and only targets without one cost a
+    partial-phone and a name query. Each distinct target is looked up once.
+    """
+
+    def __init__(self, db):
+        """
+        Initialize resolver
+
+        Args:
+            db: Database to look targets up in
+        """
+        self.db = db
+        self._cache: Dict[str, Tuple[str, List[Tuple[int, str]]]] = {}
+
+    def resolve(self, targets: Iterable[str]):
+        """
+        Look up a batch of phone/name targets not resolved yet
+
+        Args:
+            targets: Stripped target texts of non-chat-ID rows
+        """
+        pending = [target for target in dict.fromkeys(targets) if target not in self._cache]
+        if not pending:
+            return
+        by_phone = self.db.find_users_by_phones(pending)
+        for target in pending:
+            matches = by_phone.get(target)
+            if matches:
+                self._cache[target] = ("phone", matches)
+            else:
+                self._cache[target] = ("name", self.db.find_users_by_name(target))
+
+    def lookup(self, target: str) -> Tuple[str, List[Tuple[int, str]]]:
+        """
+        Resolve a phone/name target like the sender does
+
+        Args:
+            target: Stripped target text of a non-chat-ID row
+
+        Returns:
+            Tuple of ("phone" or "name", matching (chat_id, name) tuples)
+        """
+        if target not in self._cache:
+            self.resolve([target])
+        return self._cache[target]
+
+    def count_unknown(self, chat_ids: List[int]) -> int:
+        """
+        Count chat IDs that belong to no registered user
+
+        Args:
+            chat_ids: Chat IDs of numeric targets (one batch)
+
+        Returns:
+            Number of unknown chat IDs (0 if the lookup failed)
+        """
+        known = self.db.get_registered_chat_ids(chat_ids)
+        if known is None:
+            return 0
+        return sum(1 for cid in chat_ids if cid not in known)
+
+
+def build_report(rows, template: str, resolver: TargetResolver, send_interval: float,
+                 progress_callback: Optional[Callable[[int, int], None]] = None, control=None) -> Dict:
+    """
+    Resolve and render every row of a campaign without sending
+
+    Args:
+        rows: ColumnBatch, ExcelRowStream, SpooledRows or list of row dicts with "target"
+        template: Message template with {column_name} placeholders
+        resolver: Resolves phone/name targets and checks chat IDs
+        send_interval: Expected seconds per message (see send_interval)
+        progress_callback: Optional function(current, total) called per row
+        control: Optional TaskControl, checked every RESOLVE_BATCH rows
+
+    Returns:
+        Report dict with per-category row counts, the number of messages
+        that would be sent, the estimated duration and sample targets of
+        each problem category
+    """
+    counts = {
+        'numeric': 0,
+        'unknown_chat_ids': 0,
+        'phone_matched': 0,
+        'name_matched': 0,
+        'ambiguous': 0,
+        'unmatched': 0,
+        'missing_target': 0,
+        'missing_placeholder': 0,
+        'oversize': 0,
+    }
+    samples = {'unmatched': [], 'ambiguous': [], 'missing_placeholder': [], 'oversize': []}
+    messages = 0
+    total = 0
+    total_rows = len(rows) if hasattr(rows, '__len__') else 0
+
+    def sample(category, value):
+        if len(samples[category]) < SAMPLE_LIMIT:
+            samples[category].append(value)
+
+    if hasattr(rows, 'iter_targets'):
+        targets = rows.iter_targets()
+    else:
+        targets = ((row, *classify_target(row.get("target"))) for row in rows)
+
+    for batch in iter(lambda: list(islice(targets, RESOLVE_BATCH)), []):
+        if control is not None:
+            control.check()
+        resolver.resolve(str(row.get("target")).strip() for row, kind, _ in batch
+                         if kind not in (TARGET_CHAT_ID, TARGET_MISSING))
+        chat_ids = []
+
+        for row, kind, cid in batch:
+            total += 1
+            if progress_callback and total_rows:
+                progress_callback(total, total_rows)
+            target = row.get("target")
+            if kind == TARGET_MISSING:
+                counts['missing_target'] += 1
+                continue
+
+            try:
+                message = template.format(**row)
+            except (KeyError, IndexError, ValueError) as e:
+                counts['missing_placeholder'] += 1
+                sample('missing_placeholder', f"{target}: {e}")
+                continue
+
+            if kind == TARGET_CHAT_ID:
+                counts['numeric'] += 1
+                chat_ids.append(cid)
+                recipients = 1
+            else:
+                lookup_kind, matches = resolver.lookup(str(target).strip())
+                recipients = len(matches)
+                if not matches:
+                    counts['unmatched'] += 1
+                    sample('unmatched', target)
+                elif len(matches) > 1:
+                    counts['ambiguous'] += 1
+                    sample('ambiguous', f"{target} ({len(matches)} users)")
+                else:
+                    counts[f'{lookup_kind}_matched'] += 1
+
+            if len(message) > MAX_MESSAGE_LENGTH:
+                counts['oversize'] += 1
+                sample('oversize', f"{target}: {len(message)} chars")
+            messages += recipients
+
+        if chat_ids:
+            counts['unknown_chat_ids'] += resolver.count_unknown(chat_ids)
+
+    return {
+        'total': total,
+        **counts,
+        'messages': messages,
+        'send_interval': round(send_interval, 3),
+        'estimated_seconds': round(messages * send_interval),
+        'samples': samples,
+    }
+
+
+def send_interval() -> float:
+    """
+    Expected seconds per message at the current limiter settings
+
+    A campaign never sends faster than SEND_DELAY, and shares the global
+    send rate with the campaigns currently sending (assumed equal shares).
+    """
+    scheduler = get_send_scheduler()
+    active = scheduler.get_stats()['active_flows']
+    return max(config.SEND_DELAY, scheduler.interval * (active + 1))
+
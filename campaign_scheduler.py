@@ -0,0 +1,456 @@
+"""
+Scheduled and recurring campaigns
+A single timer thread waits on a min-heap of due times and submits each due
+schedule to the TaskQueue; schedules are persisted so they survive restarts
+"""
+import heapq
+import itertools
+import logging
+import threading
+import uuid
+from datetime import datetime, timedelta, time as dt_time
+from typing import Callable, Dict, List, Optional
+from zoneinfo import ZoneInfo
+
+import config
+from task_queue import get_task_queue, campaign_timeout, campaign_size_priority, run_task_cleanup
+
+logger = logging.getLogger("campaign_scheduler")
+
+# Audiences resolved when a schedule fires, so recurring sends reach current users
+SCHEDULE_AUDIENCES: Dict[str, Callable[[], List[int]]] = {}
+
+# Global scheduler instance
+_campaign_scheduler = None
+
+CRON_ALIASES = {
+    "@hourly": "0 * * * *",
+    "@daily": "0 0 * * *",
+    "@weekly": "0 0 * * 0",
+    "@monthly": "0 0 1 * *",
+}
+
+DAY_NAMES = {"sun": 0, "mon": 1, "tue": 2, "wed": 3, "thu": 4, "fri": 5, "sat": 6}
+
+# Cron fields: (name, minimum, maximum)
+CRON_FIELDS = (
+    ("minute", 0, 59),
+    ("hour", 0, 23),
+    ("day", 1, 31),
+    ("month", 1, 12),
+    ("weekday", 0, 6),
+)
+
+# Upper bound on the search for the next matching time (expressions like "0 0 30 2 *" never match)
+CRON_SEARCH_DAYS = 366 * 5
+
+
+def register_audience(name: str):
+    """
+    Decorator registering a recipient list that is resolved at send time
+
+    Args:
+        name: Audience name stored in schedule documents
+    """
+    def decorator(func: Callable[[], List[int]]) -> Callable[[], List[int]]:
+        SCHEDULE_AUDIENCES[name] = func
+        return func
+    return decorator
+
+
+class CronExpression:
+    """
+    Standard five-field cron expression: minute hour day month weekday
+
+    Fields accept *, numbers, ranges (1-5), lists (1,15) and steps (*/15);
+    weekdays are 0-7 (0 and 7 are Sunday) or sun..sat. As in cron, when both
+    day and weekday are restricted a time matches if either one does.
+    """
+
+    def __init__(self, expression: str):
+        """
+        Parse an expression
+
+        Raises:
+            ValueError: If the expression is malformed
+        """
+        self.expression = expression.strip()
+        parts = CRON_ALIASES.get(self.expression.lower(), self.expression).split()
+        if len(parts) != len(CRON_FIELDS):
+            raise ValueError(f"Cron expression needs {len(CRON_FIELDS)} fields: {expression!r}")
+        values = [self._parse_field(part, *spec) for part, spec in zip(parts, CRON_FIELDS)]
+        self.minutes, self.hours, self.days, self.months, self.weekdays = values
+        self.day_restricted = parts[2] != "*"
+        self.weekday_restricted = parts[4] != "*"
+
+    @staticmethod
+    def _parse_field(field: str, name: str, low: int, high: int) -> frozenset:
+        values = set()
+        for item in field.lower().split(","):
+            base, _, step = item.partition("/")
+            step = int(step) if step else 1
+            if base == "*":
+                start, end = low, high
+            elif "-" in base:
+                start, end = (CronExpression._parse_value(v, name) for v in base.split("-", 1))
+            else:
+                start = CronExpression._parse_value(base, name)
+                end = high if step > 1 else start
+            if name == "weekday" and end == 7:
+                values.add(0)  # 7 is Sunday too
+                end = 6
+                if start == 7:
+                    continue
+            if step < 1 or start < low or end > high or start > end:
+                raise ValueError(f"Invalid {name} field: {field!r}")
+            values.update(range(start, end + 1, step))
+        return frozenset(values)
+
+    @staticmethod
+    def _parse_value(value: str, name: str) -> int:
+        if name == "weekday" and value in DAY_NAMES:
+            return DAY_NAMES[value]
+        try:
+            return int(value)
+        except ValueError:
+            raise ValueError(f"Invalid {name} value: {value!r}") from None
+
+    def _day_matches(self, day: datetime) -> bool:
+        day_ok = day.day in self.days
+        weekday_ok = (day.weekday() + 1) % 7 in self.weekdays  # cron counts from Sunday
+        if self.day_restricted and self.weekday_restricted:
+            return day_ok or weekday_ok
+        return day_ok and weekday_ok
+
+    def next_after(self, after: datetime) -> datetime:
+        """
+        Next matching time strictly after `after`
+
+        Args:
+            after: Naive wall-clock time in the schedule's time zone
+
+        Returns:
+            Naive wall-clock time of the next match
+
+        Raises:
+            ValueError: If nothing matches within CRON_SEARCH_DAYS
+        """
+        current = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = after + timedelta(days=CRON_SEARCH_DAYS)
+        while current <= limit:
+            if current.month not in self.months or not self._day_matches(current):
+                current = datetime.combine(current.date() + timedelta(days=1), dt_time())
+                continue
+            if current.hour not in self.hours:
+                current = current.replace(minute=0) + timedelta(hours=1)
+                continue
+            if current.minute not in self.minutes:
+                current += timedelta(minutes=1)
+                continue
+            return current
+        raise ValueError(f"Cron expression never matches: {self.expression!r}")
+
+
+def parse_window(window: str):
+    """
+    Parse an "HH:MM-HH:MM" wall-clock window (may wrap past midnight)
+
+    Returns:
+        (start, end) as datetime.time
+    """
+    start, end = (dt_time.fromisoformat(part.strip()) for part in window.split("-", 1))
+    return start, end
+
+
+class CampaignScheduler:
+    """
+    Timer thread that submits scheduled campaigns to the TaskQueue
+
+    Due times are kept in a min-heap of (next_run_at, seq, schedule_id); the
+    thread sleeps until the earliest one and is woken early when a schedule
+    is added. The heap is rebuilt from the store every poll_interval to pick
+    up schedules created or changed by other processes. Heap entries are
+    never removed in place: a run is only submitted if claim_run still finds
+    it as the schedule's next due time, which also keeps several processes
+    from submitting the same run.
+    """
+
+    def __init__(self, store, queue=None, timezone: str = "UTC", poll_interval: float = 30,
+                 off_peak_window: str = "01:00-06:00"):
+        """
+        Initialize scheduler
+
+        Args:
+            store: ScheduleStore holding the schedules
+            queue: TaskQueue to submit to (default: the global queue)
+            timezone: Time zone of run times and cron expressions
+            poll_interval: Seconds between reloads of the store
+            off_peak_window: Local "HH:MM-HH:MM" window used for off-peak sends
+        """
+        self.store = store
+        self.queue = queue
+        self.tz = ZoneInfo(timezone)
+        self.poll_interval = poll_interval
+        self.off_peak_window = parse_window(off_peak_window)
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self.running = False
+        self.fired_runs = 0
+        self.failed_runs = 0
+
+    def start(self):
+        """Load active schedules and start the timer thread"""
+        if self.running:
+            return
+        self.running = True
+        self._reload()
+        threading.Thread(target=self._timer_loop, daemon=True).start()
+        logger.info(f"Campaign scheduler started with {len(self._heap)} active schedule(s)")
+
+    def stop(self):
+        """Stop the timer thread"""
+        with self._cond:
+            self.running = False
+            self._cond.notify_all()
+
+    def to_utc(self, local: datetime) -> datetime:
+        """Convert a naive wall-clock time in the scheduler's zone to naive UTC"""
+        return local.replace(tzinfo=self.tz).astimezone(ZoneInfo("UTC")).replace(tzinfo=None)
+
+    def to_local(self, utc: datetime) -> datetime:
+        """Convert a naive UTC time to naive wall-clock time in the scheduler's zone"""
+        return utc.replace(tzinfo=ZoneInfo("UTC")).astimezone(self.tz).replace(tzinfo=None)
+
+    def next_cron_run(self, cron: str, after: Optional[datetime] = None) -> datetime:
+        """
+        Next UTC run time of a cron expression
+
+        Args:
+            cron: Cron expression in the scheduler's time zone
+            after: UTC time to search from (default: now)
+        """
+        after = after or datetime.utcnow()
+        return self.to_utc(CronExpression(cron).next_after(self.to_local(after)))
+
+    def next_off_peak(self, after: Optional[datetime] = None) -> datetime:
+        """
+        Earliest UTC time inside the off-peak window
+
+        Args:
+            after: UTC time to search from (default: now)
+
+        Returns:
+            `after` itself if it is already off-peak, otherwise the next window start
+        """
+        after = after or datetime.utcnow()
+        local = self.to_local(after)
+        start, end = self.off_peak_window
+        now = local.time()
+        inside = start <= now < end if start <= end else (now >= start or now < end)
+        if inside:
+            return after
+        start_at = datetime.combine(local.date(), start)
+        if start_at <= local:
+            start_at += timedelta(days=1)
+        return self.to_utc(start_at)
+
+    def schedule(self, task_type: str, kwargs: Dict = None, run_at: Optional[datetime] = None,
+                 cron: Optional[str] = None, audience: Optional[str] = None, priority: Optional[int] = None,
+                 timeout: Optional[float] = None, name: str = "") -> str:
+        """
+        Add a one-off or recurring campaign
+
+        Args:
+            task_type: Registered task type submitted at each run
+            kwargs: Serializable keyword arguments for the task
+            run_at: UTC time of the (first) run (default: next cron match, or now)
+            cron: Cron expression for recurring runs
+            audience: Registered audience whose chat IDs are passed as
+                chat_ids when the schedule fires
+            priority: Task priority (None = campaign_size_priority for the resolved
+                audience, or the queue default)
+            timeout: Task timeout (None = campaign_timeout for the resolved audience,
+                or the queue default)
+            name: Label shown in the admin panel
+
+        Returns:
+            schedule_id
+
+        Raises:
+            ValueError: If the cron expression is invalid or the audience unknown
+        """
+        if audience is not None and audience not in SCHEDULE_AUDIENCES:
+            raise ValueError(f"Unknown audience: {audience}")
+        if run_at is None:
+            run_at = self.next_cron_run(cron) if cron else datetime.utcnow()
+        elif cron:
+            CronExpression(cron)  # Validate before storing
+        run_at = run_at.replace(microsecond=0)
+
+        schedule_id = uuid.uuid4().hex[:12]
+        self.store.add({
+            "_id": schedule_id,
+            "name": name,
+            "task_type": task_type,
+            "kwargs": kwargs or {},
+            "audience": audience,
+            "cron": cron,
+            "priority": priority,
+            "timeout": timeout,
+            "next_run_at": run_at,
+        })
+        self._push(run_at, schedule_id)
+        logger.info(f"Schedule {schedule_id} ({task_type}) added, first run at {run_at} UTC"
+                    f"{f', recurring {cron!r}' if cron else ''}")
+        return schedule_id
+
+    def cancel(self, schedule_id: str) -> bool:
+        """
+        Cancel a schedule; its queued heap entry is dropped when it comes due
+
+        An active or paused one-off schedule has not fired, so its task will
+        never run: the task type's cleanup hook releases what the task
+        would have (e.g. the uploaded file of an excel_send).
+        """
+        doc = self.store.get(schedule_id)
+        if not self.store.set_status(schedule_id, "cancelled"):
+            return False
+        if doc is not None and not doc.get("cron"):
+            run_task_cleanup(doc["task_type"], doc.get("kwargs"))
+        return True
+
+    def pause(self, schedule_id: str) -> bool:
+        """Stop a schedule from firing until resumed"""
+        doc = self.store.get(schedule_id)
+        return doc is not None and doc["status"] == "active" and self.store.set_status(schedule_id, "paused")
+
+    def resume(self, schedule_id: str) -> bool:
+        """
+        Re-activate a paused schedule
+
+        Recurring schedules continue from their next cron match after now;
+        one-off schedules whose time has passed run immediately.
+        """
+        doc = self.store.get(schedule_id)
+        if doc is None or doc["status"] != "paused":
+            return False
+        next_run_at = self.next_cron_run(doc["cron"]) if doc.get("cron") else doc["next_run_at"]
+        if not self.store.set_status(schedule_id, "active", next_run_at=next_run_at):
+            return False
+        self._push(next_run_at, schedule_id)
+        return True
+
+    def list_schedules(self, limit: int = 50) -> List[Dict]:
+        """Get recent schedules, newest first"""
+        return self.store.recent(limit)
+
+    def get_stats(self) -> Dict:
+        """Get scheduler statistics"""
+        with self._cond:
+            next_due = self._heap[0][0] if self._heap else None
+            pending = len(self._heap)
+        return {
+            'running': self.running,
+            'queued_runs': pending,
+            'next_run_at': next_due.isoformat() if next_due else None,
+            'fired_runs': self.fired_runs,
+            'failed_runs': self.failed_runs,
+        }
+
+    def _push(self, run_at: datetime, schedule_id: str):
+        with self._cond:
+            heapq.heappush(self._heap, (run_at, next(self._seq), schedule_id))
+            self._cond.notify_all()
+
+    def _reload(self):
+        """Rebuild the heap from the store"""
+        heap = [(doc["next_run_at"], next(self._seq), doc["_id"])
+                for doc in self.store.active() if doc.get("next_run_at") is not None]
+        heapq.heapify(heap)
+        with self._cond:
+            self._heap = heap
+
+    def _timer_loop(self):
+        """Sleep until the earliest due time, then fire everything due"""
+        next_reload = datetime.utcnow() + timedelta(seconds=self.poll_interval)
+        while self.running:
+            due = []
+            with self._cond:
+                now = datetime.utcnow()
+                while self._heap and self._heap[0][0] <= now:
+                    run_at, _, schedule_id = heapq.heappop(self._heap)
+                    due.append((run_at, schedule_id))
+                if not due:
+                    wake_at = min(next_reload, self._heap[0][0]) if self._heap else next_reload
+                    self._cond.wait(max(0.0, (wake_at - now).total_seconds()))
+
+            for run_at, schedule_id in due:
+                try:
+                    self._fire(schedule_id, run_at)
+                except Exception as e:
+                    logger.error(f"Schedule {schedule_id} run at {run_at} failed: {e}", exc_info=True)
+
+            if self.running and datetime.utcnow() >= next_reload:
+                try:
+                    self._reload()
+                except Exception as e:
+                    logger.error(f"Failed to reload schedules: {e}")
+                next_reload = datetime.utcnow() + timedelta(seconds=self.poll_interval)
+
+    def _fire(self, schedule_id: str, run_at: datetime):
+        """Claim one due run and submit its task"""
+        doc = self.store.get(schedule_id)
+        if doc is None or doc["status"] != "active" or doc.get("next_run_at") != run_at:
+            return  # Cancelled, paused, or a stale heap entry
+
+        next_run_at = None
+        if doc.get("cron"):
+            # Missed runs (process was down) are not replayed: run once, then continue from now
+            next_run_at = self.next_cron_run(doc["cron"], after=max(run_at, datetime.utcnow()))
+        if self.store.claim_run(schedule_id, run_at, next_run_at) is None:
+            return  # Another process took this run
+
+        task_id = f"sched-{schedule_id}-{run_at:%Y%m%d%H%M}"
+        try:
+            kwargs = dict(doc.get("kwargs") or {})
+            timeout = doc.get("timeout")
+            priority = doc.get("priority")
+            if doc.get("audience"):
+                kwargs["chat_ids"] = SCHEDULE_AUDIENCES[doc["audience"]]()
+                if timeout is None:
+                    timeout = campaign_timeout(len(kwargs["chat_ids"]))
+                if priority is None:
+                    priority = campaign_size_priority(len(kwargs["chat_ids"]))
+            queue = self.queue or get_task_queue()
+            submit_kwargs = {"timeout": timeout}
+            if priority is not None:
+                submit_kwargs["priority"] = priority
+            # Runs sharing a cron slot come due together; that is not a submission loop
+            queue.submit_registered(task_id, doc["task_type"], kwargs, trusted=True, **submit_kwargs)
+            self.store.record_run(schedule_id, task_id)
+            self.fired_runs += 1
+            logger.info(f"Schedule {schedule_id} fired task {task_id}")
+        except Exception as e:
+            self.store.record_run(schedule_id, None, error=str(e))
+            self.failed_runs += 1
+            logger.error(f"Schedule {schedule_id} could not submit its run at {run_at}: {e}")
+
+        if next_run_at is not None:
+            self._push(next_run_at, schedule_id)
+
+
+def get_campaign_scheduler() -> CampaignScheduler:
+    """Get or create the global campaign scheduler"""
+    global _campaign_scheduler
+    if _campaign_scheduler is None:
+        from database import db
+        from task_store import ScheduleStore
+        _campaign_scheduler = CampaignScheduler(
+            ScheduleStore(db.db[config.SCHEDULES_COLLECTION]),
+            timezone=config.SCHEDULER_TIMEZONE,
+            poll_interval=config.SCHEDULER_POLL_INTERVAL,
+            off_peak_window=config.OFF_PEAK_WINDOW
+        )
+        _campaign_scheduler.start()
+    return _campaign_scheduler
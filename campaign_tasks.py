@@ -0,0 +1,230 @@
+"""
+Registered background task types for message campaigns
+Arguments are plain serializable values so tasks can be persisted in the durable queue
+"""
+import os
+import logging
+from typing import List, Optional, Dict
+import config
+from database import db
+from task_queue import (
+    register_task_type, register_task_cleanup, update_task_progress, get_task_queue, get_task_control,
+    ProgressReporter, TaskCancelled, TaskPaused
+)
+from excel_processor import ExcelRowStream, count_excel_rows, load_personalized_columns, get_upload_cache
+from row_spool import spool_rows, spool_path_for, open_spool
+from cpu_pool import run_cpu_bound
+from message_sender import send_personalized_from_template_optimized, send_bulk_optimized
+from send_scheduler import get_send_scheduler
+from campaign_scheduler import register_audience
+from campaign_dry_run import TargetResolver, build_report, send_interval
+
+logger = logging.getLogger("campaign_tasks")
+
+
+def _open_send_flow(task_id: str):
+    """Join the fair-share send scheduler at the task's priority"""
+    priority = get_task_queue().get_status(task_id).priority
+    return get_send_scheduler().open_flow(task_id, priority=priority, min_interval=config.SEND_DELAY)
+
+
+def _record_cancelled(e: TaskCancelled):
+    """Persist stats for the messages sent before a cancel"""
+    if e.checkpoint:
+        db.update_system_stats(sent=e.checkpoint['sent'], failed=e.checkpoint['failed'])
+
+
+def _load_rows(file_path: str, target_column: str, custom_columns: List[str], control):
+    """
+    Prepared rows of an uploaded file, parsed at most once
+
+    Rows cached or spooled by an earlier run (e.g. before a pause) are
+    reused. Uploads small enough to cache are prepared in the CPU pool in
+    one pass. Larger ones are spooled to disk there (ROW_SPOOL_ENABLED) or
+    counted and then streamed chunk by chunk while sending, so memory stays
+    flat regardless of file size.
+    """
+    cache = get_upload_cache()
+    rows = cache.get_rows(file_path, target_column, custom_columns)
+    if rows is not None:
+        return rows
+
+    preview = cache.get_preview(file_path)
+    if preview is not None and preview['row_count'] <= cache.max_rows:
+        rows = run_cpu_bound(load_personalized_columns, file_path, target_column, custom_columns,
+                             control=control)
+        cache.put_rows(file_path, target_column, custom_columns, rows)
+        return rows
+
+    if config.ROW_SPOOL_ENABLED:
+        spool_path = spool_path_for(file_path)
+        rows = open_spool(spool_path)
+        if rows is None:
+            rows = run_cpu_bound(spool_rows, file_path, target_column, custom_columns, spool_path,
+                                 control=control)
+        return rows
+
+    num_rows = run_cpu_bound(count_excel_rows, file_path, control=control)
+    return ExcelRowStream(file_path, target_column, custom_columns, num_rows,
+                          chunk_size=config.EXCEL_CHUNK_SIZE)
+
+
+@register_audience("all_users")
+def all_user_chat_ids() -> List[int]:
+    """Chat IDs of every registered user, resolved when a scheduled broadcast fires"""
+    return db.get_all_chat_ids()
+
+
+@register_task_type("bulk_send")
+def bulk_send_task(
+    task_id: str,
+    chat_ids: List[int],
+    template: str,
+    checkpoint: Optional[Dict] = None
+) -> dict:
+    """
+    Send the same message to a list of chat IDs with progress tracking
+
+    Args:
+        task_id: Task ID used for progress updates
+        chat_ids: List of chat IDs
+        template: Message text
+        checkpoint: Where to continue from after a pause
+
+    Returns:
+        Send result dict from send_bulk_optimized
+    """
+    try:
+        with _open_send_flow(task_id) as flow:
+            result = send_bulk_optimized(
+                chat_ids,
+                template,
+                delay=config.SEND_DELAY,
+                progress_callback=ProgressReporter(task_id),
+                flow=flow,
+                control=get_task_control(task_id),
+                checkpoint=checkpoint
+            )
+    except TaskCancelled as e:
+        _record_cancelled(e)
+        raise
+
+    # Persist stats to database
+    db.update_system_stats(sent=result['sent'], failed=result['failed'])
+    return result
+
+
+@register_task_type("excel_send")
+def excel_send_task(
+    task_id: str,
+    file_path: str,
+    target_column: str,
+    custom_columns: List[str],
+    template: str,
+    checkpoint: Optional[Dict] = None
+) -> dict:
+    """
+    Read an uploaded Excel file and send personalized messages
+
+    The file must be readable by the process that runs the task; in durable
+    mode with several hosts, uploads need to live on shared storage.
+
+    Args:
+        task_id: Task ID used for progress updates
+        file_path: Path to the uploaded Excel file (removed when done)
+        target_column: Column with chat IDs, phones or names
+        custom_columns: Columns available as template placeholders
+        template: Message template with {column_name} placeholders
+        checkpoint: Where to continue from after a pause
+
+    Returns:
+        Send result dict from send_personalized_from_template_optimized
+    """
+    paused = False
+    try:
+        update_task_progress(task_id, 5, "Reading Excel file...")
+        rows = _load_rows(file_path, target_column, custom_columns, get_task_control(task_id))
+        update_task_progress(task_id, 10, f"Prepared {len(rows)} rows")
+
+        # Send with progress tracking
+        with _open_send_flow(task_id) as flow:
+            result = send_personalized_from_template_optimized(
+                template, rows,
+                delay=config.SEND_DELAY,
+                progress_callback=ProgressReporter(task_id, start_pct=10),  # Scale progress from 10% to 100%
+                flow=flow,
+                control=get_task_control(task_id),
+                checkpoint=checkpoint
+            )
+
+        # Persist stats to database
+        db.update_system_stats(sent=result['sent'], failed=result['failed'])
+
+        return result
+    except TaskPaused:
+        # Keep the file and spool; the task reuses them when resumed
+        paused = True
+        raise
+    except TaskCancelled as e:
+        _record_cancelled(e)
+        raise
+    finally:
+        # Clean up temp file and its spool
+        if not paused:
+            remove_excel_upload(file_path)
+
+
+@register_task_cleanup("excel_send")
+def remove_excel_upload(file_path: str, **kwargs):
+    """
+    Remove an uploaded Excel file, its spool and its cached preview
+
+    Also runs when a pending or paused excel_send task is cancelled, since
+    such a task never reaches its own cleanup.
+
+    Args:
+        file_path: Path to the uploaded Excel file
+    """
+    get_upload_cache().discard(file_path)
+    for path in (file_path, spool_path_for(file_path)):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+@register_task_type("dry_run")
+def dry_run_task(
+    task_id: str,
+    file_path: str,
+    target_column: str,
+    custom_columns: List[str],
+    template: str
+) -> dict:
+    """
+    Dry-run an uploaded campaign without sending
+
+    Rows are loaded like excel_send's (cache, spool or stream, see
+    _load_rows), so the send that usually follows reuses them and large
+    uploads are never held in memory.
+
+    Args:
+        task_id: Task ID used for progress updates
+        file_path: Path to the uploaded file (kept for the send)
+        target_column: Column with chat IDs, phones or names
+        custom_columns: Columns available as template placeholders
+        template: Message template with {column_name} placeholders
+
+    Returns:
+        Report dict from campaign_dry_run.build_report
+    """
+    update_task_progress(task_id, 5, "Reading file...")
+    control = get_task_control(task_id)
+    rows = _load_rows(file_path, target_column, custom_columns, control)
+    update_task_progress(task_id, 10, f"Checking {len(rows)} rows")
+
+    report = build_report(rows, template, TargetResolver(db), send_interval(),
+                          progress_callback=ProgressReporter(task_id, start_pct=10), control=control)
+    logger.info(f"Dry run of {file_path}: {report['total']} rows, {report['messages']} messages, "
+                f"{report['unmatched']} unmatched, {report['missing_placeholder']} template errors")
+    return report
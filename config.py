@@ -9,6 +9,16 @@ load_dotenv()
 
 # Telegram Bot Configuration
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN", "8334074221:AAE8pGbyawYLnZmDlQd4fRXoW0p0hvO7koY")
+BOT_HEALTH_INTERVAL = float(os.getenv("BOT_HEALTH_INTERVAL", "60"))  # Seconds between background getMe probes shown on the dashboard
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "")  # Bot API server base URL, e.g. http://127.0.0.1:8081 for fake_telegram_api.py (empty = api.telegram.org)
+
+# Bot Update Delivery ("polling" long-polls getUpdates in one background thread; "webhook" receives updates on a Flask route in every web worker)
+BOT_MODE = os.getenv("BOT_MODE", "polling").lower()
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")  # Public HTTPS base URL of the web app, e.g. https://myapp.up.railway.app
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")  # Secret token checked on every webhook request (empty = derived from the bot token)
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "40"))  # Concurrent webhook connections Telegram may open
+UPDATE_LANES = int(os.getenv("UPDATE_LANES", "4"))  # Single-threaded lanes handling bot updates (updates of one chat stay in order)
+UPDATE_LANE_QUEUE_SIZE = int(os.getenv("UPDATE_LANE_QUEUE_SIZE", "250"))  # Queued updates per lane before polling waits / the webhook answers 503
 
 # MongoDB Configuration
 MONGODB_URI = os.getenv("MONGODB_URI", "mongodb://localhost:27017/")
@@ -18,6 +28,8 @@ USERS_COLLECTION = "users"
 # Application Settings
 SEND_DELAY = float(os.getenv("SEND_DELAY", "0.5"))  # seconds between sends
 WELCOME_MESSAGE = os.getenv("WELCOME_MESSAGE", "اهلا بيك في نظام المتابعة لمستر شادي الشرقاوي شكرا على ثقتك بنتمنى نكون عند حسن ظنك")
+REPLY_COOLDOWN_SECONDS = float(os.getenv("REPLY_COOLDOWN_SECONDS", "300"))  # Auto-replies to plain messages at most once per chat per window (0 = reply to every message)
+REPLY_COOLDOWN_MAX_CHATS = int(os.getenv("REPLY_COOLDOWN_MAX_CHATS", "100000"))  # Chats remembered by the reply cooldown (oldest forgotten first)
 
 # Logging Configuration
 LOG_FILE = os.getenv("LOG_FILE", os.path.join("data", "app.log"))
@@ -29,18 +41,64 @@ WINDOW_SIZE = "980x660"
 
 # === OPTIMIZATION SETTINGS ===
 # Task Queue Configuration
-TASK_QUEUE_WORKERS = int(os.getenv("TASK_QUEUE_WORKERS", "2"))  # Number of worker threads for background tasks
+TASK_QUEUE_WORKERS = int(os.getenv("TASK_QUEUE_WORKERS", "2"))  # Number of worker threads for background tasks (pool minimum)
+TASK_QUEUE_MAX_WORKERS = int(os.getenv("TASK_QUEUE_MAX_WORKERS", str(TASK_QUEUE_WORKERS * 2)))  # Pool grows up to this while tasks wait
+TASK_QUEUE_WORKER_IDLE_SECONDS = float(os.getenv("TASK_QUEUE_WORKER_IDLE_SECONDS", "60"))  # Extra workers exit after idling this long
 TASK_QUEUE_ENABLED = os.getenv("TASK_QUEUE_ENABLED", "True").lower() in ("true", "1", "yes")
 
+TASK_QUEUE_OVERFLOW_WORKERS = int(os.getenv("TASK_QUEUE_OVERFLOW_WORKERS", "2"))  # Extra workers for high-priority tasks when all are busy
+URGENT_CAMPAIGN_SIZE = int(os.getenv("URGENT_CAMPAIGN_SIZE", "50"))  # Campaigns up to this many recipients run at high priority
+
+# Durable Task Queue (tasks persisted in MongoDB survive restarts)
+TASK_QUEUE_DURABLE = os.getenv("TASK_QUEUE_DURABLE", "False").lower() in ("true", "1", "yes")
+TASKS_COLLECTION = os.getenv("TASKS_COLLECTION", "tasks")
+TASK_LEASE_SECONDS = int(os.getenv("TASK_LEASE_SECONDS", "60"))  # Claimed task is re-delivered if not renewed within this time
+TASK_MAX_ATTEMPTS = int(os.getenv("TASK_MAX_ATTEMPTS", "3"))  # Deliveries before a durable task is marked failed
+
+# Shared Task Status ("mongo" lets any gunicorn worker answer status polls, "memory" keeps it per-process)
+TASK_STATUS_BACKEND = os.getenv("TASK_STATUS_BACKEND", "mongo").lower()
+TASK_STATUS_COLLECTION = os.getenv("TASK_STATUS_COLLECTION", "task_status")
+TASK_STATUS_WRITE_INTERVAL = float(os.getenv("TASK_STATUS_WRITE_INTERVAL", "1.0"))  # Min seconds between progress writes per task
+
+# Task Result Retention (finished results are evicted from memory)
+TASK_RESULT_MAX = int(os.getenv("TASK_RESULT_MAX", "500"))  # Max task results kept in memory
+TASK_RESULT_TTL = int(os.getenv("TASK_RESULT_TTL", "3600"))  # Seconds a finished task result is kept
+
+# Progress Streaming (Server-Sent Events; pages fall back to polling)
+SSE_MIN_INTERVAL = float(os.getenv("SSE_MIN_INTERVAL", "0.25"))  # Min seconds between events on one stream
+SSE_KEEPALIVE_SECONDS = float(os.getenv("SSE_KEEPALIVE_SECONDS", "15"))  # Keep-alive comment on idle streams
+SSE_REMOTE_POLL_INTERVAL = float(os.getenv("SSE_REMOTE_POLL_INTERVAL", "2"))  # Status re-read for tasks run by another process
+SSE_MAX_STREAM_SECONDS = float(os.getenv("SSE_MAX_STREAM_SECONDS", "300"))  # Streams are closed and reconnected after this
+SSE_MAX_STREAMS = int(os.getenv("SSE_MAX_STREAMS", "4"))  # Open streams per process; more get 503 and those pages poll instead
+
+# Scheduled Campaigns (one-off and cron-style recurring sends)
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "True").lower() in ("true", "1", "yes")
+SCHEDULES_COLLECTION = os.getenv("SCHEDULES_COLLECTION", "schedules")
+SCHEDULER_TIMEZONE = os.getenv("SCHEDULER_TIMEZONE", "UTC")  # Zone of scheduled times and cron expressions, e.g. Africa/Cairo
+SCHEDULER_POLL_INTERVAL = float(os.getenv("SCHEDULER_POLL_INTERVAL", "30"))  # Seconds between reloads of schedules added by other processes
+OFF_PEAK_WINDOW = os.getenv("OFF_PEAK_WINDOW", "01:00-06:00")  # Local time window used for "send off-peak"
+
 # Excel Processing
 EXCEL_CHUNK_SIZE = int(os.getenv("EXCEL_CHUNK_SIZE", "100"))  # Process rows in chunks of N size
 EXCEL_BATCH_SIZE = int(os.getenv("EXCEL_BATCH_SIZE", "50"))  # Send messages in batches
+UPLOAD_CACHE_ENTRIES = int(os.getenv("UPLOAD_CACHE_ENTRIES", "8"))  # Parsed uploads kept for /send validation and the send task
+UPLOAD_CACHE_MAX_ROWS = int(os.getenv("UPLOAD_CACHE_MAX_ROWS", "20000"))  # Larger uploads are spooled or streamed instead of cached as prepared rows
+CSV_FALLBACK_ENCODING = os.getenv("CSV_FALLBACK_ENCODING", "cp1256")  # CSV/TSV uploads that are not UTF-8 (cp1256 = Windows Arabic; latin-1 for Western files)
+ROW_SPOOL_ENABLED = os.getenv("ROW_SPOOL_ENABLED", "True").lower() in ("true", "1", "yes")  # Parse large uploads once into an on-disk SQLite spool
+ROW_SPOOL_DIR = os.getenv("ROW_SPOOL_DIR", "")  # Spool file directory (empty = system temp dir)
+
+# CPU Process Pool (workbook parsing, row preparation and exports run outside the GIL)
+CPU_POOL_WORKERS = int(os.getenv("CPU_POOL_WORKERS", "1"))  # Worker processes (0 = run CPU stages inline)
+CPU_POOL_MAX_TASKS_PER_CHILD = int(os.getenv("CPU_POOL_MAX_TASKS_PER_CHILD", "20"))  # Recycle workers to return pandas memory (0 = never)
 
 # Rate Limiting
 MIN_SEND_DELAY = float(os.getenv("MIN_SEND_DELAY", "0.1"))  # Minimum delay between messages (seconds)
 MAX_SEND_DELAY = float(os.getenv("MAX_SEND_DELAY", "2.0"))  # Maximum delay between messages
 BATCH_SEND_ENABLED = os.getenv("BATCH_SEND_ENABLED", "False").lower() in ("true", "1", "yes")  # Enable batch sending
+GLOBAL_SEND_RATE = float(os.getenv("GLOBAL_SEND_RATE", str(TASK_QUEUE_WORKERS / SEND_DELAY if SEND_DELAY > 0 else 0)))  # Max messages/sec shared by all campaigns (0 = unlimited)
 
 # Performance
 TIMEOUT_SECONDS = int(os.getenv("TIMEOUT_SECONDS", "300"))  # Task timeout in seconds
+TASK_TIMEOUT_PER_MESSAGE = float(os.getenv("TASK_TIMEOUT_PER_MESSAGE", str(SEND_DELAY * 4)))  # Extra campaign deadline per recipient, on top of TIMEOUT_SECONDS
+TASK_TIMEOUT_GRACE = int(os.getenv("TASK_TIMEOUT_GRACE", "30"))  # Seconds an overdue task gets to stop before its worker is replaced
 REQUEST_TIMEOUT = int(os.getenv("REQUEST_TIMEOUT", "30"))  # Flask request timeout
@@ -0,0 +1,105 @@
+"""
+Process pool for CPU-bound task stages
+Workbook parsing, row preparation and export generation run in separate processes so
+they do not hold the GIL while task threads send messages and Flask serves requests
+"""
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional
+
+import config
+
+logger = logging.getLogger("cpu_pool")
+
+# Seconds between cancel/timeout checks while waiting for a pool result
+CONTROL_CHECK_INTERVAL = 0.5
+
+# Global pool instance
+_cpu_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_cpu_pool() -> Optional[ProcessPoolExecutor]:
+    """
+    Get or create the shared process pool
+
+    Workers are spawned rather than forked: forking a process that already
+    runs bot, sender and Flask threads can copy locks in a held state.
+
+    Returns:
+        ProcessPoolExecutor, or None if CPU_POOL_WORKERS is 0
+    """
+    global _cpu_pool
+    if config.CPU_POOL_WORKERS <= 0:
+        return None
+    with _pool_lock:
+        if _cpu_pool is None:
+            _cpu_pool = ProcessPoolExecutor(
+                max_workers=config.CPU_POOL_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                max_tasks_per_child=config.CPU_POOL_MAX_TASKS_PER_CHILD or None
+            )
+            logger.info(f"CPU process pool started with {config.CPU_POOL_WORKERS} workers")
+        return _cpu_pool
+
+
+def _discard_pool(pool: ProcessPoolExecutor):
+    """Drop a broken pool so the next call starts a fresh one"""
+    global _cpu_pool
+    with _pool_lock:
+        if _cpu_pool is pool:
+            _cpu_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def run_cpu_bound(func: Callable, *args, control=None, **kwargs) -> Any:
+    """
+    Run a CPU-bound function in the process pool and wait for its result
+
+    func must be a module-level function (or static method) whose module
+    neither connects to the database nor starts threads at import, and its
+    arguments and result must be picklable; return compact data such as
+    excel_processor.ColumnBatch rather than DataFrames or row dicts.
+    Runs inline when the pool is disabled.
+
+    Args:
+        func: Function to run
+        *args: Positional arguments for func
+        control: Optional TaskControl of the calling task; checked while
+            waiting so a cancel, pause or timeout is not held up by the stage
+        **kwargs: Keyword arguments for func
+
+    Returns:
+        func's return value
+
+    Raises:
+        RuntimeError: If the worker process died (e.g. out of memory)
+    """
+    pool = get_cpu_pool()
+    if pool is None:
+        return func(*args, **kwargs)
+
+    try:
+        future = pool.submit(func, *args, **kwargs)
+    except BrokenProcessPool:
+        _discard_pool(pool)
+        pool = get_cpu_pool()
+        future = pool.submit(func, *args, **kwargs)
+
+    try:
+        while True:
+            try:
+                return future.result(timeout=CONTROL_CHECK_INTERVAL if control is not None else None)
+            except FutureTimeout:
+                control.check(control.last_checkpoint)
+    except BrokenProcessPool as e:
+        _discard_pool(pool)
+        logger.error(f"CPU pool worker died running {func.__name__}")
+        raise RuntimeError(f"Worker process died while running {func.__name__}") from e
+    except BaseException:
+        # Interrupted while waiting; drop the work if it has not started yet
+        future.cancel()
+        raise
@@ -1,7 +1,7 @@
 """
 Database module for MongoDB operations
 """
-from pymongo import MongoClient
+from pymongo import MongoClient, UpdateOne
 from pymongo.errors import ConnectionFailure, ServerSelectionTimeoutError
 from datetime import datetime
 import logging
@@ -55,40 +55,67 @@ class Database:
             activity_type: Type of activity (message, start, etc.)
         """
         try:
-            now = datetime.utcnow()
-            
-            # Build the update document
-            update_doc = {
-                "$set": {
-                    "name": name,
-                    "updated_at": now,
-                    "last_activity_at": now,
-                    "last_activity_type": activity_type,
-                    "status": "active"
-                },
-                "$setOnInsert": {
-                    "joined_at": now,
-                    "phone_number": None  # Initialize phone number as None for new users
-                }
-            }
-
-            # Handle message_count to avoid conflicts between $setOnInsert and $inc
-            if activity_type == "message":
-                # Use $inc which will auto-initialize to 0 then increment to 1 for new users
-                update_doc["$inc"] = {"message_count": 1}
-            else:
-                # For non-message activities, just initialize to 0 for new users
-                update_doc["$setOnInsert"]["message_count"] = 0
-
             self.users_collection.update_one(
                 {"chat_id": chat_id},
-                update_doc,
+                self._activity_update(name, activity_type, datetime.utcnow()),
                 upsert=True
             )
             logger.info(f"User {chat_id} ({name}) added/updated with activity: {activity_type}")
         except Exception as e:
             logger.error(f"Failed to add/update user {chat_id}: {e}")
             raise
+
+    @staticmethod
+    def _activity_update(name: str, activity_type: str, now: datetime) -> dict:
+        """Upsert document recording a user's name and activity"""
+        update_doc = {
+            "$set": {
+                "name": name,
+                "updated_at": now,
+                "last_activity_at": now,
+                "last_activity_type": activity_type,
+                "status": "active"
+            },
+            "$setOnInsert": {
+                "joined_at": now,
+                "phone_number": None  # Initialize phone number as None for new users
+            }
+        }
+
+        # Handle message_count to avoid conflicts between $setOnInsert and $inc
+        if activity_type == "message":
+            # Use $inc which will auto-initialize to 0 then increment to 1 for new users
+            update_doc["$inc"] = {"message_count": 1}
+        else:
+            # For non-message activities, just initialize to 0 for new users
+            update_doc["$setOnInsert"]["message_count"] = 0
+        return update_doc
+
+    def record_activities(self, activities) -> bool:
+        """
+        Add or update many users in one round trip
+
+        Same effect as add_or_update_user for each entry, in order.
+
+        Args:
+            activities: (chat_id, name, activity_type) tuples
+
+        Returns:
+            True if the bulk write succeeded
+        """
+        if not activities:
+            return True
+        try:
+            now = datetime.utcnow()
+            self.users_collection.bulk_write([
+                UpdateOne({"chat_id": chat_id}, self._activity_update(name, activity_type, now), upsert=True)
+                for chat_id, name, activity_type in activities
+            ], ordered=True)
+            logger.info(f"Recorded activity of {len(activities)} messages")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to record activity of {len(activities)} messages: {e}")
+            return False
     
     def get_users(self, search=None, status_filter=None, page=1, per_page=50):
         """
@@ -156,6 +183,23 @@ class Database:
         """
         users, _, _ = self.get_users()
         return [(user[0], user[1]) for user in users]
+
+    def get_all_chat_ids(self):
+        """
+        Get the chat ID of every registered user (not paginated)
+
+        Returns:
+            List of chat IDs
+
+        Raises:
+            Exception: Query errors, so a broadcast is never sent to part of its audience
+        """
+        return [
+            user["chat_id"]
+            for batch in self.iter_user_batches(["chat_id"], query={"chat_id": {"$exists": True}},
+                                                sort=("_id", 1), batch_size=5000)
+            for user in batch
+        ]
     
     def get_users_with_phones(self):
         """
@@ -192,6 +236,39 @@ class Database:
             logger.error(f"Failed to get users with phones: {e}")
             return []
 
+    def iter_user_batches(self, fields, query=None, sort=("name", 1), batch_size=1000):
+        """
+        Stream users from a cursor in batches, for exports
+
+        Args:
+            fields: User document fields to include
+            query: Optional MongoDB filter
+            sort: (field, direction) to sort by
+            batch_size: Users per yielded batch (and cursor round trip)
+
+        Yields:
+            Lists of up to batch_size user dicts with the requested fields
+            
+        Raises:
+            Exception: Cursor errors, also after some batches were yielded
+        """
+        try:
+            projection = {field: 1 for field in fields}
+            projection["_id"] = 0
+            cursor = self.users_collection.find(query or {}, projection).sort(*sort).batch_size(batch_size)
+            batch = []
+            for user in cursor:
+                batch.append(user)
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+        except Exception as e:
+            # Callers must not mistake a cut-off stream for the whole collection
+            logger.error(f"Failed to stream users: {e}")
+            raise
+
     def get_users_without_phone(self):
         """
         Get all users who don't have a phone number
@@ -276,15 +353,55 @@ class Database:
                 return [(user["chat_id"], user.get("name", ""))]
             
             # If no exact match, try partial match
-            pattern = {"$regex": cleaned_phone, "$options": "i"}
-            users = self.users_collection.find(
-                {"phone_number": pattern},
-                {"chat_id": 1, "name": 1, "_id": 0}
-            )
-            return [(user["chat_id"], user.get("name", "")) for user in users]
+            return self._find_users_by_partial_phone(cleaned_phone)
         except Exception as e:
             logger.error(f"Failed to find users by phone '{phone}': {e}")
             return []
+
+    def _find_users_by_partial_phone(self, cleaned_phone: str):
+        """Users whose phone number matches cleaned_phone as a case-insensitive regex"""
+        pattern = {"$regex": cleaned_phone, "$options": "i"}
+        users = self.users_collection.find(
+            {"phone_number": pattern},
+            {"chat_id": 1, "name": 1, "_id": 0}
+        )
+        return [(user["chat_id"], user.get("name", "")) for user in users]
+
+    def find_users_by_phones(self, phones):
+        """
+        Find users by many phone numbers, matching like find_users_by_phone
+
+        Exact matches of all phones come from one query; only phones without
+        an exact match fall back to a partial match each.
+
+        Args:
+            phones: Phone numbers to search for
+
+        Returns:
+            Dict of stripped phone -> list of tuples (chat_id, name)
+        """
+        cleaned = list(dict.fromkeys(str(phone).strip() for phone in phones))
+        results = {}
+        try:
+            users = self.users_collection.find(
+                {"phone_number": {"$in": cleaned}},
+                {"chat_id": 1, "name": 1, "phone_number": 1, "_id": 0}
+            )
+            for user in users:
+                # Like find_one, keep the first exact match of each phone
+                results.setdefault(user["phone_number"], [(user["chat_id"], user.get("name", ""))])
+        except Exception as e:
+            logger.error(f"Failed to find users by {len(cleaned)} phones: {e}")
+            return {phone: self.find_users_by_phone(phone) for phone in cleaned}
+
+        for phone in cleaned:
+            if phone not in results:
+                try:
+                    results[phone] = self._find_users_by_partial_phone(phone)
+                except Exception as e:
+                    logger.error(f"Failed to find users by phone '{phone}': {e}")
+                    results[phone] = []
+        return results
     
     def delete_user(self, chat_id: int):
         """
@@ -325,6 +442,46 @@ class Database:
             logger.error(f"Failed to check phone number for user {chat_id}: {e}")
             return False
     
+    def get_chat_ids_with_phone(self, chat_ids):
+        """
+        Check many users for a saved phone number in one query
+
+        Args:
+            chat_ids: Telegram chat IDs
+
+        Returns:
+            Set of the chat IDs that have a phone number, or None on error
+        """
+        try:
+            users = self.users_collection.find(
+                {"chat_id": {"$in": list(set(chat_ids))}, "phone_number": {"$nin": [None, ""]}},
+                {"chat_id": 1, "_id": 0}
+            )
+            return {user["chat_id"] for user in users}
+        except Exception as e:
+            logger.error(f"Failed to check phone numbers of {len(chat_ids)} users: {e}")
+            return None
+
+    def get_registered_chat_ids(self, chat_ids):
+        """
+        Check many chat IDs for a registered user in one query
+
+        Args:
+            chat_ids: Telegram chat IDs
+
+        Returns:
+            Set of the chat IDs that belong to a registered user, or None on error
+        """
+        try:
+            users = self.users_collection.find(
+                {"chat_id": {"$in": list(set(chat_ids))}},
+                {"chat_id": 1, "_id": 0}
+            )
+            return {user["chat_id"] for user in users}
+        except Exception as e:
+            logger.error(f"Failed to look up {len(chat_ids)} chat IDs: {e}")
+            return None
+
     def save_phone_number(self, chat_id: int, phone_number: str):
         """
         Save user's phone number
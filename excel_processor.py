@@ -1,39 +1,426 @@
 """
 Optimized Excel processing utilities
 Handles large Excel files efficiently with chunked reading and data validation
+
+Uploads may be .xlsx, .csv, .tsv or .parquet (Parquet needs pyarrow); every
+format is read into the same chunks and ColumnBatch rows.
 """
-import pandas as pd
+import io
+import os
+import re
+import csv
+import codecs
+import pickle
+import hashlib
 import logging
-from typing import List, Dict, Tuple, Optional
-from io import BytesIO
+import tempfile
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from itertools import islice
+from typing import List, Dict, Tuple, Optional, Iterator, Iterable, Union
+
+import pandas as pd
+from openpyxl import Workbook, load_workbook
+from openpyxl.utils import get_column_letter
+
+import config
 
 logger = logging.getLogger("excel_processor")
 
+
+# Target kinds: how the sender reaches a row's target
+TARGET_CHAT_ID = "chat_id"  # Send straight to the numeric chat ID
+TARGET_PHONE = "phone"  # Look up users by phone number, then by name
+TARGET_MISSING = "missing"  # Empty target, reported as failed
+
+# Plain integers, optionally with a trailing ".0" left by a float cell
+_CHAT_ID_RE = re.compile(r"-?\d+(?:\.0*)?")
+# Scientific notation as saved by Excel for long numbers (2.01285E+11)
+_SCIENTIFIC_RE = re.compile(r"-?\d+(?:\.\d+)?[eE]\+?\d+")
+
+# Custom columns with these words in their name are read as text like the target
+IDENTIFIER_COLUMN_HINTS = ("phone", "mobile", "chat_id")
+
+# Accepted upload file types
+UPLOAD_EXTENSIONS = ('.xlsx', '.csv', '.tsv', '.parquet')
+
+# Bytes of a CSV/TSV upload read to pick its encoding and to count rows for a preview
+DELIMITED_SCAN_BYTES = 1024 * 1024
+
+
+@dataclass
+class ColumnBatch:
+    """
+    Prepared rows stored column by column
+    
+    One list of strings per column instead of one dict per row: much cheaper
+    to pickle back from the CPU process pool. Rows are built as dicts only
+    while iterating, so it can be passed wherever a list of row dicts is
+    expected. chat_ids and target_kinds hold the normalized "target" column
+    (see normalize_targets).
+    """
+    columns: Dict[str, List[str]]
+    num_rows: int
+    chat_ids: Optional[List[Optional[int]]] = None
+    target_kinds: Optional[List[str]] = None
+    
+    def __len__(self) -> int:
+        return self.num_rows
+    
+    def __iter__(self) -> Iterator[Dict]:
+        names = list(self.columns)
+        for values in zip(*self.columns.values()):
+            yield dict(zip(names, values))
+    
+    def rows(self) -> List[Dict]:
+        """Materialize all rows as dicts"""
+        return list(self)
+    
+    def iter_targets(self, start: int = 0) -> Iterator[Tuple[Dict, str, Optional[int]]]:
+        """Iterate (row, target kind, chat ID) from row index start without re-parsing targets"""
+        if self.target_kinds is None:
+            self.chat_ids, self.target_kinds = normalize_targets(self.columns.get('target', [""] * self.num_rows))
+        return islice(zip(self, self.target_kinds, self.chat_ids), start, None)
+
+
+# Global upload cache instance
+_upload_cache = None
+
+# Bytes read at a time when hashing an upload
+HASH_BLOCK_SIZE = 1024 * 1024
+
+# Rows per chunk when loading a whole file: the result is held in memory
+# anyway, and large chunks keep per-chunk pandas overhead negligible
+LOAD_CHUNK_SIZE = 10000
+
+
+def _sheet_rows(sheet) -> Iterator[tuple]:
+    """
+    Rows of a read-only worksheet as value tuples, header row first
+    
+    Blank rows before the header and after the last data row are dropped;
+    blank rows between data rows are kept, as pd.read_excel does.
+    """
+    seen_header = False
+    blank_rows = 0
+    for row in sheet.iter_rows(values_only=True):
+        if all(value is None for value in row):
+            if seen_header:
+                blank_rows += 1
+            continue
+        for _ in range(blank_rows):
+            yield ()
+        blank_rows = 0
+        seen_header = True
+        yield row
+
+
+def _iter_sheet_rows(file_path: str) -> Iterator[tuple]:
+    """
+    Stream the first worksheet's rows as value tuples, header row first
+    
+    Uses openpyxl's read-only reader, which parses the sheet XML lazily.
+    """
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        yield from _sheet_rows(workbook.worksheets[0])
+    finally:
+        workbook.close()
+
+
+def upload_format(file_path: str) -> str:
+    """
+    Upload format from a file name: "xlsx", "csv", "tsv" or "parquet"
+    
+    Raises:
+        ValueError: If the extension is not a supported upload format
+    """
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension not in UPLOAD_EXTENSIONS:
+        raise ValueError(f"Unsupported file type '{extension}'; upload one of {', '.join(UPLOAD_EXTENSIONS)}")
+    return extension[1:]
+
+
+def _delimited_encoding(file_path: str) -> str:
+    """
+    Encoding of a CSV/TSV upload
+    
+    UTF-8 (with or without BOM) if the first DELIMITED_SCAN_BYTES decode as
+    UTF-8, else config.CSV_FALLBACK_ENCODING: Excel on Windows saves "CSV"
+    in the system code page (cp1256 for Arabic) rather than UTF-8.
+    """
+    with open(file_path, 'rb') as f:
+        head = f.read(DELIMITED_SCAN_BYTES)
+    try:
+        # Incremental so a character cut off at the end of the block is not an error
+        codecs.getincrementaldecoder('utf-8-sig')().decode(head, final=False)
+        return 'utf-8-sig'
+    except UnicodeDecodeError:
+        return config.CSV_FALLBACK_ENCODING
+
+
+def _decode_error(file_path: str, encoding: str, error: UnicodeDecodeError) -> ValueError:
+    """Readable error for an upload that is not valid text in the chosen encoding"""
+    return ValueError(f"{os.path.basename(file_path)} is not valid {encoding} text "
+                      f"(byte {error.start}); save it as \"CSV UTF-8\" and upload it again")
+
+
+def _parse_delimited(lines: Iterable[str], delimiter: str) -> Iterator[tuple]:
+    """Parse CSV/TSV lines into value tuples; empty cells are None and blank lines are skipped, as pandas does"""
+    for row in csv.reader(lines, delimiter=delimiter):
+        if row:
+            yield tuple(value if value != "" else None for value in row)
+
+
+def _iter_delimited_rows(file_path: str) -> Iterator[tuple]:
+    """
+    Stream a CSV/TSV file's rows as value tuples, header row first
+    
+    Raises:
+        ValueError: If the file is not valid text in its detected encoding
+    """
+    delimiter = '\t' if upload_format(file_path) == 'tsv' else ','
+    encoding = _delimited_encoding(file_path)
+    with open(file_path, newline='', encoding=encoding) as f:
+        try:
+            yield from _parse_delimited(f, delimiter)
+        except UnicodeDecodeError as e:
+            raise _decode_error(file_path, encoding, e) from e
+
+
+def _parquet_file(file_path: str):
+    """Open a Parquet file with pyarrow, which is only needed for Parquet uploads"""
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError("Parquet uploads need the pyarrow package")
+    return pq.ParquetFile(file_path)
+
+
+def _iter_rows(file_path: str) -> Iterator[tuple]:
+    """Stream any row-based upload (.xlsx, .csv, .tsv) as value tuples, header row first"""
+    if upload_format(file_path) == 'xlsx':
+        return _iter_sheet_rows(file_path)
+    return _iter_delimited_rows(file_path)
+
+
+def _cell_text(value) -> str:
+    """
+    Lossless text of a cell holding an ID or phone number
+    
+    Whole-number floats lose their ".0" (201285177841.0 -> "201285177841"),
+    so numeric cells read back as the digits shown in Excel.
+    """
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        if value != value:  # NaN
+            return ""
+        if value.is_integer():
+            return str(int(value))
+        return repr(value)
+    if isinstance(value, datetime):
+        return str(value)
+    return str(value).strip()
+
+
+def _as_identifiers(series: pd.Series) -> List[str]:
+    """
+    ID or phone column values as lossless strings, empty for missing values
+    
+    Float columns (integers with blanks become float64 in pandas) have
+    their whole numbers converted through int64 in one pass, and text
+    columns have a trailing ".0" dropped, instead of keeping the ".0".
+    """
+    if pd.api.types.is_float_dtype(series):
+        text = series.astype(str)
+        whole = series.notna() & (series % 1 == 0) & (series.abs() < 2 ** 63)
+        text[whole] = series[whole].astype('int64').astype(str)
+        return text.where(series.notna(), "").tolist()
+    if pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series):
+        # Text such as "201285177841.0" from a CSV written out of a float column
+        text = series.map(_cell_text).str.replace(r"^(-?\d+)\.0+$", r"\1", regex=True)
+        return text.tolist()
+    return _as_strings(series, strip=True)
+
+
+def _is_identifier_column(name: str) -> bool:
+    """Whether a custom column holds IDs or phone numbers (read as text)"""
+    lowered = name.lower()
+    return any(hint in lowered for hint in IDENTIFIER_COLUMN_HINTS)
+
+
+def normalize_targets(targets: List[str]) -> Tuple[List[Optional[int]], List[str]]:
+    """
+    Classify a column of target strings in one vectorized pass
+    
+    Integers are chat IDs ("123.0" too, as left by float cells; negative
+    for groups). Numbers starting with "+" or "0" are phone numbers, as is
+    any other text (looked up by phone, then by name). Scientific notation
+    is converted to an integer chat ID as before, although Excel already
+    dropped its trailing digits.
+    
+    Args:
+        targets: Target strings, empty for missing targets
+        
+    Returns:
+        Tuple of (chat IDs with None for non-chat-ID rows, target kinds)
+    """
+    text = pd.Series(targets, dtype=object).fillna("").astype(str).str.strip()
+    integer = text.str.fullmatch(_CHAT_ID_RE.pattern) & ~text.str.match(r"0\d")
+    scientific = text.str.fullmatch(_SCIENTIFIC_RE.pattern)
+    
+    kinds = pd.Series(TARGET_PHONE, index=text.index, dtype=object)
+    kinds[integer | scientific] = TARGET_CHAT_ID
+    kinds[text == ""] = TARGET_MISSING
+    
+    chat_ids = [
+        int(value.split('.')[0]) if is_integer else int(float(value)) if is_scientific else None
+        for value, is_integer, is_scientific in zip(text.tolist(), integer.tolist(), scientific.tolist())
+    ]
+    return chat_ids, kinds.tolist()
+
+
+def classify_target(target) -> Tuple[str, Optional[int]]:
+    """
+    Target kind and chat ID of a single target value
+    
+    Same rules as normalize_targets, for rows that did not come from
+    ExcelProcessor (plain dicts, possibly with int or float targets).
+    """
+    text = _cell_text(target)
+    if not text:
+        return TARGET_MISSING, None
+    if _CHAT_ID_RE.fullmatch(text) and not (len(text) > 1 and text[0] == "0" and text[1].isdigit()):
+        return TARGET_CHAT_ID, int(text.split('.')[0])
+    if _SCIENTIFIC_RE.fullmatch(text):
+        return TARGET_CHAT_ID, int(float(text))
+    return TARGET_PHONE, None
+
+
+def _as_strings(series: pd.Series, strip: bool = False) -> List[str]:
+    """
+    Column values as strings, empty for missing values
+    
+    Converts the whole column at once instead of calling str() per cell;
+    datetimes keep the "YYYY-MM-DD HH:MM:SS" form str() gives.
+    """
+    if pd.api.types.is_datetime64_any_dtype(series):
+        text = series.map(str)
+    else:
+        text = series.astype(str)
+    if strip:
+        text = text.str.strip()
+    return text.where(series.notna(), "").tolist()
+
+
+def _column_names(header: tuple) -> List[str]:
+    """Column names from a header row, named like pandas for blank and duplicate headers"""
+    names = []
+    seen = {}
+    for idx, value in enumerate(header):
+        name = f"Unnamed: {idx}" if value is None else str(value).strip()
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
 class ExcelProcessor:
-    """Process Excel files efficiently with chunked reading"""
+    """Process uploaded Excel, CSV/TSV and Parquet files efficiently with chunked reading"""
     
     CHUNK_SIZE = 100  # Process rows in chunks of 100
     
     @staticmethod
-    def read_excel_chunked(file_path: str, chunk_size: int = CHUNK_SIZE) -> pd.DataFrame:
+    def read_excel_chunked(file_path: str, chunk_size: int = CHUNK_SIZE,
+                           text_columns: Optional[List[str]] = None) -> Iterator[pd.DataFrame]:
         """
-        Read Excel file efficiently
+        Stream an upload in fixed-size chunks
+        
+        Dispatches on the file type. A sheet is read with openpyxl in
+        read-only mode; CSV/TSV with pandas' chunked C parser and Parquet
+        by record batch, both several times faster than .xlsx. Only one
+        chunk of rows is held in memory at a time regardless of file size.
+        Column types are inferred per chunk from the values, except for
+        text_columns, which are read as lossless strings so IDs never pass
+        through float.
         
         Args:
-            file_path: Path to Excel file
-            chunk_size: Size of chunks for processing
+            file_path: Path to .xlsx, .csv, .tsv or .parquet file
+            chunk_size: Rows per chunk
+            text_columns: Columns read as strings (e.g. chat IDs and phones)
             
-        Returns:
-            DataFrame with all data
+        Yields:
+            DataFrame of up to chunk_size rows with the file's header as columns
         """
+        file_format = upload_format(file_path)
+        if file_format in ('csv', 'tsv'):
+            yield from ExcelProcessor._read_delimited_chunked(file_path, chunk_size, text_columns)
+            return
+        if file_format == 'parquet':
+            for batch in _parquet_file(file_path).iter_batches(batch_size=chunk_size):
+                yield batch.to_pandas()
+            return
+        
         try:
-            # Try with openpyxl for .xlsx files
-            df = pd.read_excel(file_path, engine='openpyxl')
-            return df
+            rows = _iter_sheet_rows(file_path)
+            header = next(rows, None)
+            if header is None:
+                return
+            columns = _column_names(header)
+            width = len(columns)
+            text_indexes = [idx for idx, name in enumerate(columns) if name in (text_columns or ())]
+            
+            chunk = []
+            for row in rows:
+                # Pad short rows and drop cells beyond the header
+                row = (tuple(row) + (None,) * width)[:width]
+                if text_indexes:
+                    row = list(row)
+                    for idx in text_indexes:
+                        row[idx] = _cell_text(row[idx])
+                chunk.append(row)
+                if len(chunk) >= chunk_size:
+                    yield pd.DataFrame.from_records(chunk, columns=columns)
+                    chunk = []
+            if chunk:
+                yield pd.DataFrame.from_records(chunk, columns=columns)
         except Exception as e:
             logger.error(f"Error reading Excel file {file_path}: {e}")
             raise
     
+    @staticmethod
+    def _read_delimited_chunked(file_path: str, chunk_size: int,
+                                text_columns: Optional[List[str]]) -> Iterator[pd.DataFrame]:
+        """Stream a CSV/TSV file with pandas, named like sheet columns"""
+        rows = _iter_delimited_rows(file_path)
+        header = next(rows, None)
+        rows.close()
+        if header is None:
+            return
+        columns = _column_names(header)
+        dtype = {name: str for name in columns if name in (text_columns or ())}
+        encoding = _delimited_encoding(file_path)
+        try:
+            reader = pd.read_csv(
+                file_path, sep='\t' if upload_format(file_path) == 'tsv' else ',',
+                header=0, names=columns, index_col=False, dtype=dtype,
+                encoding=encoding, chunksize=chunk_size
+            )
+            with reader:
+                yield from reader
+        except UnicodeDecodeError as e:
+            logger.error(f"Error reading file {file_path}: {e}")
+            raise _decode_error(file_path, encoding, e) from e
+        except Exception as e:
+            logger.error(f"Error reading file {file_path}: {e}")
+            raise
+    
     @staticmethod
     def validate_columns(df: pd.DataFrame, required_columns: List[str]) -> Tuple[bool, str]:
         """
@@ -53,99 +440,550 @@ class ExcelProcessor:
     
     @staticmethod
     def prepare_personalized_rows(
-        df: pd.DataFrame,
+        df: Union[pd.DataFrame, Iterable[pd.DataFrame]],
         target_column: str,
         custom_columns: List[str],
-        progress_callback=None
+        progress_callback=None,
+        total_rows: Optional[int] = None
     ) -> List[Dict]:
         """
         Prepare rows for personalized messaging
         Converts DataFrame to list of dictionaries with proper column mapping
         
+        Each chunk is prepared column by column (see prepare_personalized_columns)
+        and turned into row dicts in one pass.
+        
         Args:
-            df: DataFrame from Excel
+            df: DataFrame from Excel, or chunks from read_excel_chunked
+                (consumed one at a time)
             target_column: Column name for message target (chat_id)
             custom_columns: Additional columns to include
             progress_callback: Function to call with (current, total) progress
+                after each chunk
+            total_rows: Total row count for progress when passing chunks
             
         Returns:
             List of prepared row dictionaries
         """
         rows = []
-        total_rows = len(df)
+        if isinstance(df, pd.DataFrame):
+            total_rows = len(df)
+            df = [df]
         
-        for idx, row in df.iterrows():
-            row_dict = row.to_dict()
-            
-            # Get target value and convert to string to preserve formatting
-            target_value = row_dict.get(target_column)
-            
-            # Critical: Convert to string early to prevent scientific notation loss
-            if target_value is not None:
-                target_str = str(target_value).strip()
-            else:
-                target_str = ""
-            
-            # Create new dict with 'target' key pointing to target_column value
-            prepared_row = {
-                'target': target_str,
-            }
-            
-            # Add selected custom columns
-            for col in custom_columns:
-                value = row_dict.get(col)
-                # Handle NaN values
-                if pd.isna(value):
-                    prepared_row[col] = ""
-                else:
-                    prepared_row[col] = str(value)
-            
-            rows.append(prepared_row)
-            
-            # Call progress callback every 10 rows
-            if progress_callback and (idx + 1) % 10 == 0:
-                progress_callback(idx + 1, total_rows)
+        for chunk in df:
+            rows.extend(ExcelProcessor.prepare_personalized_columns(chunk, target_column, custom_columns))
+            if progress_callback:
+                progress_callback(len(rows), max(total_rows or 0, len(rows)))
         
         # Final progress callback
         if progress_callback:
-            progress_callback(total_rows, total_rows)
+            progress_callback(len(rows), len(rows))
         
         return rows
     
+    @staticmethod
+    def prepare_personalized_columns(
+        df: pd.DataFrame,
+        target_column: str,
+        custom_columns: List[str]
+    ) -> ColumnBatch:
+        """
+        Prepare personalized-message data as a ColumnBatch
+        
+        "target" plus the custom columns as strings, empty for missing
+        values; each column is converted in one vectorized pass. The target
+        and any phone/ID custom columns keep whole numbers without ".0",
+        and targets are normalized into chat IDs and target kinds so the
+        sender never re-parses them.
+        
+        Args:
+            df: DataFrame from Excel
+            target_column: Column name for message target (chat_id)
+            custom_columns: Additional columns to include
+            
+        Returns:
+            ColumnBatch with a "target" column and one column per custom column
+        """
+        num_rows = len(df)
+        columns = {}
+        
+        # Critical: Convert to string early to prevent scientific notation loss
+        if target_column in df.columns:
+            columns['target'] = _as_identifiers(df[target_column])
+        else:
+            columns['target'] = [""] * num_rows
+        
+        for col in custom_columns:
+            if col not in df.columns:
+                columns[col] = [""] * num_rows
+            elif _is_identifier_column(col):
+                columns[col] = _as_identifiers(df[col])
+            else:
+                columns[col] = _as_strings(df[col])
+        
+        chat_ids, target_kinds = normalize_targets(columns['target'])
+        return ColumnBatch(columns=columns, num_rows=num_rows, chat_ids=chat_ids, target_kinds=target_kinds)
+    
+    @staticmethod
+    def text_columns(target_column: str, custom_columns: List[str]) -> List[str]:
+        """Columns to read as strings: the target and phone/ID custom columns"""
+        return [target_column] + [col for col in custom_columns if _is_identifier_column(col)]
+    
     @staticmethod
     def get_excel_preview(file_path: str, num_rows: int = 5) -> Dict:
         """
-        Get preview of Excel file for UI display
+        Get preview of an uploaded file for UI display
+        
+        Reads only the header and the first num_rows rows; the row count is
+        taken from the sheet's stored dimensions (or Parquet metadata), so
+        large files preview in milliseconds. Sheets without usable
+        dimensions are counted by streaming the rest. CSV/TSV rows are
+        counted in the first DELIMITED_SCAN_BYTES only and extrapolated from
+        there for larger files (row_count_estimated is then True).
         
         Args:
-            file_path: Path to Excel file
+            file_path: Path to .xlsx, .csv, .tsv or .parquet file
             num_rows: Number of rows to preview
             
         Returns:
-            Dictionary with columns and sample data
+            Dictionary with columns, sample data (first row), sample rows,
+            row count and whether the count is an estimate
         """
         try:
-            df = pd.read_excel(file_path)
-            
-            if df.empty:
+            file_format = upload_format(file_path)
+            estimated = False
+            if file_format == 'xlsx':
+                header, samples, row_count = _preview_sheet(file_path, num_rows)
+            elif file_format == 'parquet':
+                header, samples, row_count = _preview_parquet(file_path, num_rows)
+            else:
+                header, samples, row_count, estimated = _preview_delimited(file_path, num_rows)
+            if header is None or not samples:
                 return {'error': 'File is empty'}
             
-            columns = list(df.columns)
-            
-            # Get first row as sample
-            sample_data = df.iloc[0].to_dict()
-            sample_data_serialized = {}
-            for key, value in sample_data.items():
-                if pd.isna(value):
-                    sample_data_serialized[key] = '[empty]'
-                else:
-                    sample_data_serialized[key] = str(value)
+            columns = _column_names(header)
+            sample_rows = [
+                {col: '[empty]' if value is None else str(value) for col, value in zip(columns, row)}
+                for row in samples
+            ]
+            for row in sample_rows:
+                for col in columns:
+                    row.setdefault(col, '[empty]')
             
             return {
                 'columns': columns,
-                'sample_data': sample_data_serialized,
-                'row_count': len(df)
+                'sample_data': sample_rows[0],
+                'sample_rows': sample_rows,
+                'row_count': row_count,
+                'row_count_estimated': estimated
             }
         except Exception as e:
             logger.error(f"Error previewing Excel: {e}")
             return {'error': str(e)}
+
+
+def _preview_sheet(file_path: str, num_rows: int) -> Tuple[Optional[tuple], List[tuple], int]:
+    """Header, first rows and row count of a workbook's first sheet"""
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        rows = _sheet_rows(sheet)
+        header = next(rows, None)
+        samples = list(islice(rows, num_rows))
+        
+        # Dimensions include the header; some writers store none or a bogus "A1"
+        dimension_rows = (sheet.max_row or 0) - 1
+        row_count = dimension_rows
+        if dimension_rows < len(samples):
+            row_count = len(samples) + sum(1 for _ in rows)
+        return header, samples, row_count
+    finally:
+        workbook.close()
+
+
+def _preview_delimited(file_path: str, num_rows: int) -> Tuple[Optional[tuple], List[tuple], int, bool]:
+    """
+    Header, first rows, row count and whether the count is estimated, of a CSV/TSV file
+    
+    Rows are counted in the first DELIMITED_SCAN_BYTES; a larger file's
+    count is extrapolated from the bytes per row seen there instead of
+    reading the whole file.
+    """
+    rows = _iter_delimited_rows(file_path)
+    header = next(rows, None)
+    samples = list(islice(rows, num_rows))
+    rows.close()
+    
+    size = os.path.getsize(file_path)
+    with open(file_path, 'rb') as f:
+        head = f.read(DELIMITED_SCAN_BYTES)
+    estimated = len(head) < size
+    if estimated:
+        # Count whole lines only
+        head = head[:head.rfind(b'\n') + 1]
+    text = head.decode(_delimited_encoding(file_path), errors='replace')
+    delimiter = '\t' if upload_format(file_path) == 'tsv' else ','
+    row_count = max(0, sum(1 for _ in _parse_delimited(io.StringIO(text, newline=''), delimiter)) - 1)
+    if estimated and head:
+        row_count = round(row_count * size / len(head))
+    return header, samples, max(row_count, len(samples)), estimated
+
+
+def _preview_parquet(file_path: str, num_rows: int) -> Tuple[Optional[tuple], List[tuple], int]:
+    """Header, first rows and row count of a Parquet file (count from metadata)"""
+    parquet = _parquet_file(file_path)
+    header = tuple(parquet.schema_arrow.names)
+    batch = next(parquet.iter_batches(batch_size=num_rows), None)
+    samples = []
+    if batch is not None:
+        samples = list(zip(*(column.to_pylist() for column in batch.columns)))[:num_rows]
+    return header or None, samples, parquet.metadata.num_rows
+
+
+def _remove_export_file(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class XlsxExportWriter:
+    """
+    Constant-memory .xlsx export written to a temp file
+
+    Rows are appended in batches (e.g. straight from a database cursor) to
+    an openpyxl write-only workbook, so only one batch is in memory at a
+    time. With autosize, column widths are tracked while rows are written;
+    a write-only sheet needs its widths before the first row, so the rows
+    are buffered on disk and written out on close.
+    """
+
+    def __init__(self, headers: List[str], sheet_name: str, autosize: bool = False):
+        """
+        Initialize writer
+
+        Args:
+            headers: Column headers (first row)
+            sheet_name: Worksheet name
+            autosize: Fit column widths to their longest value
+        """
+        self.headers = list(headers)
+        self.sheet_name = sheet_name
+        self.autosize = autosize
+        self.widths = [len(str(h)) for h in headers]
+        self.num_rows = 0
+        fd, self.path = tempfile.mkstemp(suffix='.xlsx')
+        os.close(fd)
+        self._buffer = tempfile.TemporaryFile() if autosize else None
+        self._workbook = None
+        self._sheet = None
+        if not autosize:
+            self._open_sheet()
+
+    def _open_sheet(self):
+        self._workbook = Workbook(write_only=True)
+        self._sheet = self._workbook.create_sheet(self.sheet_name)
+        if self.autosize:
+            for idx, width in enumerate(self.widths, 1):
+                self._sheet.column_dimensions[get_column_letter(idx)].width = width + 2
+        self._sheet.append(self.headers)
+
+    def write_rows(self, rows: Iterable[tuple]):
+        """Append a batch of rows (one value per header)"""
+        rows = [tuple(row) for row in rows]
+        self.num_rows += len(rows)
+        if not self.autosize:
+            for row in rows:
+                self._sheet.append(row)
+            return
+        for row in rows:
+            for idx, value in enumerate(row):
+                if value is not None:
+                    self.widths[idx] = max(self.widths[idx], len(str(value)))
+        pickle.dump(rows, self._buffer, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def close(self) -> str:
+        """
+        Finish the workbook
+
+        Returns:
+            Path of the .xlsx file; the caller removes it after use
+        """
+        if self.autosize:
+            self._open_sheet()
+            self._buffer.seek(0)
+            while True:
+                try:
+                    batch = pickle.load(self._buffer)
+                except EOFError:
+                    break
+                for row in batch:
+                    self._sheet.append(row)
+            self._buffer.close()
+        self._workbook.save(self.path)
+        return self.path
+
+    def discard(self):
+        """Drop an unfinished export and remove its temp file"""
+        if self._buffer is not None:
+            self._buffer.close()
+        if self._sheet is not None:
+            # Finish the sheet's own scratch stream instead of leaving it to the garbage collector
+            self._sheet.close()
+        self._workbook = self._sheet = None
+        _remove_export_file(self.path)
+
+    def __enter__(self) -> 'XlsxExportWriter':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # A failed export (e.g. a cursor error) must not leave its partial file behind
+        if exc_type is not None:
+            self.discard()
+
+
+class CsvExportWriter:
+    """Streaming .csv export written to a temp file (same interface as XlsxExportWriter)"""
+
+    def __init__(self, headers: List[str]):
+        """
+        Initialize writer
+
+        Args:
+            headers: Column headers (first row)
+        """
+        fd, self.path = tempfile.mkstemp(suffix='.csv')
+        self._file = os.fdopen(fd, 'w', newline='', encoding='utf-8')
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(headers)
+        self.num_rows = 0
+
+    def write_rows(self, rows: Iterable[tuple]):
+        """Append a batch of rows"""
+        rows = list(rows)
+        self._writer.writerows(rows)
+        self.num_rows += len(rows)
+
+    def close(self) -> str:
+        """Finish the file and return its path; the caller removes it after use"""
+        self._file.close()
+        return self.path
+
+    def discard(self):
+        """Drop an unfinished export and remove its temp file"""
+        self._file.close()
+        _remove_export_file(self.path)
+
+    def __enter__(self) -> 'CsvExportWriter':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.discard()
+
+
+class ExcelRowStream:
+    """
+    Prepared personalized-message rows streamed from an uploaded file
+    
+    Iterating re-opens the file and prepares one chunk at a time, so a send
+    loop over a 100k-row sheet keeps only chunk_size rows in memory. Can be
+    passed wherever a list of row dicts is expected (len() and iteration).
+    """
+    
+    def __init__(self, file_path: str, target_column: str, custom_columns: List[str],
+                 num_rows: int, chunk_size: int = ExcelProcessor.CHUNK_SIZE):
+        """
+        Initialize stream
+        
+        Args:
+            file_path: Path to the uploaded file
+            target_column: Column name for message target
+            custom_columns: Additional columns to include
+            num_rows: Data rows in the file (from count_excel_rows)
+            chunk_size: Rows read and prepared at a time
+        """
+        self.file_path = file_path
+        self.target_column = target_column
+        self.custom_columns = custom_columns
+        self.num_rows = num_rows
+        self.chunk_size = chunk_size
+    
+    def __len__(self) -> int:
+        return self.num_rows
+    
+    def _batches(self) -> Iterator[ColumnBatch]:
+        text_columns = ExcelProcessor.text_columns(self.target_column, self.custom_columns)
+        for chunk in ExcelProcessor.read_excel_chunked(self.file_path, self.chunk_size, text_columns):
+            yield ExcelProcessor.prepare_personalized_columns(chunk, self.target_column, self.custom_columns)
+    
+    def __iter__(self) -> Iterator[Dict]:
+        for batch in self._batches():
+            yield from batch
+    
+    def iter_targets(self, start: int = 0) -> Iterator[Tuple[Dict, str, Optional[int]]]:
+        """Iterate (row, target kind, chat ID) from row index start without re-parsing targets"""
+        targets = (target for batch in self._batches() for target in batch.iter_targets())
+        return islice(targets, start, None)
+
+
+def count_excel_rows(file_path: str) -> int:
+    """
+    Count data rows (excluding the header) by streaming the file
+    
+    Intended to run in the CPU process pool (cpu_pool.run_cpu_bound).
+    """
+    if upload_format(file_path) == 'parquet':
+        return _parquet_file(file_path).metadata.num_rows
+    return max(0, sum(1 for _ in _iter_rows(file_path)) - 1)
+
+
+def load_personalized_columns(file_path: str, target_column: str, custom_columns: List[str]) -> ColumnBatch:
+    """
+    Read an uploaded file and prepare personalized-message data in one step
+    
+    Intended to run in the CPU process pool (cpu_pool.run_cpu_bound): the
+    file is streamed chunk by chunk in the worker process and only the
+    ColumnBatch is sent back.
+    
+    Args:
+        file_path: Path to the uploaded file
+        target_column: Column name for message target
+        custom_columns: Additional columns to include
+        
+    Returns:
+        ColumnBatch of prepared rows
+    """
+    columns = {name: [] for name in ['target'] + list(custom_columns)}
+    chat_ids, target_kinds = [], []
+    num_rows = 0
+    text_columns = ExcelProcessor.text_columns(target_column, custom_columns)
+    for chunk in ExcelProcessor.read_excel_chunked(file_path, LOAD_CHUNK_SIZE, text_columns):
+        batch = ExcelProcessor.prepare_personalized_columns(chunk, target_column, custom_columns)
+        for name, values in batch.columns.items():
+            columns[name].extend(values)
+        chat_ids.extend(batch.chat_ids)
+        target_kinds.extend(batch.target_kinds)
+        num_rows += batch.num_rows
+    return ColumnBatch(columns=columns, num_rows=num_rows, chat_ids=chat_ids, target_kinds=target_kinds)
+
+
+def file_digest(file_path: str) -> str:
+    """SHA-256 of a file's contents, read in blocks"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class UploadCache:
+    """
+    Parse-once cache for uploaded files
+    
+    Keeps each upload's preview and its prepared ColumnBatch per
+    (target column, custom columns) mapping, keyed by path and content
+    hash, so /send validation and the send task (including a resume after
+    pause) reuse what was already parsed. Entries are checked against the
+    file's size and mtime and re-hashed only if those changed. Only files
+    up to max_rows rows are kept as prepared columns; larger ones are
+    streamed by the send task instead.
+    """
+    
+    def __init__(self, max_entries: int = 8, max_rows: int = 20000):
+        """
+        Initialize cache
+        
+        Args:
+            max_entries: Uploads kept; least recently used are dropped first
+            max_rows: Largest row count whose prepared columns are cached
+        """
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self._entries = OrderedDict()  # path -> entry dict
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def _stat(file_path: str) -> Tuple[int, int]:
+        st = os.stat(file_path)
+        return st.st_size, st.st_mtime_ns
+    
+    def _entry(self, file_path: str) -> Optional[Dict]:
+        """Get the entry for a path if the file still has the cached content"""
+        key = os.path.abspath(file_path)
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return None
+        try:
+            stat = self._stat(file_path)
+            if stat != entry['stat']:
+                if file_digest(file_path) != entry['digest']:
+                    self.discard(file_path)
+                    return None
+                entry['stat'] = stat
+        except OSError:
+            self.discard(file_path)
+            return None
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+        return entry
+    
+    def put_preview(self, file_path: str, preview: Dict):
+        """Cache the preview of a freshly saved upload"""
+        key = os.path.abspath(file_path)
+        entry = {
+            'stat': self._stat(file_path),
+            'digest': file_digest(file_path),
+            'preview': preview,
+            'batches': {},
+        }
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def get_preview(self, file_path: str) -> Optional[Dict]:
+        """Cached preview of an upload, or None if unknown or changed"""
+        entry = self._entry(file_path)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry['preview']
+    
+    def get_rows(self, file_path: str, target_column: str, custom_columns: List[str]) -> Optional[ColumnBatch]:
+        """Cached prepared rows for a column mapping, or None"""
+        entry = self._entry(file_path)
+        batch = entry['batches'].get((target_column, tuple(custom_columns))) if entry else None
+        if batch is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return batch
+    
+    def put_rows(self, file_path: str, target_column: str, custom_columns: List[str], batch: ColumnBatch):
+        """Cache prepared rows of a previewed upload (ignored for unknown or large files)"""
+        entry = self._entry(file_path)
+        if entry is not None and len(batch) <= self.max_rows:
+            entry['batches'][(target_column, tuple(custom_columns))] = batch
+    
+    def discard(self, file_path: str):
+        """Forget an upload (after it was sent and removed)"""
+        with self._lock:
+            self._entries.pop(os.path.abspath(file_path), None)
+
+
+def get_upload_cache() -> UploadCache:
+    """Get or create the global upload cache"""
+    global _upload_cache
+    if _upload_cache is None:
+        _upload_cache = UploadCache(
+            max_entries=config.UPLOAD_CACHE_ENTRIES,
+            max_rows=config.UPLOAD_CACHE_MAX_ROWS
+        )
+    return _upload_cache
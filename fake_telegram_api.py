@@ -0,0 +1,378 @@
+"""
+Local stand-in for the Telegram Bot API, for load and performance tests
+Answers getMe, sendMessage, copyMessage, sendPhoto, getUpdates and
+setWebhook/deleteWebhook with simulated latency, and can inject 429 flood
+errors and 403 blocked-user errors. Point the bot at it with
+TELEGRAM_API_URL=http://127.0.0.1:8081
+
+Run standalone:
+    python fake_telegram_api.py --port 8081 --latency normal --latency-ms 40 --flood-rate 30
+"""
+import json
+import time
+import random
+import logging
+import argparse
+import threading
+import zlib
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qsl, urlsplit
+
+logger = logging.getLogger("telegram_app.fake_api")
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "normal", "exponential")
+
+# Longest getUpdates long poll honoured, in seconds
+MAX_LONG_POLL = 60
+
+FAKE_BOT = {"id": 1000000001, "is_bot": True, "first_name": "Fake Bot", "username": "fake_test_bot",
+            "can_join_groups": True, "can_read_all_group_messages": False, "supports_inline_queries": False}
+
+
+class LatencyModel:
+    """
+    Response delay distribution
+
+    fixed: always mean_ms; uniform: mean_ms +/- jitter_ms; normal: mean_ms
+    with standard deviation jitter_ms (clipped at 0); exponential: mean mean_ms.
+    """
+
+    def __init__(self, distribution: str = "fixed", mean_ms: float = 0, jitter_ms: float = 0,
+                 seed: Optional[int] = None):
+        if distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution {distribution!r}, expected one of {LATENCY_DISTRIBUTIONS}")
+        self.distribution = distribution
+        self.mean = mean_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self) -> float:
+        """Delay in seconds for one request"""
+        if self.mean <= 0 and self.jitter <= 0:
+            return 0.0
+        with self._lock:
+            if self.distribution == "uniform":
+                delay = self._random.uniform(self.mean - self.jitter, self.mean + self.jitter)
+            elif self.distribution == "normal":
+                delay = self._random.gauss(self.mean, self.jitter)
+            elif self.distribution == "exponential":
+                delay = self._random.expovariate(1 / self.mean) if self.mean > 0 else 0.0
+            else:
+                delay = self.mean
+        return max(0.0, delay)
+
+
+class FakeTelegramAPI:
+    """
+    In-process fake Bot API server
+
+    Sends are limited like Telegram's global flood control when flood_rate
+    is set: requests beyond the rate get 429 with retry_after. Chats in
+    blocked_chats, and a stable blocked_ratio share of all chat IDs, get 403
+    as if they had blocked the bot. Counters are available from get_stats()
+    or GET /_stats.
+    """
+
+    SEND_METHODS = ("sendMessage", "copyMessage", "sendPhoto")
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: Optional[LatencyModel] = None,
+                 flood_rate: float = 0, retry_after: int = 5, flood_probability: float = 0,
+                 blocked_chats=(), blocked_ratio: float = 0, seed: Optional[int] = None):
+        """
+        Initialize server (call start() to serve)
+
+        Args:
+            host: Interface to listen on
+            port: Port to listen on (0 = any free port, see url)
+            latency: Delay model for every response except long polls
+            flood_rate: Send requests per second accepted before 429 (0 = unlimited)
+            retry_after: retry_after seconds reported with 429
+            flood_probability: Share of sends answered 429 at random
+            blocked_chats: Chat IDs answered 403
+            blocked_ratio: Share of chat IDs answered 403, chosen stably by chat ID
+            seed: Seed for reproducible latency and random 429s
+        """
+        self.latency = latency or LatencyModel()
+        self.flood_rate = flood_rate
+        self.retry_after = retry_after
+        self.flood_probability = flood_probability
+        self.blocked_chats = set(blocked_chats)
+        self.blocked_ratio = blocked_ratio
+        self._random = random.Random(seed)
+
+        self._lock = threading.Lock()
+        self._updates_ready = threading.Condition(self._lock)
+        self._tokens = flood_rate
+        self._refilled_at = time.monotonic()
+        self._message_id = 0
+        self._update_id = 0
+        self._updates: List[Dict] = []
+        self.webhook_url = ""
+        self.requests: Counter = Counter()
+        self.responses: Counter = Counter()
+        self.sent: Counter = Counter()
+
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """Base URL to use as TELEGRAM_API_URL"""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'FakeTelegramAPI':
+        """Serve in a background thread"""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True, name="FakeTelegramAPI")
+        self._thread.start()
+        logger.info(f"Fake Telegram API listening on {self.url}")
+        return self
+
+    def stop(self):
+        """Stop serving"""
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread.join(timeout=5)
+            self._thread = None
+        self._server.server_close()
+
+    def push_message(self, chat_id: int, text: str, first_name: str = "User") -> Dict:
+        """Queue an incoming text message for getUpdates"""
+        with self._lock:
+            self._message_id += 1
+            message = {
+                "message_id": self._message_id, "date": int(time.time()), "text": text,
+                "chat": {"id": chat_id, "type": "private", "first_name": first_name},
+                "from": {"id": chat_id, "is_bot": False, "first_name": first_name},
+            }
+            if text.startswith("/"):
+                message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+        return self.push_update({"message": message})
+
+    def push_update(self, update: Dict) -> Dict:
+        """Queue a raw update (without update_id) for getUpdates"""
+        with self._lock:
+            self._update_id += 1
+            update = {"update_id": self._update_id, **update}
+            self._updates.append(update)
+            self._updates_ready.notify_all()
+        return update
+
+    def get_stats(self) -> Dict:
+        """Request counters by method, response status and recipient count"""
+        with self._lock:
+            return {
+                'requests': dict(self.requests),
+                'responses': {str(status): count for status, count in self.responses.items()},
+                'recipients': len(self.sent),
+                'messages_delivered': sum(self.sent.values()),
+                'pending_updates': len(self._updates),
+                'webhook_url': self.webhook_url,
+            }
+
+    def reset_stats(self):
+        """Clear request counters"""
+        with self._lock:
+            self.requests.clear()
+            self.responses.clear()
+            self.sent.clear()
+
+    def is_blocked(self, chat_id) -> bool:
+        """Whether a chat answers 403 (stable across runs for blocked_ratio)"""
+        if chat_id in self.blocked_chats:
+            return True
+        if self.blocked_ratio <= 0:
+            return False
+        return zlib.crc32(str(chat_id).encode()) / 2**32 < self.blocked_ratio
+
+    def call(self, method: str, params: Dict):
+        """
+        Answer one Bot API call
+
+        Returns:
+            Tuple of (HTTP status, response dict)
+        """
+        with self._lock:
+            self.requests[method] += 1
+
+        if method == "getUpdates":
+            status, body = self._get_updates(params)
+        else:
+            delay = self.latency.sample()
+            if delay:
+                time.sleep(delay)
+            status, body = self._answer(method, params)
+
+        with self._lock:
+            self.responses[status] += 1
+        return status, body
+
+    def _answer(self, method: str, params: Dict):
+        if method == "getMe":
+            return _ok(FAKE_BOT)
+        if method == "setWebhook":
+            self.webhook_url = params.get("url", "")
+            return _ok(True)
+        if method == "deleteWebhook":
+            self.webhook_url = ""
+            return _ok(True)
+        if method == "getWebhookInfo":
+            return _ok({"url": self.webhook_url, "has_custom_certificate": False, "pending_update_count": 0})
+        if method not in self.SEND_METHODS:
+            return _error(404, "Not Found")
+
+        try:
+            chat_id = int(params["chat_id"])
+        except (KeyError, TypeError, ValueError):
+            return _error(400, "Bad Request: chat not found")
+        if self._flooded():
+            return _error(429, f"Too Many Requests: retry after {self.retry_after}",
+                          parameters={"retry_after": self.retry_after})
+        if self.is_blocked(chat_id):
+            return _error(403, "Forbidden: bot was blocked by the user")
+
+        with self._lock:
+            self._message_id += 1
+            message_id = self._message_id
+            self.sent[chat_id] += 1
+        if method == "copyMessage":
+            return _ok({"message_id": message_id})
+
+        message = {"message_id": message_id, "date": int(time.time()),
+                   "chat": {"id": chat_id, "type": "private"}, "from": FAKE_BOT}
+        if method == "sendPhoto":
+            message["photo"] = [{"file_id": f"photo{message_id}", "file_unique_id": f"p{message_id}",
+                                 "width": 320, "height": 240}]
+            if params.get("caption"):
+                message["caption"] = params["caption"]
+        else:
+            message["text"] = params.get("text", "")
+        return _ok(message)
+
+    def _flooded(self) -> bool:
+        with self._lock:
+            if self.flood_probability and self._random.random() < self.flood_probability:
+                return True
+            if self.flood_rate <= 0:
+                return False
+            now = time.monotonic()
+            self._tokens = min(self.flood_rate, self._tokens + (now - self._refilled_at) * self.flood_rate)
+            self._refilled_at = now
+            if self._tokens < 1:
+                return True
+            self._tokens -= 1
+            return False
+
+    def _get_updates(self, params: Dict):
+        offset = int(params.get("offset") or 0)
+        limit = int(params.get("limit") or 100)
+        deadline = time.monotonic() + min(float(params.get("timeout") or 0), MAX_LONG_POLL)
+        with self._lock:
+            if offset < 0:
+                # Negative offsets count from the end, confirming everything before
+                self._updates = self._updates[offset:]
+            elif offset:
+                self._updates = [u for u in self._updates if u["update_id"] >= offset]
+            while not self._updates and time.monotonic() < deadline:
+                self._updates_ready.wait(deadline - time.monotonic())
+            return _ok(self._updates[:limit])
+
+    def _handler_class(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                self._dispatch()
+
+            def do_POST(self):
+                self._dispatch()
+
+            def _dispatch(self):
+                parts = urlsplit(self.path)
+                params = dict(parse_qsl(parts.query))
+                params.update(self._body_params())
+                path = parts.path.strip("/")
+
+                if path == "_stats":
+                    return self._reply(200, api.get_stats())
+                if path == "_reset":
+                    api.reset_stats()
+                    return self._reply(200, _ok(True)[1])
+                # /bot<token>/<method>
+                segments = path.split("/")
+                if len(segments) != 2 or not segments[0].startswith("bot"):
+                    return self._reply(*_error(404, "Not Found"))
+                self._reply(*api.call(segments[1], params))
+
+            def _body_params(self) -> Dict:
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                content_type = self.headers.get("Content-Type", "")
+                try:
+                    if content_type.startswith("application/json"):
+                        return json.loads(body or b"{}")
+                    if content_type.startswith("application/x-www-form-urlencoded"):
+                        return dict(parse_qsl(body.decode()))
+                except ValueError:
+                    pass
+                # Multipart uploads (sendPhoto with a file) keep their other fields in the query string
+                return {}
+
+            def _reply(self, status: int, body: Dict):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+        return Handler
+
+
+def _ok(result):
+    return 200, {"ok": True, "result": result}
+
+
+def _error(code: int, description: str, **extra):
+    return code, {"ok": False, "error_code": code, "description": description, **extra}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local fake Telegram Bot API server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", choices=LATENCY_DISTRIBUTIONS, default="fixed", help="Latency distribution")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Mean response latency")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="Latency spread (uniform half-width / normal std dev)")
+    parser.add_argument("--flood-rate", type=float, default=0, help="Sends per second before 429 (0 = unlimited)")
+    parser.add_argument("--flood-probability", type=float, default=0, help="Share of sends answered 429 at random")
+    parser.add_argument("--retry-after", type=int, default=5, help="retry_after seconds reported with 429")
+    parser.add_argument("--blocked-ratio", type=float, default=0, help="Share of chats answering 403")
+    parser.add_argument("--blocked-chat", type=int, action="append", default=[], help="Chat ID answering 403")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    api = FakeTelegramAPI(
+        host=args.host, port=args.port,
+        latency=LatencyModel(args.latency, args.latency_ms, args.jitter_ms, seed=args.seed),
+        flood_rate=args.flood_rate, retry_after=args.retry_after, flood_probability=args.flood_probability,
+        blocked_chats=args.blocked_chat, blocked_ratio=args.blocked_ratio, seed=args.seed
+    ).start()
+    print(f"Set TELEGRAM_API_URL={api.url} to use this server; counters at {api.url}/_stats")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        api.stop()
+
+
+if __name__ == "__main__":
+    main()
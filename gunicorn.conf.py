@@ -0,0 +1,20 @@
+"""
+Gunicorn settings, loaded automatically by `gunicorn app:app`
+Threaded workers keep long-lived progress streams (SSE) from blocking other requests.
+Each open stream holds a thread, so every process caps streams at SSE_MAX_STREAMS
+and gets that many threads on top of the ones left for pages, the API and the webhook.
+
+One worker is the default. More workers (WEB_CONCURRENCY) need BOT_MODE=webhook,
+since only one process may long-poll getUpdates, and the shared task status store
+(TASK_STATUS_BACKEND=mongo, the default) so any worker can answer status polls and
+streams for tasks another worker runs; TASK_QUEUE_DURABLE=true also lets any worker
+pause, resume and cancel them.
+"""
+import os
+
+import config
+
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", str(config.SSE_MAX_STREAMS + 8)))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
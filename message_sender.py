@@ -3,19 +3,54 @@ Optimized message sending functions with progress tracking and batching
 """
 import time
 import logging
+from itertools import islice
 from typing import List, Dict, Callable, Optional
 from config import SEND_DELAY
 from database import db
 from bot_handler import bot
+from send_scheduler import SendFlow
+from task_queue import TaskControl
+from excel_processor import TARGET_CHAT_ID, TARGET_MISSING, classify_target
 
 logger = logging.getLogger("message_sender")
 
 
+def _checkpoint(position: int, sent: List, failed: List, total: int, resumed: Optional[Dict]) -> Dict:
+    """
+    Partial result of a send loop, used to resume it and as the result of a cancelled task
+    
+    Args:
+        position: Index of the next row/chat ID to send
+        sent: Recipients sent to since the loop (re)started
+        failed: (target, reason) failures since the loop (re)started
+        total: Total rows/chat IDs
+        resumed: Checkpoint the loop was resumed from, if any
+    """
+    resumed = resumed or {}
+    return {
+        'position': position,
+        'sent': resumed.get('sent', 0) + len(sent),
+        'failed': resumed.get('failed', 0) + len(failed),
+        'total': total,
+        'failed_details': (list(resumed.get('failed_details', [])) + failed[:10])[:10],
+    }
+
+
+def _final_result(sent: List, failed: List, total: int, resumed: Optional[Dict]) -> Dict:
+    """Build the 'sent', 'failed', 'total', 'failed_details' result dict"""
+    result = _checkpoint(total, sent, failed, total, resumed)
+    del result['position']
+    return result
+
+
 def send_personalized_from_template_optimized(
     template: str,
     rows: List[Dict],
     delay: float = SEND_DELAY,
-    progress_callback: Optional[Callable] = None
+    progress_callback: Optional[Callable] = None,
+    flow: Optional[SendFlow] = None,
+    control: Optional[TaskControl] = None,
+    checkpoint: Optional[Dict] = None
 ) -> Dict:
     """
     Send personalized messages using a template and data from rows
@@ -23,9 +58,17 @@ def send_personalized_from_template_optimized(
     
     Args:
         template: Message template string with {column_name} placeholders
-        rows: List of dicts with "target" and other data columns
+        rows: List of dicts with "target" and other data columns, or any
+            sized iterable of them such as excel_processor.ExcelRowStream or
+            row_spool.SpooledRows; targets of those rows are used as
+            normalized at parse time
         delay: Delay between sends in seconds
         progress_callback: Optional callback(current_index, total) for progress tracking
+        flow: Optional SendFlow from the fair-share scheduler; replaces the
+            fixed delay so concurrent campaigns share the send rate
+        control: Optional TaskControl checked between messages so the task
+            can be cancelled or paused
+        checkpoint: Checkpoint from a paused run to continue from
         
     Returns:
         Dict with 'sent', 'failed', 'total', and 'failed_details'
@@ -33,11 +76,21 @@ def send_personalized_from_template_optimized(
     sent = []
     failed = []
     total_rows = len(rows)
+    start = checkpoint['position'] if checkpoint else 0
     
-    for idx, row in enumerate(rows):
+    # Rows from ExcelProcessor carry targets already normalized at parse time
+    if hasattr(rows, 'iter_targets'):
+        targets = rows.iter_targets(start)
+    else:
+        targets = ((row, *classify_target(row.get("target"))) for row in islice(rows, start, None))
+    
+    for idx, (row, kind, cid) in enumerate(targets, start):
+        if control is not None:
+            control.check(_checkpoint(idx, sent, failed, total_rows, checkpoint))
+        
         target = row.get("target")
         
-        if not target:
+        if kind == TARGET_MISSING:
             failed.append((target, "Missing target"))
             if progress_callback:
                 progress_callback(idx + 1, total_rows)
@@ -52,25 +105,10 @@ def send_personalized_from_template_optimized(
                 progress_callback(idx + 1, total_rows)
             continue
 
-        # Convert target to string and clean it
         target_str = str(target).strip()
         
-        # Try to parse as chat_id (numeric value)
-        cid = None
-        try:
-            # Remove spaces, handle scientific notation, convert to int
-            if 'E' in target_str.upper():
-                # Handle scientific notation (2.01285E+11 → 201285000000)
-                cid = int(float(target_str))
-            else:
-                # Try direct int conversion
-                cid = int(target_str)
-        except (ValueError, TypeError):
-            # Not a valid number, will try as phone/name lookup
-            pass
-        
-        # If successfully parsed as chat_id, send directly
-        if cid is not None:
+        # If the target is a chat_id, send directly
+        if kind == TARGET_CHAT_ID:
             try:
                 bot.send_message(cid, message)
                 sent.append(cid)
@@ -98,26 +136,27 @@ def send_personalized_from_template_optimized(
                         failed.append((cid, str(e)))
                         logger.warning(f"Failed to send to {cid}: {e}")
         
-        # Sleep with delay
-        time.sleep(delay)
+        # Wait for the next send slot
+        if flow is not None:
+            flow.wait()
+        else:
+            time.sleep(delay)
         
         # Call progress callback
         if progress_callback:
             progress_callback(idx + 1, total_rows)
     
-    return {
-        'sent': len(sent),
-        'failed': len(failed),
-        'total': total_rows,
-        'failed_details': failed[:10]  # Keep first 10 failures
-    }
+    return _final_result(sent, failed, total_rows, checkpoint)
 
 
 def send_bulk_optimized(
     chat_ids: List[int],
     message: str,
     delay: float = SEND_DELAY,
-    progress_callback: Optional[Callable] = None
+    progress_callback: Optional[Callable] = None,
+    flow: Optional[SendFlow] = None,
+    control: Optional[TaskControl] = None,
+    checkpoint: Optional[Dict] = None
 ) -> Dict:
     """
     Send the same message to multiple chat IDs
@@ -128,6 +167,11 @@ def send_bulk_optimized(
         message: Message text
         delay: Delay between sends in seconds
         progress_callback: Optional callback(current_index, total) for progress tracking
+        flow: Optional SendFlow from the fair-share scheduler; replaces the
+            fixed delay so concurrent campaigns share the send rate
+        control: Optional TaskControl checked between messages so the task
+            can be cancelled or paused
+        checkpoint: Checkpoint from a paused run to continue from
         
     Returns:
         Dict with 'sent', 'failed', 'total', and 'failed_details'
@@ -135,8 +179,12 @@ def send_bulk_optimized(
     sent = []
     failed = []
     total_ids = len(chat_ids)
+    start = checkpoint['position'] if checkpoint else 0
     
-    for idx, cid in enumerate(chat_ids):
+    for idx, cid in enumerate(islice(chat_ids, start, None), start):
+        if control is not None:
+            control.check(_checkpoint(idx, sent, failed, total_ids, checkpoint))
+        
         try:
             bot.send_message(cid, message)
             sent.append(cid)
@@ -145,26 +193,27 @@ def send_bulk_optimized(
             failed.append((cid, str(e)))
             logger.warning(f"Failed to send to {cid}: {e}")
         
-        # Sleep with delay
-        time.sleep(delay)
+        # Wait for the next send slot
+        if flow is not None:
+            flow.wait()
+        else:
+            time.sleep(delay)
         
         # Call progress callback
         if progress_callback:
             progress_callback(idx + 1, total_ids)
     
-    return {
-        'sent': len(sent),
-        'failed': len(failed),
-        'total': total_ids,
-        'failed_details': failed[:10]
-    }
+    return _final_result(sent, failed, total_ids, checkpoint)
 
 
 def send_template_to_selected_optimized(
     chat_ids: List[int],
     template: str,
     delay: float = SEND_DELAY,
-    progress_callback: Optional[Callable] = None
+    progress_callback: Optional[Callable] = None,
+    flow: Optional[SendFlow] = None,
+    control: Optional[TaskControl] = None,
+    checkpoint: Optional[Dict] = None
 ) -> Dict:
     """
     Send templated message to specific chat IDs
@@ -175,6 +224,11 @@ def send_template_to_selected_optimized(
         template: Message template
         delay: Delay between sends in seconds
         progress_callback: Optional callback(current_index, total) for progress tracking
+        flow: Optional SendFlow from the fair-share scheduler; replaces the
+            fixed delay so concurrent campaigns share the send rate
+        control: Optional TaskControl checked between messages so the task
+            can be cancelled or paused
+        checkpoint: Checkpoint from a paused run to continue from
         
     Returns:
         Dict with 'sent', 'failed', 'total', and 'failed_details'
@@ -182,8 +236,12 @@ def send_template_to_selected_optimized(
     sent = []
     failed = []
     total_ids = len(chat_ids)
+    start = checkpoint['position'] if checkpoint else 0
     
-    for idx, cid in enumerate(chat_ids):
+    for idx, cid in enumerate(islice(chat_ids, start, None), start):
+        if control is not None:
+            control.check(_checkpoint(idx, sent, failed, total_ids, checkpoint))
+        
         try:
             bot.send_message(cid, template)
             sent.append(cid)
@@ -192,16 +250,14 @@ def send_template_to_selected_optimized(
             failed.append((cid, str(e)))
             logger.warning(f"Failed to send to {cid}: {e}")
         
-        # Sleep with delay
-        time.sleep(delay)
+        # Wait for the next send slot
+        if flow is not None:
+            flow.wait()
+        else:
+            time.sleep(delay)
         
         # Call progress callback
         if progress_callback:
             progress_callback(idx + 1, total_ids)
     
-    return {
-        'sent': len(sent),
-        'failed': len(failed),
-        'total': total_ids,
-        'failed_details': failed[:10]
-    }
+    return _final_result(sent, failed, total_ids, checkpoint)
@@ -0,0 +1,186 @@
+"""
+Push notifications for task progress
+Task queue changes are fanned out to Server-Sent Events streams, coalesced so a busy
+campaign sends a few events per second and an idle page costs only keep-alives
+"""
+import json
+import logging
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import config
+
+logger = logging.getLogger("progress_events")
+
+
+class ProgressBroker:
+    """
+    Change feed of task IDs
+
+    Publishers only bump a version number; subscribers ask which tasks
+    changed since the version they last saw and read the current state
+    themselves, so any number of updates between two reads collapse into one.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._versions: Dict[str, int] = {}  # task_id -> version of its last change
+        self.version = 0
+
+    def publish(self, task_id: str):
+        """Record that a task changed and wake waiting streams"""
+        with self._cond:
+            self.version += 1
+            self._versions[task_id] = self.version
+            self._cond.notify_all()
+
+    def forget(self, task_id: str):
+        """Stop tracking an evicted task"""
+        with self._cond:
+            self._versions.pop(task_id, None)
+
+    def wait_for_changes(self, since: int, timeout: float) -> Tuple[int, List[str]]:
+        """
+        Wait until something changes after version `since`
+
+        Args:
+            since: Last version the caller has seen
+            timeout: Maximum seconds to wait
+
+        Returns:
+            Tuple of (current version, task IDs changed after `since`)
+        """
+        with self._cond:
+            if self.version == since:
+                self._cond.wait(timeout)
+            changed = [task_id for task_id, v in self._versions.items() if v > since]
+            return self.version, changed
+
+
+class StreamSlots:
+    """
+    Cap on the SSE streams one process keeps open
+
+    Every open stream holds a web server thread for up to
+    SSE_MAX_STREAM_SECONDS; without a cap a few browser tabs could take all
+    threads and starve ordinary requests, including the bot webhook.
+    """
+
+    def __init__(self, limit: int):
+        """
+        Initialize slots
+
+        Args:
+            limit: Maximum number of streams open at once
+        """
+        self.limit = limit
+        self.open = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> bool:
+        """
+        Take a slot for a new stream
+
+        Returns:
+            True if the stream may open, False if all slots are taken
+        """
+        with self._lock:
+            if self.open >= self.limit:
+                self.rejected += 1
+                return False
+            self.open += 1
+            return True
+
+    def release(self):
+        """Give back the slot of a closed stream"""
+        with self._lock:
+            self.open = max(0, self.open - 1)
+
+
+# Global stream slots instance
+_stream_slots = None
+
+
+def get_stream_slots() -> StreamSlots:
+    """Get or create the process-wide SSE stream slots"""
+    global _stream_slots
+    if _stream_slots is None:
+        _stream_slots = StreamSlots(config.SSE_MAX_STREAMS)
+    return _stream_slots
+
+
+def format_event(event: str, data) -> str:
+    """Encode one SSE message"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def stream_task_events(task_queue, task_id: Optional[str] = None) -> Iterator[str]:
+    """
+    Generate SSE messages for one task, or for the dashboard
+
+    A task stream starts with the task's current state, sends a "task"
+    event whenever it changes and ends once the task is finished. The
+    dashboard stream (task_id None) sends "task" events for every changed
+    task and a "health" event when the queue counters change.
+
+    Tasks run by another process never show up in the local change feed,
+    so their status is re-read every SSE_REMOTE_POLL_INTERVAL seconds.
+    Streams end after SSE_MAX_STREAM_SECONDS; EventSource reconnects.
+
+    Args:
+        task_queue: TaskQueue to follow
+        task_id: Task to follow, or None for all tasks plus queue health
+
+    Yields:
+        SSE-formatted strings
+    """
+    broker = task_queue.events
+    since = broker.version
+    started = time.monotonic()
+    last_sent = 0.0
+    last_state = None
+    last_health = None
+
+    if task_id is not None:
+        status = task_queue.get_status(task_id).to_dict()
+        last_state = status
+        yield format_event("task", status)
+        if status['status'] in ("completed", "failed", "cancelled", "not_found"):
+            return
+    else:
+        yield "retry: 5000\n\n"
+
+    while time.monotonic() - started < config.SSE_MAX_STREAM_SECONDS:
+        # Coalesce: at most one batch of events per SSE_MIN_INTERVAL
+        wait = config.SSE_MIN_INTERVAL - (time.monotonic() - last_sent)
+        if wait > 0:
+            time.sleep(wait)
+
+        timeout = config.SSE_REMOTE_POLL_INTERVAL if task_id is not None else config.SSE_KEEPALIVE_SECONDS
+        since, changed = broker.wait_for_changes(since, timeout)
+
+        messages = []
+        if task_id is not None:
+            status = task_queue.get_status(task_id).to_dict()
+            if status != last_state:
+                last_state = status
+                messages.append(format_event("task", status))
+        else:
+            for changed_id in changed:
+                messages.append(format_event("task", task_queue.get_status(changed_id).to_dict()))
+            health = task_queue.get_health_status()
+            if health != last_health:
+                last_health = health
+                messages.append(format_event("health", health))
+
+        if messages:
+            last_sent = time.monotonic()
+            yield "".join(messages)
+            if task_id is not None and last_state['status'] in ("completed", "failed", "cancelled"):
+                return
+        elif time.monotonic() - last_sent >= config.SSE_KEEPALIVE_SECONDS:
+            # Comment line keeps proxies from closing an idle stream
+            last_sent = time.monotonic()
+            yield ": keep-alive\n\n"
@@ -0,0 +1,100 @@
+"""
+Per-chat cooldown for bot auto-replies
+A user who sends many messages gets one automatic reply per window; the
+rest are counted and left unanswered, keeping outbound rate budget free
+for campaigns
+"""
+import time
+import threading
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+
+import config
+
+# Global cooldown instance
+_reply_cooldown = None
+
+
+class ReplyCooldown:
+    """
+    Remembers which chats were auto-replied to within the last window
+
+    Entries live in a dict of chat ID -> expiry time. Since every entry
+    gets the same window, expiries are created in time order, and a FIFO of
+    (expiry, chat ID) serves as the expiry wheel: expired entries are popped
+    from its front on each check, so memory stays proportional to the chats
+    active within one window (capped at max_chats).
+    """
+
+    def __init__(self, window: float = 60, max_chats: int = 100000):
+        """
+        Initialize cooldown
+
+        Args:
+            window: Seconds after an auto-reply during which further ones are suppressed (0 = never)
+            max_chats: Chats remembered at most; the oldest are forgotten first
+        """
+        self.window = window
+        self.max_chats = max_chats
+        self._expiry: Dict[int, float] = {}
+        self._wheel: Deque[Tuple[float, int]] = deque()
+        self._lock = threading.Lock()
+        self.replied = 0
+        self.suppressed = 0
+
+    def allow(self, chat_id: int, now: Optional[float] = None) -> bool:
+        """
+        Check whether a chat may get an auto-reply now, and record it if so
+
+        Args:
+            chat_id: Telegram chat ID
+            now: Current monotonic time (for tests)
+
+        Returns:
+            False if the chat was auto-replied to within the window
+        """
+        if self.window <= 0:
+            return True
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._expire(now)
+            if chat_id in self._expiry:
+                self.suppressed += 1
+                return False
+            expiry = now + self.window
+            self._expiry[chat_id] = expiry
+            self._wheel.append((expiry, chat_id))
+            if len(self._expiry) > self.max_chats:
+                _, oldest = self._wheel.popleft()
+                self._expiry.pop(oldest, None)
+            self.replied += 1
+            return True
+
+    def _expire(self, now: float):
+        wheel = self._wheel
+        while wheel and wheel[0][0] <= now:
+            _, chat_id = wheel.popleft()
+            self._expiry.pop(chat_id, None)
+
+    def get_stats(self) -> Dict:
+        """Get cooldown statistics"""
+        with self._lock:
+            handled = self.replied + self.suppressed
+            return {
+                'window_seconds': self.window,
+                'chats_cooling_down': len(self._expiry),
+                'replied': self.replied,
+                'suppressed': self.suppressed,
+                'suppressed_pct': round(100 * self.suppressed / handled, 1) if handled else 0,
+            }
+
+
+def get_reply_cooldown() -> ReplyCooldown:
+    """Get or create the global reply cooldown"""
+    global _reply_cooldown
+    if _reply_cooldown is None:
+        _reply_cooldown = ReplyCooldown(
+            window=config.REPLY_COOLDOWN_SECONDS,
+            max_chats=config.REPLY_COOLDOWN_MAX_CHATS
+        )
+    return _reply_cooldown
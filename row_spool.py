@@ -0,0 +1,155 @@
+"""
+Disk-spooled campaign rows
+Large uploads are parsed once into a compact SQLite file that the sender
+reads back with a cursor, so peak memory does not grow with campaign size
+"""
+import os
+import json
+import sqlite3
+import logging
+import tempfile
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import config
+from excel_processor import ExcelProcessor
+
+logger = logging.getLogger("row_spool")
+
+# Rows parsed and written per transaction batch
+SPOOL_CHUNK_SIZE = 2000
+
+# Rows fetched from the cursor at a time while sending
+FETCH_SIZE = 500
+
+
+def spool_path_for(file_path: str) -> str:
+    """Spool file location for an uploaded file"""
+    spool_dir = config.ROW_SPOOL_DIR or tempfile.gettempdir()
+    return os.path.join(spool_dir, os.path.basename(file_path) + ".rows.sqlite")
+
+
+class SpooledRows:
+    """
+    Prepared personalized-message rows stored in a SQLite spool file
+
+    Only the path is kept in memory, so the object is cheap to pickle back
+    from the CPU process pool. Each iteration opens its own connection and
+    fetches FETCH_SIZE rows at a time; resuming at a position is an index
+    lookup instead of re-parsing the upload. Can be passed wherever a list
+    of row dicts is expected (len() and iteration).
+    """
+
+    def __init__(self, spool_path: str):
+        """
+        Open an existing spool
+
+        Args:
+            spool_path: File written by spool_rows
+        """
+        self.spool_path = spool_path
+        conn = sqlite3.connect(spool_path)
+        try:
+            meta = dict(conn.execute("SELECT key, value FROM meta"))
+        finally:
+            conn.close()
+        self.columns: List[str] = json.loads(meta['columns'])
+        self.num_rows = int(meta['num_rows'])
+
+    def __len__(self) -> int:
+        return self.num_rows
+
+    def __iter__(self) -> Iterator[Dict]:
+        for row, _, _ in self.iter_targets():
+            yield row
+
+    def iter_targets(self, start: int = 0) -> Iterator[Tuple[Dict, str, Optional[int]]]:
+        """Iterate (row, target kind, chat ID) from row index start"""
+        conn = sqlite3.connect(self.spool_path)
+        try:
+            cursor = conn.execute(
+                f"SELECT kind, chat_id, {', '.join(_column_ids(self.columns))} FROM rows "
+                "WHERE rowid > ? ORDER BY rowid", (start,)
+            )
+            names = self.columns
+            for records in iter(lambda: cursor.fetchmany(FETCH_SIZE), []):
+                for record in records:
+                    yield dict(zip(names, record[2:])), record[0], record[1]
+        finally:
+            conn.close()
+
+    def remove(self):
+        """Delete the spool file"""
+        try:
+            os.remove(self.spool_path)
+        except OSError:
+            pass
+
+
+def _column_ids(columns: List[str]) -> List[str]:
+    # Column names come from the sheet; store them as c0, c1, ... and keep the names in meta
+    return [f"c{idx}" for idx in range(len(columns))]
+
+
+def spool_rows(file_path: str, target_column: str, custom_columns: List[str],
+               spool_path: str) -> SpooledRows:
+    """
+    Parse an upload chunk by chunk into a SQLite spool
+
+    Intended to run in the CPU process pool (cpu_pool.run_cpu_bound). The
+    spool is written to a temporary name and renamed when complete, so an
+    existing spool file is always whole.
+
+    Args:
+        file_path: Uploaded .xlsx, .csv, .tsv or .parquet file
+        target_column: Column name for message target
+        custom_columns: Additional columns to include
+        spool_path: Spool file to create (see spool_path_for)
+
+    Returns:
+        SpooledRows over the new spool
+    """
+    columns = ['target'] + list(custom_columns)
+    column_ids = _column_ids(columns)
+    partial_path = spool_path + ".part"
+    if os.path.exists(partial_path):
+        os.remove(partial_path)
+
+    conn = sqlite3.connect(partial_path)
+    num_rows = 0
+    try:
+        # The spool is scratch data: skip the journal and fsyncs
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+        conn.execute(f"CREATE TABLE rows (kind TEXT, chat_id INTEGER, {', '.join(f'{c} TEXT' for c in column_ids)})")
+        insert = f"INSERT INTO rows VALUES (?, ?, {', '.join('?' for _ in column_ids)})"
+
+        text_columns = ExcelProcessor.text_columns(target_column, custom_columns)
+        for chunk in ExcelProcessor.read_excel_chunked(file_path, SPOOL_CHUNK_SIZE, text_columns):
+            batch = ExcelProcessor.prepare_personalized_columns(chunk, target_column, custom_columns)
+            conn.executemany(insert, zip(batch.target_kinds, batch.chat_ids, *batch.columns.values()))
+            conn.commit()
+            num_rows += batch.num_rows
+
+        conn.executemany("INSERT INTO meta VALUES (?, ?)", [
+            ('columns', json.dumps(columns)),
+            ('num_rows', str(num_rows)),
+        ])
+        conn.commit()
+    finally:
+        conn.close()
+
+    os.replace(partial_path, spool_path)
+    logger.info(f"Spooled {num_rows} rows of {file_path} to {spool_path}")
+    return SpooledRows(spool_path)
+
+
+def open_spool(spool_path: str) -> Optional[SpooledRows]:
+    """Spool left by an earlier run of the task (e.g. before a pause), or None"""
+    if not os.path.exists(spool_path):
+        return None
+    try:
+        return SpooledRows(spool_path)
+    except (sqlite3.Error, KeyError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable spool {spool_path}: {e}")
+        return None
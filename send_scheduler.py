@@ -0,0 +1,169 @@
+"""
+Fair-share send scheduling across concurrent campaigns
+Interleaves individual sends from active campaigns in weighted round-robin under a global rate
+"""
+import itertools
+import logging
+import threading
+import time
+from typing import Dict
+
+import config
+from task_queue import PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_LOW
+
+logger = logging.getLogger("send_scheduler")
+
+# Share of send slots a campaign gets relative to others, by priority
+PRIORITY_WEIGHTS = {
+    PRIORITY_HIGH: 8,
+    PRIORITY_NORMAL: 2,
+    PRIORITY_LOW: 1,
+}
+
+# Global scheduler instance
+_send_scheduler = None
+
+
+class SendFlow:
+    """
+    One campaign's share of the send scheduler
+
+    Call wait() between messages instead of sleeping; close() (or use as a
+    context manager) when the campaign ends.
+    """
+
+    def __init__(self, scheduler: 'FairShareScheduler', flow_id: str, weight: int,
+                 min_interval: float, pass_value: float, seq: int):
+        self.scheduler = scheduler
+        self.flow_id = flow_id
+        self.weight = weight
+        self.min_interval = min_interval
+        self.pass_value = pass_value  # Virtual time; lowest pass is served next
+        self.seq = seq  # Tie-breaker: older flows first
+        self.next_allowed = 0.0  # Earliest monotonic time this flow may send again
+        self.sends = 0
+
+    def wait(self):
+        """Block until this flow is granted its next send slot"""
+        self.scheduler._wait_turn(self)
+
+    def close(self):
+        """Leave the scheduler"""
+        self.scheduler._close_flow(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+class FairShareScheduler:
+    """
+    Weighted round-robin dispatcher for individual message sends
+
+    Every campaign opens a flow. Send slots are handed out no faster than the
+    global rate, each flow never faster than its own min_interval, and among
+    flows that are waiting the one with the lowest virtual pass is served
+    (stride scheduling): a flow's pass advances by 1/weight per send, so a
+    high-priority flow gets proportionally more slots while a 20k broadcast
+    keeps making progress.
+    """
+
+    def __init__(self, rate: float):
+        """
+        Initialize scheduler
+
+        Args:
+            rate: Maximum sends per second across all flows (0 = unlimited)
+        """
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._cond = threading.Condition()
+        self._flows: Dict[str, SendFlow] = {}
+        self._waiting = set()
+        self._next_slot = 0.0
+        self._seq = itertools.count()
+        self.total_sends = 0
+
+    def open_flow(self, flow_id: str, priority: int = PRIORITY_NORMAL,
+                  min_interval: float = 0.0) -> SendFlow:
+        """
+        Register a campaign with the scheduler
+
+        Args:
+            flow_id: Unique flow ID (usually the task ID)
+            priority: PRIORITY_HIGH, PRIORITY_NORMAL or PRIORITY_LOW
+            min_interval: Minimum seconds between this flow's own sends
+
+        Returns:
+            SendFlow handle
+        """
+        with self._cond:
+            # Start at the current minimum pass so a new flow neither
+            # starves nor is starved by flows that have been running longer
+            start_pass = min((f.pass_value for f in self._flows.values()), default=0.0)
+            flow = SendFlow(
+                self, flow_id,
+                weight=PRIORITY_WEIGHTS.get(priority, PRIORITY_WEIGHTS[PRIORITY_NORMAL]),
+                min_interval=min_interval,
+                pass_value=start_pass,
+                seq=next(self._seq)
+            )
+            self._flows[flow_id] = flow
+        logger.info(f"Send flow {flow_id} opened (weight {flow.weight})")
+        return flow
+
+    def _close_flow(self, flow: SendFlow):
+        with self._cond:
+            if self._flows.get(flow.flow_id) is flow:
+                del self._flows[flow.flow_id]
+            self._waiting.discard(flow)
+            self._cond.notify_all()
+        logger.info(f"Send flow {flow.flow_id} closed after {flow.sends} sends")
+
+    def _wait_turn(self, flow: SendFlow):
+        with self._cond:
+            self._waiting.add(flow)
+            try:
+                while True:
+                    now = time.monotonic()
+                    ready = [f for f in self._waiting if f.next_allowed <= now]
+                    if ready:
+                        best = min(ready, key=lambda f: (f.pass_value, f.seq))
+                        if best is flow and now >= self._next_slot:
+                            break
+
+                    # Sleep until the next moment something could change
+                    wake_at = [self._next_slot] + [f.next_allowed for f in self._waiting]
+                    future = [t for t in wake_at if t > now]
+                    timeout = (min(future) - now) if future else None
+                    self._cond.wait(timeout)
+
+                flow.pass_value += 1.0 / flow.weight
+                flow.next_allowed = now + flow.min_interval
+                flow.sends += 1
+                self._next_slot = now + self.interval
+                self.total_sends += 1
+            finally:
+                self._waiting.discard(flow)
+                self._cond.notify_all()
+
+    def get_stats(self) -> Dict:
+        """Get scheduler statistics"""
+        with self._cond:
+            return {
+                'active_flows': len(self._flows),
+                'waiting_flows': len(self._waiting),
+                'total_sends': self.total_sends,
+                'flows': {f.flow_id: {'weight': f.weight, 'sends': f.sends}
+                          for f in self._flows.values()},
+            }
+
+
+def get_send_scheduler() -> FairShareScheduler:
+    """Get or create the global send scheduler"""
+    global _send_scheduler
+    if _send_scheduler is None:
+        _send_scheduler = FairShareScheduler(rate=config.GLOBAL_SEND_RATE)
+    return _send_scheduler
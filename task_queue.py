@@ -1,20 +1,53 @@
 """
 Background task queue for handling long-running operations asynchronously
 """
+import os
+import socket
 import threading
 import time
 import logging
-from queue import Queue, Empty
-from typing import Dict, List, Callable, Any
+import itertools
+from queue import PriorityQueue, Empty
+from collections import Counter, OrderedDict, deque
+from typing import Dict, List, Callable, Any, Optional
 from dataclasses import dataclass, field
 from datetime import datetime
 import json
+import config
+from progress_events import ProgressBroker
 
 logger = logging.getLogger("task_queue")
 
 # Global task manager instance
 _task_manager = None
 
+# Registered task types that can be persisted in the durable store
+TASK_TYPES: Dict[str, Callable] = {}
+
+# Per task type hooks releasing resources of tasks cancelled before they could finish
+TASK_CLEANUPS: Dict[str, Callable] = {}
+
+# Seconds an idle worker waits before polling the durable store again
+DURABLE_POLL_INTERVAL = 1
+
+# Seconds between watchdog scans of running tasks' deadlines (and autoscaling checks)
+WATCHDOG_INTERVAL = 1
+
+# Seconds over which the reported average worker utilization is smoothed
+UTILIZATION_WINDOW = 60
+
+# Task priorities (lower value runs first)
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+PRIORITY_NAMES = {"high": PRIORITY_HIGH, "normal": PRIORITY_NORMAL, "low": PRIORITY_LOW}
+
+# Statuses after which a task never changes again
+FINISHED_STATUSES = ("completed", "failed", "cancelled")
+
+# Number of task IDs kept in the recency index for "recent tasks" queries
+RECENT_INDEX_SIZE = 100
+
 # Loop detection constants
 MAX_SAME_TASK_RETRIES = 2  # Allow max 2 runs of same task_id
 RAPID_TASK_THRESHOLD = 5  # Alert if more than 5 tasks in 10 seconds
@@ -24,14 +57,18 @@ RAPID_TASK_TIME_WINDOW = 10  # Time window in seconds
 class TaskResult:
     """Result of a completed task"""
     task_id: str
-    status: str  # "pending", "running", "completed", "failed"
+    status: str  # "pending", "running", "paused", "completed", "failed", "cancelled"
     progress: int = 0  # percentage 0-100
+    priority: int = PRIORITY_NORMAL
     message: str = ""
     data: Any = None
     created_at: datetime = field(default_factory=datetime.utcnow)
     started_at: datetime = None
     completed_at: datetime = None
     error: str = None
+    worker_id: str = None  # Worker that executed the task
+    rate: Optional[float] = None  # Items (messages) per second over the recent window
+    eta_seconds: Optional[float] = None  # Estimated seconds until done
     
     def to_dict(self):
         """Convert to dictionary for JSON serialization"""
@@ -39,13 +76,204 @@ class TaskResult:
             'task_id': self.task_id,
             'status': self.status,
             'progress': self.progress,
+            'priority': self.priority,
             'message': self.message,
             'data': self.data,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'started_at': self.started_at.isoformat() if self.started_at else None,
             'completed_at': self.completed_at.isoformat() if self.completed_at else None,
             'error': self.error,
+            'rate': self.rate,
+            'eta_seconds': self.eta_seconds,
+        }
+    
+    def to_document(self):
+        """Convert to a MongoDB status document (datetimes kept native)"""
+        return {
+            '_id': self.task_id,
+            'task_id': self.task_id,
+            'status': self.status,
+            'progress': self.progress,
+            'priority': self.priority,
+            'message': self.message,
+            'data': self.data,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'completed_at': self.completed_at,
+            'error': self.error,
+            'worker_id': self.worker_id,
+            'rate': self.rate,
+            'eta_seconds': self.eta_seconds,
         }
+    
+    @classmethod
+    def from_document(cls, doc: Dict) -> 'TaskResult':
+        """Build a TaskResult from a MongoDB status document"""
+        return cls(
+            task_id=doc['task_id'],
+            status=doc['status'],
+            progress=doc.get('progress', 0),
+            priority=doc.get('priority', PRIORITY_NORMAL),
+            message=doc.get('message', ''),
+            data=doc.get('data'),
+            created_at=doc.get('created_at'),
+            started_at=doc.get('started_at'),
+            completed_at=doc.get('completed_at'),
+            error=doc.get('error'),
+            worker_id=doc.get('worker_id'),
+            rate=doc.get('rate'),
+            eta_seconds=doc.get('eta_seconds'),
+        )
+
+
+_task_seq = itertools.count()
+
+
+@dataclass(order=True)
+class _QueuedTask:
+    """A task waiting to be executed by a worker, ordered by (priority, FIFO)"""
+    priority: int
+    seq: int = field(default_factory=lambda: next(_task_seq))
+    task_id: str = field(default="", compare=False)
+    func: Callable = field(default=None, compare=False)
+    args: tuple = field(default=(), compare=False)
+    kwargs: Dict = field(default_factory=dict, compare=False)
+    durable: bool = field(default=False, compare=False)  # Claimed from the durable store
+    timeout: Optional[float] = field(default=None, compare=False)  # Overrides the queue's task_timeout
+
+
+class TaskInterrupted(Exception):
+    """Raised inside a task when an admin interrupts it between messages"""
+    
+    def __init__(self, reason: str, checkpoint: Optional[Dict] = None):
+        super().__init__(reason)
+        self.reason = reason
+        self.checkpoint = checkpoint  # Where the task stopped (position, partial totals)
+
+
+class TaskCancelled(TaskInterrupted):
+    """The task was cancelled and will not run again"""
+
+
+class TaskPaused(TaskInterrupted):
+    """The task was paused; it releases its worker and resumes from the checkpoint"""
+
+
+class TaskTimedOut(TaskCancelled):
+    """The task ran past its deadline and was stopped by the watchdog"""
+
+
+class TaskControl:
+    """
+    Cooperative control token for a single task
+    
+    Admin requests only set a flag; the task's send loop calls check()
+    between messages, which raises TaskCancelled or TaskPaused carrying the
+    loop's checkpoint. Tasks that support pausing accept a `checkpoint`
+    keyword argument and continue from it when resumed.
+    """
+    
+    def __init__(self, task_id: str, durable: bool = False):
+        self.task_id = task_id
+        self.durable = durable  # Task lives in the durable store
+        self.cancel_requested = False
+        self.pause_requested = False
+        self.timed_out = False
+        self.reason = ""
+        self.last_checkpoint: Optional[Dict] = None
+    
+    def request_cancel(self, reason: str = "Cancelled by admin"):
+        """Ask the task to stop at its next check"""
+        self.reason = reason
+        self.cancel_requested = True
+    
+    def request_timeout(self, reason: str):
+        """Ask the task to stop at its next check because it ran past its deadline"""
+        self.reason = reason
+        self.timed_out = True
+        self.cancel_requested = True
+    
+    def request_pause(self):
+        """Ask the task to pause at its next check"""
+        self.pause_requested = True
+    
+    def clear_pause(self):
+        """Withdraw a pause request (on resume)"""
+        self.pause_requested = False
+    
+    def check(self, checkpoint: Optional[Dict] = None):
+        """
+        Interruption point, called by task loops between units of work
+        
+        Args:
+            checkpoint: Serializable state needed to continue from this point
+            
+        Raises:
+            TaskTimedOut: If the watchdog flagged the task as overdue
+            TaskCancelled: If cancel was requested
+            TaskPaused: If pause was requested
+        """
+        self.last_checkpoint = checkpoint
+        if self.timed_out:
+            raise TaskTimedOut(self.reason, checkpoint)
+        if self.cancel_requested:
+            raise TaskCancelled(self.reason, checkpoint)
+        if self.pause_requested:
+            raise TaskPaused("Paused by admin", checkpoint)
+
+
+def register_task_type(name: str):
+    """
+    Decorator registering a function as a durable task type
+
+    Registered functions are called as func(task_id, **kwargs), so the kwargs
+    must be serializable (they are stored in MongoDB in durable mode).
+
+    Args:
+        name: Unique task type name
+    """
+    def decorator(func: Callable) -> Callable:
+        if name in TASK_TYPES and TASK_TYPES[name] is not func:
+            raise ValueError(f"Task type '{name}' is already registered")
+        TASK_TYPES[name] = func
+        return func
+    return decorator
+
+
+def register_task_cleanup(name: str):
+    """
+    Decorator registering the cleanup hook of a task type
+
+    The hook is called as func(**kwargs) with the task's kwargs when a
+    pending or paused task is cancelled. Such a task never runs again, so it
+    cannot release what it owns (uploaded files, spools) itself.
+
+    Args:
+        name: Task type name the hook belongs to
+    """
+    def decorator(func: Callable) -> Callable:
+        TASK_CLEANUPS[name] = func
+        return func
+    return decorator
+
+
+def run_task_cleanup(task_type: Optional[str], kwargs: Optional[Dict]):
+    """Call the cleanup hook of a task type, if any; hook errors are logged"""
+    hook = TASK_CLEANUPS.get(task_type) if task_type else None
+    if hook is None:
+        return
+    try:
+        hook(**(kwargs or {}))
+    except Exception as e:
+        logger.error(f"Cleanup of cancelled {task_type} task failed: {e}", exc_info=True)
+
+
+def _task_type_of(func: Callable) -> Optional[str]:
+    """Name a registered task function was registered under"""
+    for name, registered in TASK_TYPES.items():
+        if registered is func:
+            return name
+    return None
 
 
 class TaskQueue:
@@ -55,19 +283,78 @@ class TaskQueue:
     Includes loop detection and auto-stop mechanisms
     """
     
-    def __init__(self, num_workers=1):
+    def __init__(self, num_workers=1, store=None, status_store=None, progress_write_interval=1.0,
+                 max_results=500, result_ttl=3600, max_overflow_workers=2, task_timeout=0,
+                 timeout_grace=30, max_workers=None, worker_idle_timeout=60):
         """
         Initialize task queue
         
         Args:
-            num_workers: Number of worker threads
+            num_workers: Number of worker threads kept running (the pool's minimum)
+            store: Optional DurableTaskStore; registered tasks are persisted there
+            status_store: Optional TaskStatusStore shared between processes;
+                self.results then acts as a local cache
+            progress_write_interval: Minimum seconds between progress writes
+                to the status store for one task
+            max_results: Maximum task results kept; oldest finished are evicted first
+            result_ttl: Seconds a finished task result is kept
+            max_overflow_workers: Extra one-shot workers started for
+                high-priority tasks when every worker is busy
+            task_timeout: Default seconds a task may run before the watchdog
+                stops it (0 = no limit)
+            timeout_grace: Seconds an overdue task gets to stop at its next
+                check before its worker is considered wedged and replaced
+            max_workers: Upper bound the pool grows to while tasks are
+                waiting (default: num_workers, a fixed-size pool)
+            worker_idle_timeout: Seconds a worker above num_workers may sit
+                idle before it exits
         """
-        self.queue = Queue()
+        self.queue = PriorityQueue()
+        self.store = store
+        self.status_store = status_store
+        self.progress_write_interval = progress_write_interval
+        self._progress_written: Dict[str, float] = {}  # task_id -> last progress write time
+        self.events = ProgressBroker()  # Change feed for SSE progress streams
+        self.worker_prefix = f"{socket.gethostname()}:{os.getpid()}"
+        self._leased: Dict[str, str] = {}  # task_id -> worker_id for durable tasks held here
+        self._lease_lock = threading.Lock()
         self.results: Dict[str, TaskResult] = {}
+        self.max_results = max_results
+        self.result_ttl = result_ttl
+        # Per-status counters kept on each transition; finished statuses are
+        # lifetime totals and are not decremented when results are evicted
+        self.status_counts = Counter()
+        self._finished = OrderedDict()  # task_id -> finish time, oldest first
+        self._recent = deque(maxlen=RECENT_INDEX_SIZE)  # task_ids in creation order
+        self._results_lock = threading.Lock()
         self.num_workers = num_workers
+        self.max_workers = max(num_workers, max_workers or num_workers)
+        self.worker_idle_timeout = worker_idle_timeout
         self.running = False
         self.worker_threads = []
+        self._live_workers = 0  # Pool workers running (excludes overflow and abandoned workers)
+        self._worker_seq = itertools.count()
+        self.scale_ups = 0
+        self.scale_downs = 0
+        self._utilization_avg = 0.0
+        self._last_scale_check = None
+        self.max_overflow_workers = max_overflow_workers
+        self._busy_workers = 0
+        self._overflow_workers = 0
+        self._overflow_seq = itertools.count()
+        self._workers_lock = threading.Lock()
         self.submitted_tasks = set()  # Track submitted task IDs to prevent duplicates
+        self.controls: Dict[str, TaskControl] = {}  # Per-task cancel/pause tokens
+        self._parked: Dict[str, _QueuedTask] = {}  # Paused in-memory tasks awaiting resume
+        
+        # Deadlines and the watchdog
+        self.task_timeout = task_timeout
+        self.timeout_grace = timeout_grace
+        self._deadlines: Dict[str, tuple] = {}  # task_id -> (worker_id, monotonic deadline, timeout)
+        self._abandoned_workers = set()  # Wedged workers; they exit once their task returns
+        self._replacement_seq = itertools.count(1)
+        self.timed_out_tasks = 0
+        self.replaced_workers = 0
         
         # Loop detection tracking
         self.task_submission_times = []  # List of (timestamp, task_id) tuples
@@ -81,20 +368,27 @@ class TaskQueue:
             return
             
         self.running = True
-        for i in range(self.num_workers):
-            thread = threading.Thread(target=self._worker_loop, daemon=True)
-            thread.start()
-            self.worker_threads.append(thread)
-        logger.info(f"Task queue started with {self.num_workers} workers")
+        for _ in range(self.num_workers):
+            self._spawn_worker()
+        if self.store is not None:
+            threading.Thread(target=self._heartbeat_loop, daemon=True).start()
+        threading.Thread(target=self._watchdog_loop, daemon=True).start()
+        scaling = f" (up to {self.max_workers})" if self.max_workers > self.num_workers else ""
+        logger.info(f"Task queue started with {self.num_workers} workers{scaling}"
+                    f"{' (durable mode)' if self.store is not None else ''}")
     
     def stop(self):
         """Stop all worker threads"""
         self.running = False
-        for thread in self.worker_threads:
+        with self._workers_lock:
+            threads = list(self.worker_threads)
+        for thread in threads:
             thread.join(timeout=5)
         logger.info("Task queue stopped")
     
-    def submit_task(self, task_id: str, func: Callable, args=None, kwargs=None) -> str:
+    def submit_task(self, task_id: str, func: Callable, args=None, kwargs=None,
+                    priority: int = PRIORITY_NORMAL, timeout: Optional[float] = None,
+                    trusted: bool = False) -> str:
         """
         Submit a task to the queue
         
@@ -103,6 +397,11 @@ class TaskQueue:
             func: Callable function to execute
             args: Positional arguments
             kwargs: Keyword arguments
+            priority: PRIORITY_HIGH, PRIORITY_NORMAL or PRIORITY_LOW
+            timeout: Seconds the task may run (default: the queue's task_timeout)
+            trusted: Submitted by the application itself (e.g. the campaign
+                scheduler) or sends nothing (dry runs); exempt from the
+                rapid submission check
             
         Returns:
             task_id
@@ -115,6 +414,91 @@ class TaskQueue:
         if kwargs is None:
             kwargs = {}
         
+        if not self._register_submission(task_id, trusted):
+            return task_id
+        
+        # Create task result entry
+        self._add_result(TaskResult(
+            task_id=task_id,
+            status="pending",
+            progress=0,
+            priority=priority
+        ))
+        self._publish(task_id)
+        
+        # Queue the task
+        self.queue.put(_QueuedTask(priority, task_id=task_id, func=func, args=args, kwargs=kwargs,
+                                   timeout=timeout))
+        logger.info(f"Task {task_id} submitted to queue (priority {priority})")
+        self._maybe_start_overflow(priority)
+        self._autoscale()
+        return task_id
+    
+    def submit_registered(self, task_id: str, task_type: str, kwargs: Dict = None,
+                          priority: int = PRIORITY_NORMAL, timeout: Optional[float] = None,
+                          trusted: bool = False) -> str:
+        """
+        Submit a registered task type with serializable arguments
+        
+        In durable mode the task is persisted and may be executed by any
+        process sharing the store; otherwise it runs on the in-memory queue.
+        
+        Args:
+            task_id: Unique identifier for the task
+            task_type: Name passed to register_task_type
+            kwargs: Serializable keyword arguments
+            priority: PRIORITY_HIGH, PRIORITY_NORMAL or PRIORITY_LOW
+            timeout: Seconds the task may run (default: the queue's task_timeout)
+            trusted: Exempt from the rapid submission check (see submit_task)
+            
+        Returns:
+            task_id
+            
+        Raises:
+            KeyError: If task_type is not registered
+            RuntimeError: If loop detected or queue paused
+        """
+        if task_type not in TASK_TYPES:
+            raise KeyError(f"Unknown task type: {task_type}")
+        if kwargs is None:
+            kwargs = {}
+        
+        if self.store is None:
+            return self.submit_task(task_id, TASK_TYPES[task_type], args=(task_id,), kwargs=kwargs,
+                                    priority=priority, timeout=timeout, trusted=trusted)
+        
+        if not self._register_submission(task_id, trusted):
+            return task_id
+        
+        if not self.store.enqueue(task_id, task_type, kwargs, priority=priority, timeout=timeout):
+            return task_id
+        
+        self._add_result(TaskResult(
+            task_id=task_id,
+            status="pending",
+            progress=0,
+            priority=priority
+        ), durable=True)
+        self._publish(task_id)
+        logger.info(f"Task {task_id} ({task_type}) submitted to durable store (priority {priority})")
+        self._maybe_start_overflow(priority)
+        self._autoscale()
+        return task_id
+    
+    def _register_submission(self, task_id: str, trusted: bool = False) -> bool:
+        """
+        Run loop-detection checks for a new submission
+        
+        Trusted submissions (scheduled runs, which can come due together)
+        skip the rapid submission check and are not counted towards it;
+        the paused and duplicate-task checks still apply.
+        
+        Returns:
+            False if the task was already submitted and should not be queued again
+            
+        Raises:
+            RuntimeError: If loop detected or queue paused
+        """
         # Check if queue is paused (loop detected)
         if self.paused:
             logger.error(f"Task queue is PAUSED - loop detected previously. Manual restart required.")
@@ -122,14 +506,15 @@ class TaskQueue:
         
         # Check for rapid task submissions (loop detection)
         now = time.time()
-        self.task_submission_times.append((now, task_id))
+        if not trusted:
+            self.task_submission_times.append((now, task_id))
         
         # Keep only submissions from last time window
         self.task_submission_times = [(t, tid) for t, tid in self.task_submission_times 
                                        if now - t < RAPID_TASK_TIME_WINDOW]
         
         # Check if too many tasks submitted rapidly
-        if len(self.task_submission_times) > RAPID_TASK_THRESHOLD:
+        if not trusted and len(self.task_submission_times) > RAPID_TASK_THRESHOLD:
             self.loop_detected = True
             self.paused = True
             logger.critical(f"⚠️  LOOP DETECTED: {len(self.task_submission_times)} tasks in {RAPID_TASK_TIME_WINDOW}s")
@@ -158,25 +543,144 @@ class TaskQueue:
                 raise RuntimeError(f"Loop detected: Task {task_id} retried too many times. Queue paused.")
             else:
                 logger.warning(f"Task {task_id} resubmitted (attempt {self.task_retry_count[task_id]})")
-                return task_id
+                return False
         
         self.submitted_tasks.add(task_id)
+        return True
+    
+    def get_status(self, task_id: str) -> TaskResult:
+        """
+        Get the status of a task
         
-        # Create task result entry
-        self.results[task_id] = TaskResult(
-            task_id=task_id,
-            status="pending",
-            progress=0
-        )
+        Tasks executed by this process are answered from the local cache;
+        anything else is looked up in the shared status store, so a poll can
+        land on any web worker.
+        """
+        local = self.results.get(task_id)
+        if local is not None and (self.status_store is None or local.worker_id is not None):
+            return local
         
-        # Queue the task
-        self.queue.put((task_id, func, args, kwargs))
-        logger.info(f"Task {task_id} submitted to queue")
-        return task_id
+        if self.status_store is not None:
+            try:
+                doc = self.status_store.load(task_id)
+                if doc:
+                    return TaskResult.from_document(doc)
+            except Exception as e:
+                logger.warning(f"Status store lookup failed for {task_id}: {e}")
+        
+        if local is not None:
+            return local
+        if self.store is not None:
+            doc = self.store.get(task_id)
+            if doc:
+                return TaskResult(
+                    task_id=task_id,
+                    status=doc['status'],
+                    progress=100 if doc['status'] == 'completed' else 0,
+                    data=doc.get('result'),
+                    created_at=doc.get('created_at'),
+                    started_at=doc.get('claimed_at'),
+                    completed_at=doc.get('completed_at'),
+                    error=doc.get('error'),
+                )
+        return TaskResult(task_id=task_id, status="not_found")
     
-    def get_status(self, task_id: str) -> TaskResult:
-        """Get the status of a task"""
-        return self.results.get(task_id, TaskResult(task_id=task_id, status="not_found"))
+    def recent_tasks(self, limit: int = 10) -> List[TaskResult]:
+        """Get the most recently created tasks, newest first"""
+        if self.status_store is not None:
+            try:
+                return [TaskResult.from_document(doc) for doc in self.status_store.recent(limit)]
+            except Exception as e:
+                logger.warning(f"Status store recent lookup failed: {e}")
+        
+        recent = []
+        for task_id in reversed(self._recent):
+            result = self.results.get(task_id)
+            if result is not None:
+                recent.append(result)
+                if len(recent) >= limit:
+                    break
+        return recent
+    
+    def record_progress(self, task_id: str, progress: int, message: str = "",
+                        rate: Optional[float] = None, eta_seconds: Optional[float] = None):
+        """
+        Record task progress locally and, throttled, in the status store
+        
+        Args:
+            task_id: Task ID
+            progress: Progress percentage (0-100)
+            message: Status message
+            rate: Items per second, if known
+            eta_seconds: Estimated seconds remaining, if known
+        """
+        result = self.results.get(task_id)
+        if result is None:
+            return
+        result.progress = progress
+        if message:
+            result.message = message
+        if rate is not None:
+            result.rate = rate
+            result.eta_seconds = eta_seconds
+        self.events.publish(task_id)
+        
+        if self.status_store is None:
+            return
+        now = time.monotonic()
+        if now - self._progress_written.get(task_id, 0) < self.progress_write_interval:
+            return
+        self._progress_written[task_id] = now
+        try:
+            self.status_store.update_progress(task_id, progress, message, rate=rate, eta_seconds=eta_seconds)
+        except Exception as e:
+            logger.warning(f"Failed to write progress for {task_id}: {e}")
+    
+    def _add_result(self, result: TaskResult, durable: bool = False):
+        """Track a new task result in the cache, counters and recency index"""
+        with self._results_lock:
+            self.results[result.task_id] = result
+            self.controls.setdefault(result.task_id, TaskControl(result.task_id, durable=durable))
+            self.status_counts[result.status] += 1
+            self._recent.append(result.task_id)
+        self._prune()
+    
+    def _set_status(self, result: TaskResult, status: str):
+        """Move a task to a new status, keeping the counters in sync"""
+        with self._results_lock:
+            self.status_counts[result.status] -= 1
+            self.status_counts[status] += 1
+            result.status = status
+            if status in FINISHED_STATUSES:
+                self._finished[result.task_id] = time.monotonic()
+                self.controls.pop(result.task_id, None)
+    
+    def _prune(self):
+        """Evict finished results past their TTL or beyond max_results"""
+        now = time.monotonic()
+        with self._results_lock:
+            while self._finished:
+                task_id, finished_at = next(iter(self._finished.items()))
+                if now - finished_at < self.result_ttl and len(self.results) <= self.max_results:
+                    break
+                self._finished.popitem(last=False)
+                self.results.pop(task_id, None)
+                self.submitted_tasks.discard(task_id)
+                self.task_retry_count.pop(task_id, None)
+                self.events.forget(task_id)
+    
+    def _publish(self, task_id: str):
+        """Announce a status change and write the full status to the shared status store"""
+        self.events.publish(task_id)
+        if self.status_store is None:
+            return
+        result = self.results.get(task_id)
+        if result is None:
+            return
+        try:
+            self.status_store.save(result.to_document())
+        except Exception as e:
+            logger.warning(f"Failed to publish status for {task_id}: {e}")
     
     def pause(self, reason: str = "Manual pause"):
         """Pause task queue (e.g., when loop detected)"""
@@ -191,6 +695,123 @@ class TaskQueue:
         self.task_retry_count = {}
         logger.info("✅ Task queue RESUMED")
     
+    def cancel_task(self, task_id: str) -> bool:
+        """
+        Cancel a pending, paused or running task
+        
+        Pending and paused tasks are cancelled immediately; a running task
+        stops at its next check between messages.
+        
+        Returns:
+            True if the cancel was applied or requested
+        """
+        entry = self.results.get(task_id)
+        control = self.controls.get(task_id)
+        if entry is not None and control is not None:
+            if entry.status == "running":
+                control.request_cancel()
+                logger.warning(f"Cancel requested for task {task_id}")
+                return True
+            if not control.durable and entry.status in ("pending", "paused"):
+                # Still queued or parked; a worker skips (and cleans up) queued ones when dequeued
+                parked = self._parked.pop(task_id, None)
+                self._finish_interrupted(entry, "cancelled", "Cancelled by admin")
+                if parked is not None:
+                    run_task_cleanup(_task_type_of(parked.func), parked.kwargs)
+                return True
+        
+        if self.store is not None:
+            if self.store.cancel(task_id):
+                if entry is not None and entry.status not in FINISHED_STATUSES:
+                    self._finish_interrupted(entry, "cancelled", "Cancelled by admin")
+                doc = self.store.get(task_id)
+                if doc is not None:
+                    run_task_cleanup(doc.get('task_type'), doc.get('kwargs'))
+                return True
+            # Running in another process: its heartbeat picks up the request
+            return self.store.request_control(task_id, "cancel")
+        return False
+    
+    def pause_task(self, task_id: str) -> bool:
+        """
+        Pause a pending or running task
+        
+        A running task stops at its next check between messages and frees its
+        worker; resume_task() queues it again from its checkpoint.
+        
+        Returns:
+            True if the pause was applied or requested
+        """
+        entry = self.results.get(task_id)
+        control = self.controls.get(task_id)
+        if entry is not None and control is not None:
+            if entry.status == "running":
+                control.request_pause()
+                logger.info(f"Pause requested for task {task_id}")
+                return True
+            if not control.durable and entry.status == "pending":
+                control.request_pause()
+                self._set_status(entry, "paused")
+                self._publish(task_id)
+                return True
+        
+        if self.store is not None:
+            if self.store.pause_pending(task_id):
+                if entry is not None and entry.status == "pending":
+                    self._set_status(entry, "paused")
+                    self._publish(task_id)
+                return True
+            return self.store.request_control(task_id, "pause")
+        return False
+    
+    def resume_task(self, task_id: str) -> bool:
+        """
+        Resume a paused task
+        
+        Returns:
+            True if the task was queued again (or its pause request withdrawn)
+        """
+        entry = self.results.get(task_id)
+        control = self.controls.get(task_id)
+        if control is not None:
+            control.clear_pause()
+        
+        parked = self._parked.pop(task_id, None)
+        if parked is not None:
+            self._set_status(entry, "pending")
+            self._publish(task_id)
+            self.queue.put(parked)
+            logger.info(f"Task {task_id} resumed from checkpoint")
+            return True
+        
+        if entry is not None and control is not None:
+            if entry.status == "running":
+                # Pause had not been reached yet
+                return True
+            if not control.durable and entry.status == "paused":
+                # Paused before a worker picked it up; it is still queued
+                self._set_status(entry, "pending")
+                self._publish(task_id)
+                return True
+        
+        if self.store is not None:
+            resumed = self.store.resume(task_id)
+            if resumed and entry is not None and entry.status == "paused":
+                self._set_status(entry, "pending")
+                self._publish(task_id)
+            return resumed
+        return False
+    
+    def _finish_interrupted(self, entry: TaskResult, status: str, message: str, data: Any = None):
+        """Record a task that ended without completing"""
+        entry.message = message
+        if data is not None:
+            entry.data = data
+        entry.completed_at = datetime.utcnow()
+        self._set_status(entry, status)
+        self.submitted_tasks.discard(entry.task_id)
+        self._publish(entry.task_id)
+    
     def is_safe(self) -> bool:
         """Check if queue is safe to use"""
         return not self.paused and not self.loop_detected
@@ -201,64 +822,560 @@ class TaskQueue:
             'running': self.running,
             'paused': self.paused,
             'loop_detected': self.loop_detected,
-            'active_tasks': len([t for t in self.results.values() if t.status == 'running']),
-            'pending_tasks': len([t for t in self.results.values() if t.status == 'pending']),
-            'completed_tasks': len([t for t in self.results.values() if t.status == 'completed']),
-            'failed_tasks': len([t for t in self.results.values() if t.status == 'failed']),
+            'active_tasks': self.status_counts['running'],
+            'pending_tasks': self.status_counts['pending'],
+            'paused_tasks': self.status_counts['paused'],
+            'completed_tasks': self.status_counts['completed'],
+            'failed_tasks': self.status_counts['failed'],
+            'cancelled_tasks': self.status_counts['cancelled'],
+            'retained_results': len(self.results),
+            'workers': self._live_workers,
+            'min_workers': self.num_workers,
+            'max_workers': self.max_workers,
+            'busy_workers': self._busy_workers,
+            'overflow_workers': self._overflow_workers,
+            'queue_depth': self.queue.qsize(),
+            'utilization': self._utilization(),
+            'utilization_avg': round(self._utilization_avg, 3),
+            'scale_ups': self.scale_ups,
+            'scale_downs': self.scale_downs,
+            'task_timeout': self.task_timeout,
+            'timed_out_tasks': self.timed_out_tasks,
+            'overdue_tasks': self._overdue_count(),
+            'replaced_workers': self.replaced_workers,
             'recent_submissions': len(self.task_submission_times),
             'task_retry_counts': dict(self.task_retry_count)
         }
     
-    def _worker_loop(self):
-        """Main worker loop - processes tasks from queue"""
+    def _next_task(self, worker_id: str) -> Optional[_QueuedTask]:
+        """
+        Get the next task for a worker
+        
+        In-memory tasks are taken first; in durable mode the store is polled
+        when the in-memory queue is empty.
+        """
+        if self.store is None:
+            try:
+                return self.queue.get(timeout=1)
+            except Empty:
+                return None
+        
+        try:
+            return self.queue.get_nowait()
+        except Empty:
+            pass
+        
+        doc = self.store.claim(worker_id)
+        if doc is None:
+            try:
+                return self.queue.get(timeout=DURABLE_POLL_INTERVAL)
+            except Empty:
+                return None
+        
+        task_id = doc['_id']
+        func = TASK_TYPES.get(doc['task_type'])
+        if func is None:
+            self.store.fail(task_id, worker_id, f"Unknown task type: {doc['task_type']}")
+            logger.error(f"Task {task_id} has unregistered type {doc['task_type']}")
+            return None
+        
+        if doc['attempts'] > 1:
+            logger.warning(f"Task {task_id} re-delivered (attempt {doc['attempts']})")
+        with self._lease_lock:
+            self._leased[task_id] = worker_id
+        priority = doc.get('priority', PRIORITY_NORMAL)
+        if task_id not in self.results:
+            self._add_result(TaskResult(
+                task_id=task_id,
+                status="pending",
+                priority=priority,
+                created_at=doc.get('created_at') or datetime.utcnow()
+            ), durable=True)
+        kwargs = doc.get('kwargs') or {}
+        if doc.get('checkpoint') is not None:
+            # Resumed after a pause, or re-delivered after a crash
+            kwargs = dict(kwargs, checkpoint=doc['checkpoint'])
+        return _QueuedTask(priority, task_id=task_id, func=func, args=(task_id,),
+                           kwargs=kwargs, durable=True, timeout=doc.get('timeout'))
+    
+    def _heartbeat_loop(self):
+        """Renew leases of durable tasks running in this process"""
+        interval = max(1, self.store.lease_seconds // 3)
         while self.running:
+            time.sleep(interval)
+            with self._lease_lock:
+                leased = list(self._leased.items())
+            for task_id, worker_id in leased:
+                control = self.controls.get(task_id)
+                checkpoint = control.last_checkpoint if control is not None else None
+                try:
+                    doc = self.store.heartbeat(task_id, worker_id, checkpoint)
+                    if doc is None:
+                        logger.warning(f"Lease lost for task {task_id}; it may run elsewhere")
+                    elif control is not None:
+                        # Apply cancel/pause requests made through another process
+                        if doc.get('control') == "cancel":
+                            control.request_cancel()
+                        elif doc.get('control') == "pause":
+                            control.request_pause()
+                except Exception as e:
+                    logger.error(f"Heartbeat failed for task {task_id}: {e}")
             try:
-                # Get task with timeout to allow graceful shutdown
-                task_id, func, args, kwargs = self.queue.get(timeout=1)
-                
-                # Update status to running
-                self.results[task_id].status = "running"
-                self.results[task_id].started_at = datetime.utcnow()
-                logger.info(f"Task {task_id} started")
-                
+                self.store.fail_exhausted()
+            except Exception as e:
+                logger.error(f"Failed to reap exhausted tasks: {e}")
+    
+    def _maybe_start_overflow(self, priority: int):
+        """
+        Start a one-shot worker for a high-priority task if every worker is busy
+        
+        Keeps small urgent sends from waiting behind long-running campaigns;
+        the fair-share send scheduler then interleaves their messages.
+        """
+        if priority != PRIORITY_HIGH or not self.running:
+            return
+        with self._workers_lock:
+            if self._busy_workers < self._live_workers:
+                return
+            if self._overflow_workers >= self.max_overflow_workers:
+                return
+            self._overflow_workers += 1
+        worker_id = f"{self.worker_prefix}:overflow-{next(self._overflow_seq)}"
+        threading.Thread(target=self._overflow_worker, args=(worker_id,), daemon=True).start()
+        logger.info(f"Started overflow worker {worker_id} for high-priority task")
+    
+    def _overflow_worker(self, worker_id: str):
+        """Run a single task, then exit"""
+        try:
+            task = self._next_task(worker_id)
+            if task is not None:
+                self._execute(task, worker_id)
+        except Exception as e:
+            logger.error(f"Overflow worker error: {e}", exc_info=True)
+        finally:
+            with self._workers_lock:
+                self._overflow_workers -= 1
+    
+    def _spawn_worker(self, worker_id: Optional[str] = None):
+        """Start a pool worker thread"""
+        if worker_id is None:
+            worker_id = f"{self.worker_prefix}:{next(self._worker_seq)}"
+        thread = threading.Thread(target=self._worker_loop, args=(worker_id,), daemon=True)
+        with self._workers_lock:
+            self._live_workers += 1
+            # Drop threads of workers that already exited
+            self.worker_threads = [t for t in self.worker_threads if t.is_alive()]
+            self.worker_threads.append(thread)
+        thread.start()
+        return worker_id
+    
+    def _queue_depth(self, include_store: bool = False) -> int:
+        """
+        Tasks waiting for a worker
+        
+        Args:
+            include_store: Also count pending tasks in the durable store
+                (a database query; submitted by any process)
+        """
+        depth = self.queue.qsize()
+        if include_store and self.store is not None:
+            try:
+                depth += self.store.pending_count()
+            except Exception as e:
+                logger.warning(f"Could not count pending durable tasks: {e}")
+        return depth
+    
+    def _utilization(self) -> float:
+        """Share of pool workers currently running a task"""
+        with self._workers_lock:
+            busy = self._busy_workers - self._overflow_workers
+            live = self._live_workers
+        return round(min(1.0, max(0, busy) / live), 3) if live else 0.0
+    
+    def _autoscale(self, include_store: bool = False):
+        """
+        Grow the pool while tasks wait and no worker is idle
+        
+        Workers above num_workers shrink the pool themselves: each exits after
+        worker_idle_timeout seconds without a task (see _worker_loop).
+        """
+        if not self.running or self.max_workers <= self.num_workers:
+            return
+        depth = self._queue_depth(include_store)
+        with self._workers_lock:
+            idle = self._live_workers - max(0, self._busy_workers - self._overflow_workers)
+            wanted = min(depth - idle, self.max_workers - self._live_workers)
+        for _ in range(max(0, wanted)):
+            worker_id = self._spawn_worker()
+            with self._workers_lock:
+                self.scale_ups += 1
+                live = self._live_workers
+            logger.info(f"Scaled up: started worker {worker_id} ({live}/{self.max_workers}, {depth} waiting)")
+    
+    def _record_utilization(self):
+        """Fold the current utilization into the smoothed average"""
+        now = time.monotonic()
+        if self._last_scale_check is not None:
+            weight = min(1.0, (now - self._last_scale_check) / UTILIZATION_WINDOW)
+            self._utilization_avg += weight * (self._utilization() - self._utilization_avg)
+        self._last_scale_check = now
+    
+    def _watchdog_loop(self):
+        """Flag tasks running past their deadline, replace wedged workers and scale the pool"""
+        while self.running:
+            time.sleep(WATCHDOG_INTERVAL)
+            try:
+                self._check_deadlines()
+                self._record_utilization()
+                self._autoscale(include_store=True)
+            except Exception as e:
+                logger.error(f"Watchdog error: {e}", exc_info=True)
+    
+    def _check_deadlines(self):
+        """
+        One watchdog pass
+        
+        An overdue task is first asked to stop at its next check (cooperative
+        abort through TaskControl). If it has not stopped after timeout_grace
+        seconds it is stuck outside its send loop (hung HTTP call, Excel
+        parse): the task is failed and its worker is abandoned and replaced,
+        so the queue keeps its capacity.
+        """
+        now = time.monotonic()
+        for task_id, (worker_id, deadline, timeout) in list(self._deadlines.items()):
+            if now < deadline:
+                continue
+            control = self.controls.get(task_id)
+            if control is not None and not control.timed_out:
+                control.request_timeout(f"Timed out after {timeout:g}s")
+                with self._workers_lock:
+                    self.timed_out_tasks += 1
+                logger.error(f"Task {task_id} exceeded its deadline; asking it to stop")
+            elif now >= deadline + self.timeout_grace:
+                self._abandon_worker(task_id, worker_id)
+    
+    def _overdue_count(self) -> int:
+        """Number of running tasks past their deadline"""
+        now = time.monotonic()
+        return sum(1 for _, deadline, _ in list(self._deadlines.values()) if now >= deadline)
+    
+    def _abandon_worker(self, task_id: str, worker_id: str):
+        """Fail a task whose worker is wedged and start a replacement worker"""
+        if self._deadlines.pop(task_id, None) is None:
+            return
+        entry = self.results.get(task_id)
+        with self._workers_lock:
+            self._abandoned_workers.add(worker_id)
+            self._busy_workers -= 1
+            if ":overflow-" not in worker_id:
+                self._live_workers -= 1
+        if entry is not None and entry.status not in FINISHED_STATUSES:
+            entry.error = f"Timed out; worker {worker_id} unresponsive"
+            entry.completed_at = datetime.utcnow()
+            self._set_status(entry, "failed")
+            self.submitted_tasks.discard(task_id)
+            self._publish(task_id)
+        with self._lease_lock:
+            durable = self._leased.pop(task_id, None) is not None
+        if durable:
+            self.store.fail(task_id, worker_id, f"Timed out; worker {worker_id} unresponsive")
+        logger.error(f"Worker {worker_id} wedged on task {task_id}; abandoning it")
+        
+        if ":overflow-" in worker_id or not self.running:
+            return  # One-shot worker, nothing to replace
+        replacement_id = f"{worker_id.rsplit('-r', 1)[0]}-r{next(self._replacement_seq)}"
+        self._spawn_worker(replacement_id)
+        with self._workers_lock:
+            self.replaced_workers += 1
+        logger.warning(f"Started replacement worker {replacement_id}")
+    
+    def _worker_loop(self, worker_id: str):
+        """Main worker loop - processes tasks from queue"""
+        idle_since = time.monotonic()
+        try:
+            while self.running and worker_id not in self._abandoned_workers:
                 try:
-                    # Execute the task
-                    result = func(*args, **kwargs)
-                    
+                    task = self._next_task(worker_id)
+                    if task is None:
+                        # No task available; surplus workers retire after idling
+                        if time.monotonic() - idle_since >= self.worker_idle_timeout and self._retire(worker_id):
+                            return
+                        continue
+                    self._execute(task, worker_id)
+                    idle_since = time.monotonic()
+                except Exception as e:
+                    logger.error(f"Worker error: {e}", exc_info=True)
+        finally:
+            if not self.running and worker_id not in self._abandoned_workers:
+                with self._workers_lock:
+                    self._live_workers -= 1
+    
+    def _retire(self, worker_id: str) -> bool:
+        """Let an idle worker exit if the pool is above its minimum size"""
+        with self._workers_lock:
+            if self._live_workers <= self.num_workers:
+                return False
+            self._live_workers -= 1
+            self.scale_downs += 1
+            live = self._live_workers
+        logger.info(f"Scaled down: idle worker {worker_id} exited ({live}/{self.max_workers})")
+        return True
+    
+    def _execute(self, task: _QueuedTask, worker_id: str):
+        """Run one task and record its outcome"""
+        with self._workers_lock:
+            self._busy_workers += 1
+        task_id = task.task_id
+        try:
+            entry = self.results.get(task_id)
+            control = self.controls.get(task_id)
+            
+            if entry is None or entry.status == "cancelled":
+                # Cancelled while still queued
+                if not task.durable:
+                    run_task_cleanup(_task_type_of(task.func), task.kwargs)
+                    self.queue.task_done()
+                return
+            if control is not None and control.pause_requested and not task.durable:
+                # Paused while still queued: park it without running
+                self._parked[task_id] = task
+                self.queue.task_done()
+                logger.info(f"Task {task_id} parked before start")
+                return
+            
+            # Update status to running
+            self._set_status(entry, "running")
+            entry.started_at = datetime.utcnow()
+            entry.worker_id = worker_id
+            self._publish(task_id)
+            timeout = task.timeout if task.timeout is not None else self.task_timeout
+            if timeout:
+                self._deadlines[task_id] = (worker_id, time.monotonic() + timeout, timeout)
+            logger.info(f"Task {task_id} started")
+            
+            try:
+                # Execute the task
+                result = task.func(*task.args, **task.kwargs)
+                error = None
+            except Exception as e:
+                result, error = None, e
+            
+            try:
+                self._deadlines.pop(task_id, None)
+                if worker_id in self._abandoned_workers:
+                    # The watchdog already failed the task and replaced this worker
+                    logger.warning(f"Task {task_id} returned after its worker was abandoned")
+                
+                elif error is None:
                     # Update result
-                    self.results[task_id].status = "completed"
-                    self.results[task_id].progress = 100
-                    self.results[task_id].data = result
-                    self.results[task_id].completed_at = datetime.utcnow()
+                    entry.progress = 100
+                    entry.data = result
+                    entry.completed_at = datetime.utcnow()
+                    self._set_status(entry, "completed")
                     self.submitted_tasks.discard(task_id)  # Clear from submitted set
+                    if task.durable:
+                        self.store.complete(task_id, worker_id, result)
                     logger.info(f"Task {task_id} completed successfully")
-                    
-                except Exception as e:
-                    # Update with error
-                    self.results[task_id].status = "failed"
-                    self.results[task_id].error = str(e)
-                    self.results[task_id].completed_at = datetime.utcnow()
-                    self.submitted_tasks.discard(task_id)  # Clear from submitted set
-                    logger.error(f"Task {task_id} failed: {e}", exc_info=True)
                 
-                self.queue.task_done()
+                elif isinstance(error, TaskPaused):
+                    # Free the worker; resume_task() queues it again from the checkpoint
+                    entry.message = f"Paused at {(error.checkpoint or {}).get('position', 0)}"
+                    entry.worker_id = None
+                    self._set_status(entry, "paused")
+                    if task.durable:
+                        self.store.park(task_id, worker_id, error.checkpoint)
+                    else:
+                        if error.checkpoint is not None:
+                            task.kwargs = dict(task.kwargs, checkpoint=error.checkpoint)
+                        self._parked[task_id] = task
+                    logger.info(f"Task {task_id} paused: {entry.message}")
                 
-            except Empty:
-                # No task available, continue waiting
-                continue
-            except Exception as e:
-                logger.error(f"Worker error: {e}", exc_info=True)
-
+                elif isinstance(error, TaskTimedOut):
+                    # Stopped cooperatively; keep the partial result
+                    entry.error = error.reason
+                    entry.data = error.checkpoint
+                    entry.completed_at = datetime.utcnow()
+                    self._set_status(entry, "failed")
+                    self.submitted_tasks.discard(task_id)
+                    if task.durable:
+                        self.store.fail(task_id, worker_id, error.reason)
+                    logger.error(f"Task {task_id} stopped: {error.reason}")
+                
+                elif isinstance(error, TaskCancelled):
+                    self._finish_interrupted(entry, "cancelled", error.reason, data=error.checkpoint)
+                    if task.durable:
+                        self.store.finish_cancelled(task_id, worker_id, error.checkpoint)
+                    logger.warning(f"Task {task_id} cancelled: {error.reason}")
+                
+                else:
+                    # Update with error
+                    entry.error = str(error)
+                    entry.completed_at = datetime.utcnow()
+                    self._set_status(entry, "failed")
+                    self.submitted_tasks.discard(task_id)  # Clear from submitted set
+                    if task.durable:
+                        self.store.fail(task_id, worker_id, str(error))
+                    logger.error(f"Task {task_id} failed: {error}", exc_info=error)
+            
+            finally:
+                self._progress_written.pop(task_id, None)
+                self._publish(task_id)
+                self._prune()
+                if task.durable:
+                    with self._lease_lock:
+                        if self._leased.get(task_id) == worker_id:
+                            del self._leased[task_id]
+                else:
+                    self.queue.task_done()
+        finally:
+            with self._workers_lock:
+                if worker_id not in self._abandoned_workers:
+                    self._busy_workers -= 1
 
 def get_task_queue() -> TaskQueue:
     """Get or create the global task queue instance"""
     global _task_manager
     if _task_manager is None:
-        _task_manager = TaskQueue(num_workers=2)
+        _task_manager = TaskQueue(
+            num_workers=config.TASK_QUEUE_WORKERS,
+            max_workers=config.TASK_QUEUE_MAX_WORKERS,
+            worker_idle_timeout=config.TASK_QUEUE_WORKER_IDLE_SECONDS,
+            store=_create_durable_store(),
+            status_store=_create_status_store(),
+            progress_write_interval=config.TASK_STATUS_WRITE_INTERVAL,
+            max_results=config.TASK_RESULT_MAX,
+            result_ttl=config.TASK_RESULT_TTL,
+            max_overflow_workers=config.TASK_QUEUE_OVERFLOW_WORKERS,
+            task_timeout=config.TIMEOUT_SECONDS,
+            timeout_grace=config.TASK_TIMEOUT_GRACE
+        )
         _task_manager.start()
     return _task_manager
 
 
+def _create_durable_store():
+    """Create the MongoDB task store when durable mode is enabled"""
+    if not config.TASK_QUEUE_DURABLE:
+        return None
+    from database import db
+    from task_store import DurableTaskStore
+    return DurableTaskStore(
+        db.db[config.TASKS_COLLECTION],
+        lease_seconds=config.TASK_LEASE_SECONDS,
+        max_attempts=config.TASK_MAX_ATTEMPTS
+    )
+
+
+def _create_status_store():
+    """
+    Create the shared task status store
+    
+    Falls back to in-process status only if MongoDB is unavailable.
+    """
+    if config.TASK_STATUS_BACKEND != "mongo":
+        return None
+    try:
+        from database import db
+        from task_store import TaskStatusStore
+        return TaskStatusStore(db.db[config.TASK_STATUS_COLLECTION])
+    except Exception as e:
+        logger.warning(f"Shared task status store unavailable, using in-process status: {e}")
+        return None
+
+
+def campaign_timeout(recipient_count: int) -> float:
+    """Task deadline for a campaign: the base task timeout plus time for each message"""
+    return config.TIMEOUT_SECONDS + recipient_count * config.TASK_TIMEOUT_PER_MESSAGE
+
+
+def campaign_size_priority(recipient_count: int) -> int:
+    """Priority of a campaign by size: small ones (URGENT_CAMPAIGN_SIZE or less) jump ahead"""
+    return PRIORITY_HIGH if recipient_count <= config.URGENT_CAMPAIGN_SIZE else PRIORITY_NORMAL
+
+
+def get_task_control(task_id: str) -> Optional[TaskControl]:
+    """
+    Get the cancel/pause token of a task, for use inside the task
+    
+    Args:
+        task_id: Task ID
+        
+    Returns:
+        TaskControl, or None if the task is not tracked by this process
+    """
+    return get_task_queue().controls.get(task_id)
+
+
+class ProgressReporter:
+    """
+    Coalescing progress callback for send loops
+    
+    Pass an instance as progress_callback(current, total). Calls are cheap;
+    progress is only recorded when at least min_interval seconds have passed
+    and either the percentage moved by min_step or max_interval seconds went
+    by, plus always on the last item. Each recorded update carries the rate
+    (items/s) over the last `window` seconds and the resulting ETA.
+    """
+    
+    def __init__(self, task_id: str, start_pct: int = 0, end_pct: int = 100,
+                 min_interval: float = 0.25, min_step: int = 1, max_interval: float = 2.0,
+                 window: float = 30.0, queue: Optional['TaskQueue'] = None):
+        """
+        Initialize reporter
+        
+        Args:
+            task_id: Task to report on
+            start_pct: Percentage at item 0 (when earlier stages used part of the bar)
+            end_pct: Percentage at the last item
+            min_interval: Minimum seconds between recorded updates
+            min_step: Percentage change that triggers an update
+            max_interval: Seconds after which an update is recorded even
+                without a min_step change (keeps counts and ETA fresh)
+            window: Seconds of history used for the rate
+            queue: TaskQueue to record into (default: the global queue)
+        """
+        self.task_id = task_id
+        self.start_pct = start_pct
+        self.end_pct = end_pct
+        self.min_interval = min_interval
+        self.min_step = min_step
+        self.max_interval = max_interval
+        self.window = window
+        self.queue = queue or get_task_queue()
+        self._samples = deque()  # (monotonic time, items done) at each recorded update
+        self._last_time = float('-inf')
+        self._last_pct = None
+    
+    def __call__(self, current: int, total: int):
+        now = time.monotonic()
+        if total:
+            pct = self.start_pct + int(current * (self.end_pct - self.start_pct) / total)
+        else:
+            pct = self.end_pct
+        
+        if current < total:
+            elapsed = now - self._last_time
+            if elapsed < self.min_interval:
+                return
+            if (self._last_pct is not None and pct - self._last_pct < self.min_step
+                    and elapsed < self.max_interval):
+                return
+        
+        self._samples.append((now, current))
+        while len(self._samples) > 2 and now - self._samples[1][0] > self.window:
+            self._samples.popleft()
+        first_time, first_done = self._samples[0]
+        rate = eta = None
+        if now > first_time and current > first_done:
+            rate = (current - first_done) / (now - first_time)
+            eta = (total - current) / rate
+        
+        self._last_time = now
+        self._last_pct = pct
+        self.queue.record_progress(self.task_id, pct, f"Sending {current}/{total}",
+                                   rate=rate, eta_seconds=eta)
+
+
 def update_task_progress(task_id: str, progress: int, message: str = ""):
     """
     Update task progress from within a task
@@ -268,8 +1385,4 @@ def update_task_progress(task_id: str, progress: int, message: str = ""):
         progress: Progress percentage (0-100)
         message: Status message
     """
-    queue = get_task_queue()
-    if task_id in queue.results:
-        queue.results[task_id].progress = progress
-        if message:
-            queue.results[task_id].message = message
+    get_task_queue().record_progress(task_id, progress, message)
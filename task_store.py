@@ -0,0 +1,457 @@
+"""
+MongoDB-backed persistence for background tasks
+Stores queued tasks durably so they survive restarts and can be claimed by any process,
+and shares task status between web workers
+"""
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Any
+from pymongo import ASCENDING, DESCENDING, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger("task_store")
+
+
+class DurableTaskStore:
+    """
+    Durable task queue backed by a MongoDB collection
+
+    Each document is one task: its registered type, serializable kwargs and
+    lease state. Workers claim tasks atomically with find_one_and_update and
+    keep the lease alive with heartbeats; a task whose lease expires (worker
+    crashed or the process was redeployed) is re-delivered to another worker.
+    """
+
+    def __init__(self, collection, lease_seconds: int = 60, max_attempts: int = 3):
+        """
+        Initialize the store
+
+        Args:
+            collection: pymongo collection holding the task documents
+            lease_seconds: How long a claim stays valid without a heartbeat
+            max_attempts: Deliveries allowed before a task is marked failed
+        """
+        self.collection = collection
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._create_indexes()
+
+    def _create_indexes(self):
+        """Create indexes used by the claim query"""
+        try:
+            self.collection.create_index([("status", ASCENDING), ("priority", ASCENDING), ("created_at", ASCENDING)])
+            self.collection.create_index([("status", ASCENDING), ("lease_expires_at", ASCENDING)])
+        except Exception as e:
+            logger.warning(f"Failed to create task indexes: {e}")
+
+    def enqueue(self, task_id: str, task_type: str, kwargs: Dict[str, Any], priority: int = 1,
+                timeout: Optional[float] = None) -> bool:
+        """
+        Persist a new pending task
+
+        Args:
+            task_id: Unique task identifier (used as the document _id)
+            task_type: Name of a registered task type
+            kwargs: Serializable keyword arguments for the task
+            priority: Lower values are claimed first
+            timeout: Seconds the task may run once claimed (None = queue default)
+
+        Returns:
+            True if inserted, False if a task with this ID already exists
+        """
+        now = datetime.utcnow()
+        try:
+            self.collection.insert_one({
+                "_id": task_id,
+                "task_type": task_type,
+                "kwargs": kwargs,
+                "priority": priority,
+                "timeout": timeout,
+                "status": "pending",
+                "attempts": 0,
+                "worker_id": None,
+                "created_at": now,
+                "claimed_at": None,
+                "heartbeat_at": None,
+                "lease_expires_at": None,
+                "completed_at": None,
+                "result": None,
+                "error": None,
+            })
+            return True
+        except DuplicateKeyError:
+            logger.warning(f"Task {task_id} already exists in durable store")
+            return False
+
+    def claim(self, worker_id: str) -> Optional[Dict]:
+        """
+        Atomically claim the highest-priority, oldest available task
+
+        A task is available if it is pending, or if it is running but its
+        lease has expired and it still has delivery attempts left.
+
+        Args:
+            worker_id: Identifier of the claiming worker
+
+        Returns:
+            The claimed task document, or None if nothing is available
+        """
+        now = datetime.utcnow()
+        return self.collection.find_one_and_update(
+            {
+                "$or": [
+                    {"status": "pending"},
+                    {
+                        "status": "running",
+                        "lease_expires_at": {"$lt": now},
+                        "attempts": {"$lt": self.max_attempts},
+                    },
+                ]
+            },
+            {
+                "$set": {
+                    "status": "running",
+                    "worker_id": worker_id,
+                    "claimed_at": now,
+                    "heartbeat_at": now,
+                    "lease_expires_at": now + timedelta(seconds=self.lease_seconds),
+                },
+                "$inc": {"attempts": 1},
+            },
+            sort=[("priority", ASCENDING), ("created_at", ASCENDING)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    def heartbeat(self, task_id: str, worker_id: str, checkpoint: Optional[Dict] = None) -> Optional[Dict]:
+        """
+        Extend the lease of a task held by this worker
+
+        Args:
+            task_id: Task ID
+            worker_id: Worker holding the lease
+            checkpoint: Latest progress checkpoint of the task, saved if given
+
+        Returns:
+            The task's pending control request ({"control": "cancel"|"pause"|None}),
+            or None if the lease was lost (task re-delivered elsewhere)
+        """
+        now = datetime.utcnow()
+        fields = {
+            "heartbeat_at": now,
+            "lease_expires_at": now + timedelta(seconds=self.lease_seconds),
+        }
+        if checkpoint is not None:
+            fields["checkpoint"] = checkpoint
+        return self.collection.find_one_and_update(
+            {"_id": task_id, "worker_id": worker_id, "status": "running"},
+            {"$set": fields},
+            projection={"control": 1},
+        )
+
+    def request_control(self, task_id: str, action: str) -> bool:
+        """
+        Ask the worker running a task to cancel or pause it
+
+        The request is picked up by that worker's next heartbeat.
+
+        Args:
+            task_id: Task ID
+            action: "cancel" or "pause"
+
+        Returns:
+            True if the task is running and the request was recorded
+        """
+        result = self.collection.update_one(
+            {"_id": task_id, "status": "running"},
+            {"$set": {"control": action}},
+        )
+        return result.matched_count == 1
+
+    def cancel(self, task_id: str) -> bool:
+        """
+        Cancel a task that is not running
+
+        Returns:
+            True if a pending or paused task was cancelled
+        """
+        result = self.collection.update_one(
+            {"_id": task_id, "status": {"$in": ["pending", "paused"]}},
+            {"$set": {
+                "status": "cancelled",
+                "error": "Cancelled by admin",
+                "completed_at": datetime.utcnow(),
+            }},
+        )
+        return result.matched_count == 1
+
+    def pause_pending(self, task_id: str) -> bool:
+        """
+        Hold a pending task so workers do not claim it
+
+        Returns:
+            True if a pending task was paused
+        """
+        result = self.collection.update_one(
+            {"_id": task_id, "status": "pending"},
+            {"$set": {"status": "paused"}},
+        )
+        return result.matched_count == 1
+
+    def park(self, task_id: str, worker_id: str, checkpoint: Optional[Dict] = None):
+        """
+        Release a running task that paused itself
+
+        The delivery is not counted against max_attempts; resume() makes the
+        task claimable again and the checkpoint is passed back to it.
+        """
+        result = self.collection.update_one(
+            {"_id": task_id, "worker_id": worker_id},
+            {
+                "$set": {
+                    "status": "paused",
+                    "worker_id": None,
+                    "lease_expires_at": None,
+                    "checkpoint": checkpoint,
+                    "control": None,
+                },
+                "$inc": {"attempts": -1},
+            },
+        )
+        if result.matched_count == 0:
+            logger.warning(f"Task {task_id} paused by {worker_id} but lease was lost")
+
+    def resume(self, task_id: str) -> bool:
+        """
+        Make a paused task claimable again
+
+        Returns:
+            True if a paused task was resumed
+        """
+        result = self.collection.update_one(
+            {"_id": task_id, "status": "paused"},
+            {"$set": {"status": "pending", "control": None}},
+        )
+        if result.matched_count == 0:
+            # Pause requested but not reached yet: withdraw the request
+            result = self.collection.update_one(
+                {"_id": task_id, "status": "running", "control": "pause"},
+                {"$set": {"control": None}},
+            )
+        return result.matched_count == 1
+
+    def complete(self, task_id: str, worker_id: str, result: Any = None):
+        """Mark a claimed task as completed"""
+        self._finish(task_id, worker_id, {"status": "completed", "result": result})
+
+    def fail(self, task_id: str, worker_id: str, error: str):
+        """Mark a claimed task as failed"""
+        self._finish(task_id, worker_id, {"status": "failed", "error": error})
+
+    def finish_cancelled(self, task_id: str, worker_id: str, result: Any = None):
+        """Mark a claimed task as cancelled by its worker, keeping partial results"""
+        self._finish(task_id, worker_id, {"status": "cancelled", "result": result, "control": None})
+
+    def _finish(self, task_id: str, worker_id: str, fields: Dict):
+        fields["completed_at"] = datetime.utcnow()
+        fields["lease_expires_at"] = None
+        result = self.collection.update_one(
+            {"_id": task_id, "worker_id": worker_id},
+            {"$set": fields},
+        )
+        if result.matched_count == 0:
+            logger.warning(f"Task {task_id} finished by {worker_id} but lease was lost")
+
+    def fail_exhausted(self) -> int:
+        """
+        Fail tasks whose lease expired after their last allowed attempt
+
+        Returns:
+            Number of tasks marked failed
+        """
+        now = datetime.utcnow()
+        result = self.collection.update_many(
+            {
+                "status": "running",
+                "lease_expires_at": {"$lt": now},
+                "attempts": {"$gte": self.max_attempts},
+            },
+            {"$set": {
+                "status": "failed",
+                "error": f"Lease expired after {self.max_attempts} attempts",
+                "completed_at": now,
+                "lease_expires_at": None,
+            }},
+        )
+        if result.modified_count:
+            logger.error(f"{result.modified_count} durable task(s) failed after exhausting retries")
+        return result.modified_count
+
+    def pending_count(self) -> int:
+        """Number of tasks waiting to be claimed"""
+        return self.collection.count_documents({"status": "pending"})
+
+    def get(self, task_id: str) -> Optional[Dict]:
+        """Get a task document by ID"""
+        return self.collection.find_one({"_id": task_id})
+
+
+class TaskStatusStore:
+    """
+    Shared task status backed by a MongoDB collection
+
+    Lets every web worker answer status polls for tasks accepted or executed
+    by another process. Finished entries expire via a TTL index.
+    """
+
+    def __init__(self, collection, retention_seconds: int = 7 * 24 * 3600):
+        """
+        Initialize the store
+
+        Args:
+            collection: pymongo collection holding status documents
+            retention_seconds: How long finished task statuses are kept
+        """
+        self.collection = collection
+        self.retention_seconds = retention_seconds
+        self._create_indexes()
+
+    def _create_indexes(self):
+        """Create indexes for recency queries and expiry"""
+        try:
+            self.collection.create_index([("created_at", DESCENDING)])
+            self.collection.create_index("completed_at", expireAfterSeconds=self.retention_seconds)
+        except Exception as e:
+            logger.warning(f"Failed to create task status indexes: {e}")
+
+    def save(self, doc: Dict):
+        """
+        Insert or replace a full status document
+
+        Args:
+            doc: Status document with task_id and TaskResult fields
+        """
+        self.collection.replace_one({"_id": doc["task_id"]}, doc, upsert=True)
+
+    def update_progress(self, task_id: str, progress: int, message: str = "",
+                        rate: Optional[float] = None, eta_seconds: Optional[float] = None):
+        """Update only the progress fields of a status document"""
+        fields = {"progress": progress}
+        if message:
+            fields["message"] = message
+        if rate is not None:
+            fields["rate"] = rate
+            fields["eta_seconds"] = eta_seconds
+        self.collection.update_one({"_id": task_id}, {"$set": fields})
+
+    def load(self, task_id: str) -> Optional[Dict]:
+        """Get a status document by task ID"""
+        return self.collection.find_one({"_id": task_id})
+
+    def recent(self, limit: int = 10) -> List[Dict]:
+        """Get the most recently created status documents, newest first"""
+        return list(self.collection.find().sort("created_at", DESCENDING).limit(limit))
+
+
+class ScheduleStore:
+    """
+    Scheduled and recurring campaigns backed by a MongoDB collection
+
+    Each document is one schedule: the registered task type and kwargs to
+    submit, and next_run_at (UTC). Runs are claimed by moving next_run_at
+    forward atomically, so with several processes running a scheduler each
+    due time is submitted exactly once.
+    """
+
+    def __init__(self, collection):
+        """
+        Initialize the store
+
+        Args:
+            collection: pymongo collection holding schedule documents
+        """
+        self.collection = collection
+        self._create_indexes()
+
+    def _create_indexes(self):
+        """Create indexes used to load active schedules"""
+        try:
+            self.collection.create_index([("status", ASCENDING), ("next_run_at", ASCENDING)])
+        except Exception as e:
+            logger.warning(f"Failed to create schedule indexes: {e}")
+
+    def add(self, doc: Dict):
+        """
+        Persist a new active schedule
+
+        Args:
+            doc: Schedule document with _id, task_type, kwargs and next_run_at
+        """
+        doc.setdefault("status", "active")
+        doc.setdefault("runs", 0)
+        doc.setdefault("created_at", datetime.utcnow())
+        self.collection.insert_one(doc)
+
+    def claim_run(self, schedule_id: str, run_at: datetime, next_run_at: Optional[datetime]) -> Optional[Dict]:
+        """
+        Atomically take the run due at run_at
+
+        Args:
+            schedule_id: Schedule ID
+            run_at: Due time being fired; must still be the schedule's next_run_at
+            next_run_at: Following due time, or None if the schedule is finished
+
+        Returns:
+            The schedule document, or None if it was cancelled, paused or
+            the run was already taken by another process
+        """
+        fields = {"last_run_at": run_at, "next_run_at": next_run_at}
+        if next_run_at is None:
+            fields["status"] = "done"
+        return self.collection.find_one_and_update(
+            {"_id": schedule_id, "status": "active", "next_run_at": run_at},
+            {"$set": fields, "$inc": {"runs": 1}},
+            return_document=ReturnDocument.BEFORE,
+        )
+
+    def record_run(self, schedule_id: str, task_id: Optional[str], error: Optional[str] = None):
+        """Remember the task submitted for the latest run, or why it was not submitted"""
+        self.collection.update_one(
+            {"_id": schedule_id},
+            {"$set": {"last_task_id": task_id, "last_error": error}},
+        )
+
+    def set_status(self, schedule_id: str, status: str, next_run_at: Optional[datetime] = None) -> bool:
+        """
+        Pause, resume or cancel a schedule
+
+        Args:
+            schedule_id: Schedule ID
+            status: "active", "paused" or "cancelled"
+            next_run_at: New due time when resuming
+
+        Returns:
+            True if a schedule that had not finished was updated
+        """
+        fields = {"status": status}
+        if next_run_at is not None:
+            fields["next_run_at"] = next_run_at
+        result = self.collection.update_one(
+            {"_id": schedule_id, "status": {"$in": ["active", "paused"]}},
+            {"$set": fields},
+        )
+        return result.matched_count == 1
+
+    def active(self) -> List[Dict]:
+        """Get all active schedules with their due times"""
+        return list(self.collection.find(
+            {"status": "active"},
+            projection={"next_run_at": 1},
+        ))
+
+    def get(self, schedule_id: str) -> Optional[Dict]:
+        """Get a schedule document by ID"""
+        return self.collection.find_one({"_id": schedule_id})
+
+    def recent(self, limit: int = 50) -> List[Dict]:
+        """Get the most recently created schedules, newest first"""
+        return list(self.collection.find().sort("created_at", DESCENDING).limit(limit))
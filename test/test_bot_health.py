@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Test the cached bot identity and background getMe probe
+"""
+
+import sys
+import time
+import threading
+from pathlib import Path
+from types import SimpleNamespace
+sys.path.insert(0, str(Path(__file__).parent))
+
+
+class FakeGetMe:
+    """getMe stand-in that can be switched to failing"""
+
+    def __init__(self):
+        self.fail = False
+        self.calls = 0
+        self.called = threading.Event()
+
+    def __call__(self):
+        self.calls += 1
+        self.called.set()
+        if self.fail:
+            import config
+            raise ConnectionError(f"Read timed out: /bot{config.TELEGRAM_TOKEN}/getMe")
+        return SimpleNamespace(id=42, first_name="Test Bot", username="test_bot")
+
+
+def test_identity_cached_across_failures():
+    """Failures mark the bot offline but keep the last known identity"""
+    print("\n" + "="*70)
+    print("BOT HEALTH PROBE TEST")
+    print("="*70 + "\n")
+
+    from bot_health import BotHealthProbe
+
+    get_me = FakeGetMe()
+    probe = BotHealthProbe(get_me, interval=60)
+    assert probe.get_state()['status'] == "Checking"
+
+    assert probe.probe()
+    state = probe.get_state()
+    assert state['status'] == "Online" and state['bot_username'] == "test_bot"
+    assert state['last_latency_ms'] is not None and state['last_success_at']
+
+    get_me.fail = True
+    assert not probe.probe() and not probe.probe()
+    state = probe.get_state()
+    assert state['status'] == "Offline"
+    assert state['bot_name'] == "Test Bot" and state['bot_id'] == 42
+    assert state['consecutive_failures'] == 2 and "timed out" in state['last_error']
+    import config
+    assert config.TELEGRAM_TOKEN not in state['last_error']
+
+    get_me.fail = False
+    assert probe.probe()
+    assert probe.get_state()['consecutive_failures'] == 0
+    print(f"[OK] State: {probe.get_state()}")
+
+
+def test_reading_state_never_calls_telegram():
+    """get_state returns at once while a probe is stuck"""
+    from bot_health import BotHealthProbe
+
+    release = threading.Event()
+    started = threading.Event()
+
+    def slow_get_me():
+        started.set()
+        release.wait(5)
+        return SimpleNamespace(id=1, first_name="Slow", username="slow_bot")
+
+    probe = BotHealthProbe(slow_get_me, interval=60)
+    probe.start()
+    try:
+        assert started.wait(2)
+        begin = time.monotonic()
+        assert probe.get_state()['status'] == "Checking"
+        assert time.monotonic() - begin < 0.1
+        release.set()
+        for _ in range(50):
+            if probe.get_state()['status'] == "Online":
+                break
+            time.sleep(0.02)
+        assert probe.get_state()['bot_username'] == "slow_bot"
+        print("[OK] State read while probing")
+    finally:
+        release.set()
+        probe.stop()
+
+
+def test_background_probe_repeats():
+    """The probe thread calls getMe every interval"""
+    from bot_health import BotHealthProbe
+
+    get_me = FakeGetMe()
+    probe = BotHealthProbe(get_me, interval=0.05)
+    probe.start()
+    try:
+        time.sleep(0.3)
+    finally:
+        probe.stop()
+    assert get_me.calls >= 3
+    assert probe.get_state()['checks'] == get_me.calls
+    print(f"[OK] {get_me.calls} probes")
+
+
+if __name__ == "__main__":
+    test_identity_cached_across_failures()
+    test_reading_state_never_calls_telegram()
+    test_background_probe_repeats()
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Test webhook update delivery: update parsing and the secret token
+"""
+
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+
+import pytest
+
+pytest.importorskip("telebot")
+
+
+def test_parse_update():
+    """Webhook bodies parse into telebot updates"""
+    print("\n" + "="*70)
+    print("WEBHOOK DELIVERY TEST")
+    print("="*70 + "\n")
+
+    from bot_webhook import parse_update
+
+    update = parse_update(
+        '{"update_id": 7, "message": {"message_id": 1, "date": 0, "text": "hi",'
+        ' "chat": {"id": 42, "type": "private"}, "from": {"id": 42, "is_bot": false, "first_name": "A"}}}'
+    )
+    assert update.update_id == 7 and update.message.chat.id == 42
+    print("[OK] Update parsed")
+
+
+def test_secret_is_stable():
+    """Without WEBHOOK_SECRET every worker derives the same valid token"""
+    import config
+    from bot_webhook import webhook_secret
+
+    secret = webhook_secret()
+    assert secret == webhook_secret()
+    assert 1 <= len(secret) <= 256 and secret.isalnum()
+
+    original = config.WEBHOOK_SECRET
+    config.WEBHOOK_SECRET = "configured_secret"
+    try:
+        assert webhook_secret() == "configured_secret"
+    finally:
+        config.WEBHOOK_SECRET = original
+    print("[OK] Secret token derived")
+
+
+if __name__ == "__main__":
+    test_parse_update()
+    test_secret_is_stable()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Test the pre-flight dry run of uploaded campaigns
+"""
+
+import sys
+import time
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+mongomock = pytest.importorskip("mongomock")
+
+USERS = [
+    (111, 'Ahmed Ali', '+201001234567'),
+    (222, 'Mohamed Ali', '+201007654321'),
+    (333, 'Sara', ''),
+]
+
+
+class CountingCollection:
+    """Users collection counting database round trips"""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.calls = []
+
+    def __getattr__(self, name):
+        attr = getattr(self.collection, name)
+        if name in ("find", "find_one"):
+            def counted(*args, **kwargs):
+                self.calls.append(name)
+                return attr(*args, **kwargs)
+            return counted
+        return attr
+
+
+def _load_users(db, monkeypatch, users):
+    collection = CountingCollection(mongomock.MongoClient().db.users)
+    collection.insert_many([{'chat_id': cid, 'name': name, 'phone_number': phone} for cid, name, phone in users])
+    monkeypatch.setattr(db, "users_collection", collection)
+    return collection
+
+
+@pytest.fixture
+def db(monkeypatch):
+    import pymongo
+    if "database" not in sys.modules:
+        # Importing the database module connects; no live MongoDB is needed here
+        monkeypatch.setattr(pymongo, "MongoClient", mongomock.MongoClient)
+    from database import db
+    _load_users(db, monkeypatch, USERS)
+    return db
+
+
+def test_report_counts_every_category(db):
+    """Every row is resolved and rendered into exactly one category"""
+    print("\n" + "="*70)
+    print("CAMPAIGN DRY RUN TEST")
+    print("="*70 + "\n")
+
+    from excel_processor import ExcelProcessor
+    from campaign_dry_run import TargetResolver, build_report
+
+    df = pd.DataFrame({
+        'chat_id': ['111', '999', '+201001234567', 'Sara', 'Ali', 'Nobody', '', '222', '333'],
+        'name': ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H' * 5000, None],
+    })
+    rows = ExcelProcessor.prepare_personalized_columns(df, 'chat_id', ['name'])
+    report = build_report(rows, "Hi {name}", TargetResolver(db), send_interval=0.5)
+
+    assert report['total'] == 9
+    assert report['numeric'] == 4 and report['unknown_chat_ids'] == 1
+    assert report['phone_matched'] == 1
+    assert report['name_matched'] == 1
+    assert report['ambiguous'] == 1 and report['samples']['ambiguous'] == ['Ali (2 users)']
+    assert report['unmatched'] == 1 and report['samples']['unmatched'] == ['Nobody']
+    assert report['missing_target'] == 1
+    assert report['oversize'] == 1
+    # 4 chat IDs + 1 phone + 1 name + 2 for the ambiguous name
+    assert report['messages'] == 8
+    assert report['estimated_seconds'] == 4
+    print(f"[OK] Report: {report}")
+
+
+def test_template_errors_counted(db):
+    """Rows whose placeholders cannot be filled are counted, not raised"""
+    from campaign_dry_run import TargetResolver, build_report
+
+    rows = [{'target': '111', 'name': 'A'}, {'target': 111.0}]
+    report = build_report(rows, "Hi {name}", TargetResolver(db), send_interval=1)
+    assert report['missing_placeholder'] == 1 and report['messages'] == 1
+
+    report = build_report(rows, "Hi {", TargetResolver(db), send_interval=1)
+    assert report['missing_placeholder'] == 2 and report['messages'] == 0
+    print("[OK] Template errors counted")
+
+
+def test_bulk_matches_equal_the_sender_lookups(db, monkeypatch):
+    """Bulk resolution gives the matches of find_users_by_phone, then find_users_by_name"""
+    from campaign_dry_run import TargetResolver
+
+    _load_users(db, monkeypatch, USERS + [(444, 'Twin', '+201001234567'), (555, 'Omar', '01112223334')])
+    targets = ['+201001234567', '+201007654321', '01112223334', '1112223', 'Sara', 'ali',
+               'Nobody', '+2010', '(', '']
+    resolver = TargetResolver(db)
+    resolver.resolve(targets)
+    for target in targets:
+        expected = db.find_users_by_phone(target) or db.find_users_by_name(target)
+        assert resolver.lookup(target)[1] == expected, target
+    print("[OK] Bulk matches equal the sender's lookups")
+
+
+def test_large_campaign_is_fast_and_batched(db, monkeypatch):
+    """50k rows resolve with a bounded number of queries"""
+    from excel_processor import ExcelProcessor
+    from campaign_dry_run import TargetResolver, build_report, RESOLVE_BATCH
+
+    num_rows = 50000
+    # mongomock evaluates $in per document in Python; 1000 users keep the test quick
+    users = [(i, f"Student {i}", f"+2010{i:08d}") for i in range(1000)]
+    collection = _load_users(db, monkeypatch, users)
+    names = [f"Student {i}" for i in range(990, 999)] + ["Nobody"]
+    targets = [str(i) if i % 2 else f"+2010{i % 1000:08d}" for i in range(num_rows)]
+    for i, name in enumerate(names):
+        targets[i * 2] = name
+    rows = ExcelProcessor.prepare_personalized_columns(
+        pd.DataFrame({'chat_id': targets, 'name': ['x'] * num_rows}), 'chat_id', ['name'])
+
+    start = time.perf_counter()
+    report = build_report(rows, "Hello {name}", TargetResolver(db), send_interval=0.5)
+    elapsed = time.perf_counter() - start
+
+    assert report['numeric'] + report['phone_matched'] + report['name_matched'] + report['unmatched'] == num_rows
+    assert report['name_matched'] == 9 and report['unmatched'] == 1
+    batches = -(-num_rows // RESOLVE_BATCH)
+    # Per batch one exact-phone and one chat ID query; partial-phone and name queries only for the 10 names
+    assert collection.calls.count("find_one") == 0
+    assert collection.calls.count("find") <= 2 * batches + 2 * len(names)
+    assert elapsed < 15
+    print(f"[OK] {num_rows} rows checked with {len(collection.calls)} queries in {elapsed:.2f}s")
+
+
+def test_dry_run_stops_when_cancelled(db):
+    """The report loop checks the task's control between batches"""
+    from campaign_dry_run import TargetResolver, build_report, RESOLVE_BATCH
+    from task_queue import TaskControl, TaskCancelled
+
+    control = TaskControl("dry-run")
+    seen = []
+
+    def progress(current, total):
+        seen.append(current)
+        if current == RESOLVE_BATCH:
+            control.request_cancel()
+
+    rows = [{'target': '111', 'name': 'A'}] * (3 * RESOLVE_BATCH)
+    with pytest.raises(TaskCancelled):
+        build_report(rows, "Hi {name}", TargetResolver(db), 1, progress_callback=progress, control=control)
+    assert len(seen) == RESOLVE_BATCH
+    print("[OK] Dry run cancelled between batches")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-q"])
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Test scheduled campaigns: cron expressions, off-peak windows and the timer thread
+"""
+
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+
+import pytest
+
+
+def test_cron_next_after():
+    """Cron expressions find the next matching minute"""
+    print("\n" + "="*70)
+    print("CRON EXPRESSION TEST")
+    print("="*70 + "\n")
+
+    from campaign_scheduler import CronExpression
+
+    # 2026-10-19 is a Monday
+    monday = datetime(2026, 10, 19, 8, 30)
+    assert CronExpression("0 7 * * *").next_after(monday) == datetime(2026, 10, 20, 7, 0)
+    assert CronExpression("*/15 * * * *").next_after(monday) == datetime(2026, 10, 19, 8, 45)
+    assert CronExpression("0 7 * * fri").next_after(monday) == datetime(2026, 10, 23, 7, 0)
+    assert CronExpression("0 7 * * 7").next_after(monday) == datetime(2026, 10, 25, 7, 0)
+    assert CronExpression("@monthly").next_after(monday) == datetime(2026, 11, 1, 0, 0)
+    # Day and weekday both restricted: either matches
+    assert CronExpression("0 7 1 * mon").next_after(monday) == datetime(2026, 10, 26, 7, 0)
+
+    for bad in ("0 7 * *", "61 * * * *", "0 7 * * funday", "0 0 30 2 *"):
+        with pytest.raises(ValueError):
+            CronExpression(bad).next_after(monday)
+    print("[OK] Cron expressions resolved")
+
+
+def test_time_zone_and_off_peak():
+    """Schedule times are wall-clock in the configured zone; off-peak picks the next window"""
+    from campaign_scheduler import CampaignScheduler
+
+    scheduler = CampaignScheduler(store=None, timezone="Africa/Cairo", off_peak_window="01:00-06:00")
+    # 07:00 Cairo (UTC+3 in summer) is 04:00 UTC
+    assert scheduler.next_cron_run("0 7 * * *", after=datetime(2026, 7, 1, 0, 0)) == datetime(2026, 7, 1, 4, 0)
+
+    inside = datetime(2026, 7, 1, 0, 30)  # 03:30 Cairo
+    assert scheduler.next_off_peak(inside) == inside
+    assert scheduler.next_off_peak(datetime(2026, 7, 1, 12, 0)) == datetime(2026, 7, 1, 22, 0)
+    print("[OK] Time zone and off-peak window applied")
+
+
+class _FakeQueue:
+    def __init__(self):
+        self.submitted = []
+
+    def submit_registered(self, task_id, task_type, kwargs=None, priority=1, timeout=None, trusted=False):
+        self.submitted.append((task_id, task_type, kwargs, priority, timeout))
+        return task_id
+
+
+def _make_scheduler(queue):
+    mongomock = pytest.importorskip("mongomock")
+    from campaign_scheduler import CampaignScheduler
+    from task_store import ScheduleStore
+    store = ScheduleStore(mongomock.MongoClient().db.schedules)
+    return CampaignScheduler(store, queue=queue, poll_interval=0.2)
+
+
+def _wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def test_due_schedule_is_submitted_once():
+    """A one-off schedule fires once, and a cancelled one never fires"""
+    from campaign_scheduler import register_audience
+    from task_queue import PRIORITY_HIGH
+
+    @register_audience("test_audience")
+    def audience():
+        return [1, 2, 3]
+
+    queue = _FakeQueue()
+    scheduler = _make_scheduler(queue)
+    scheduler.start()
+    try:
+        soon = datetime.utcnow() + timedelta(seconds=0.3)
+        sid = scheduler.schedule("bulk_send", {"template": "Hi"}, run_at=soon, audience="test_audience")
+        cancelled = scheduler.schedule("bulk_send", {"template": "No"}, run_at=soon)
+        assert scheduler.cancel(cancelled)
+
+        assert _wait_for(lambda: queue.submitted)
+        time.sleep(0.5)  # Reloads must not fire it again
+        assert len(queue.submitted) == 1
+        task_id, task_type, kwargs, priority, timeout = queue.submitted[0]
+        assert task_id.startswith(f"sched-{sid}-")
+        assert kwargs == {"template": "Hi", "chat_ids": [1, 2, 3]}
+        assert timeout is not None
+        assert priority == PRIORITY_HIGH, "priority left on auto follows the audience resolved at fire time"
+
+        doc = scheduler.store.get(sid)
+        assert doc["status"] == "done" and doc["last_task_id"] == task_id
+        print(f"[OK] Schedule fired once as {task_id}")
+    finally:
+        scheduler.stop()
+
+
+def test_run_is_claimed_by_one_process():
+    """Two schedulers sharing a store submit a due run only once"""
+    mongomock = pytest.importorskip("mongomock")
+    from campaign_scheduler import CampaignScheduler
+    from task_store import ScheduleStore
+
+    collection = mongomock.MongoClient().db.schedules
+    queue = _FakeQueue()
+    first = CampaignScheduler(ScheduleStore(collection), queue=queue)
+    second = CampaignScheduler(ScheduleStore(collection), queue=queue)
+
+    run_at = datetime.utcnow().replace(microsecond=0) - timedelta(minutes=1)
+    sid = first.schedule("bulk_send", {"template": "Hi"}, run_at=run_at, cron="0 7 * * *")
+    first._fire(sid, run_at)
+    second._fire(sid, run_at)
+
+    assert len(queue.submitted) == 1
+    doc = first.store.get(sid)
+    assert doc["status"] == "active" and doc["next_run_at"] > datetime.utcnow()
+    print("[OK] Recurring run claimed once and rescheduled")
+
+
+def test_simultaneous_runs_do_not_trip_loop_detection():
+    """More than RAPID_TASK_THRESHOLD runs due at once are all submitted"""
+    import os
+    from task_queue import TaskQueue, RAPID_TASK_THRESHOLD, register_task_type
+
+    @register_task_type("test_scheduled_noop")
+    def noop(task_id):
+        return {"sent": 0, "failed": 0}
+
+    queue = TaskQueue(num_workers=1)
+    scheduler = _make_scheduler(queue)
+    stop_bot = os.environ.pop('STOP_BOT', None)
+    try:
+        run_at = datetime.utcnow().replace(microsecond=0) - timedelta(minutes=1)
+        ids = [scheduler.schedule("test_scheduled_noop", {}, run_at=run_at, cron="0 7 * * *")
+               for _ in range(RAPID_TASK_THRESHOLD + 3)]
+        for sid in ids:
+            scheduler._fire(sid, run_at)
+
+        assert scheduler.fired_runs == len(ids) and scheduler.failed_runs == 0
+        assert not queue.paused and os.environ.get('STOP_BOT') != '1'
+        # Request submissions are still checked
+        for i in range(RAPID_TASK_THRESHOLD):
+            queue.submit_task(f"manual-{i}", lambda: None)
+        with pytest.raises(RuntimeError):
+            queue.submit_task("manual-loop", lambda: None)
+        print(f"[OK] {len(ids)} simultaneous runs submitted")
+    finally:
+        os.environ.pop('STOP_BOT', None)
+        if stop_bot is not None:
+            os.environ['STOP_BOT'] = stop_bot
+
+
+def test_cancelled_one_off_schedule_runs_cleanup():
+    """Cancelling a one-off schedule that has not fired releases its task's upload"""
+    from task_queue import TASK_CLEANUPS, register_task_cleanup
+
+    removed = []
+
+    @register_task_cleanup("test_scheduled_upload")
+    def remove_upload(file_path, **kwargs):
+        removed.append(file_path)
+
+    scheduler = _make_scheduler(_FakeQueue())
+    try:
+        later = datetime.utcnow() + timedelta(hours=1)
+        one_off = scheduler.schedule("test_scheduled_upload", {"file_path": "a.xlsx"}, run_at=later)
+        recurring = scheduler.schedule("test_scheduled_upload", {"file_path": "b.xlsx"}, cron="0 7 * * *")
+        assert scheduler.cancel(one_off) and scheduler.cancel(recurring)
+        assert removed == ["a.xlsx"], "recurring runs may still use their kwargs"
+        assert not scheduler.cancel(one_off)
+        assert removed == ["a.xlsx"]
+        print("[OK] Cancelled one-off schedule cleaned up")
+    finally:
+        TASK_CLEANUPS.pop("test_scheduled_upload", None)
+
+
+def test_all_users_audience_is_not_paginated(monkeypatch):
+    """The all_users audience holds every registered user, not the first page of the users list"""
+    pytest.importorskip("telebot")
+    mongomock = pytest.importorskip("mongomock")
+    import sys
+    import pymongo
+    if "database" not in sys.modules:
+        # Importing the database module connects; no live MongoDB is needed here
+        monkeypatch.setattr(pymongo, "MongoClient", mongomock.MongoClient)
+    from database import db
+    from campaign_scheduler import SCHEDULE_AUDIENCES
+    import campaign_tasks  # Registers the audience
+
+    collection = mongomock.MongoClient().db.users
+    collection.insert_many([{"chat_id": 1000 + i, "name": f"User {i}"} for i in range(120)])
+    monkeypatch.setattr(db, "users_collection", collection)
+
+    chat_ids = SCHEDULE_AUDIENCES["all_users"]()
+    assert sorted(chat_ids) == list(range(1000, 1120))
+
+    # Priority left on auto is sized from the whole audience
+    from task_queue import PRIORITY_NORMAL
+    queue = _FakeQueue()
+    scheduler = _make_scheduler(queue)
+    run_at = datetime.utcnow().replace(microsecond=0) - timedelta(minutes=1)
+    sid = scheduler.schedule("bulk_send", {"template": "Hi"}, run_at=run_at, audience="all_users")
+    scheduler._fire(sid, run_at)
+    _, _, kwargs, priority, _ = queue.submitted[0]
+    assert len(kwargs["chat_ids"]) == 120 and priority == PRIORITY_NORMAL
+    print(f"[OK] all_users audience resolved to {len(chat_ids)} users")
+
+
+if __name__ == "__main__":
+    test_cron_next_after()
+    test_time_zone_and_off_peak()
+    test_due_schedule_is_submitted_once()
+    test_run_is_claimed_by_one_process()
+    test_simultaneous_runs_do_not_trip_loop_detection()
+    test_cancelled_one_off_schedule_runs_cleanup()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Test the CPU process pool and column batches for Excel ingestion
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+
+import pandas as pd
+
+
+def test_columns_match_row_preparation():
+    """prepare_personalized_columns yields the same rows as prepare_personalized_rows"""
+    print("\n" + "="*70)
+    print("CPU POOL / COLUMN BATCH TEST")
+    print("="*70 + "\n")
+
+    from excel_processor import ExcelProcessor
+
+    df = pd.DataFrame({
+        'phone': [201285000000, 5551234, None],
+        'name': ['Ali', None, 'Sara'],
+        'amount': [1.5, 2, 3],
+    })
+    expected = ExcelProcessor.prepare_personalized_rows(df, 'phone', ['name', 'amount'])
+    batch = ExcelProcessor.prepare_personalized_columns(df, 'phone', ['name', 'amount'])
+
+    assert len(batch) == 3
+    assert batch.rows() == expected
+    print(f"[OK] {len(batch)} rows identical: {batch.rows()[0]}")
+
+
+def test_parse_in_process_pool():
+    """A workbook is parsed in a worker process and comes back as columns"""
+    import config
+    import cpu_pool
+    from excel_processor import load_personalized_columns, ExcelProcessor
+
+    fd, path = tempfile.mkstemp(suffix='.xlsx')
+    os.close(fd)
+    try:
+        pd.DataFrame({'chat_id': [111, 222], 'name': ['A', 'B']}).to_excel(path, index=False)
+
+        config.CPU_POOL_WORKERS = 1
+        batch = cpu_pool.run_cpu_bound(load_personalized_columns, path, 'chat_id', ['name'])
+        assert batch.columns == {'target': ['111', '222'], 'name': ['A', 'B']}
+
+        preview = cpu_pool.run_cpu_bound(ExcelProcessor.get_excel_preview, path)
+        assert preview['columns'] == ['chat_id', 'name'] and preview['row_count'] == 2
+        print("[OK] Parsed and previewed in the process pool")
+    finally:
+        os.remove(path)
+        pool = cpu_pool.get_cpu_pool()
+        if pool is not None:
+            pool.shutdown()
+            cpu_pool._cpu_pool = None
+
+
+if __name__ == "__main__":
+    test_columns_match_row_preparation()
+    test_parse_in_process_pool()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Test durable MongoDB-backed task queue: claiming, leases and re-delivery,
+and the task status store shared between web workers
+"""
+
+import sys
+import time
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+
+
+def _make_store(lease_seconds=60, max_attempts=3):
+    from task_store import DurableTaskStore
+    collection = mongomock.MongoClient().db.tasks
+    return DurableTaskStore(collection, lease_seconds=lease_seconds, max_attempts=max_attempts)
+
+
+def test_claim_is_exclusive():
+    """A pending task can only be claimed by one worker"""
+    print("\n" + "="*70)
+    print("DURABLE STORE CLAIM TEST")
+    print("="*70 + "\n")
+
+    store = _make_store()
+    assert store.enqueue("task-1", "noop", {"value": 1})
+    assert not store.enqueue("task-1", "noop", {"value": 1}), "duplicate IDs must be rejected"
+
+    doc = store.claim("worker-a")
+    assert doc["_id"] == "task-1"
+    assert doc["attempts"] == 1
+    assert store.claim("worker-b") is None, "claimed task must not be handed out twice"
+    print("[OK] Task claimed exactly once")
+
+
+def test_expired_lease_is_redelivered():
+    """A task whose lease expired is handed to another worker"""
+    store = _make_store(lease_seconds=0)
+    store.enqueue("task-2", "noop", {})
+
+    store.claim("worker-a")
+    time.sleep(0.01)
+    doc = store.claim("worker-b")
+    assert doc is not None and doc["worker_id"] == "worker-b"
+    assert doc["attempts"] == 2
+    assert not store.heartbeat("task-2", "worker-a"), "old worker must lose the lease"
+    print("[OK] Expired lease re-delivered")
+
+
+def test_exhausted_task_fails():
+    """Tasks that keep losing their lease are eventually failed"""
+    store = _make_store(lease_seconds=0, max_attempts=1)
+    store.enqueue("task-3", "noop", {})
+    store.claim("worker-a")
+    time.sleep(0.01)
+
+    assert store.claim("worker-b") is None
+    assert store.fail_exhausted() == 1
+    assert store.get("task-3")["status"] == "failed"
+    print("[OK] Exhausted task marked failed")
+
+
+def test_queue_runs_registered_task():
+    """TaskQueue executes registered tasks claimed from the store"""
+    from task_queue import TaskQueue, register_task_type
+
+    @register_task_type("test_add")
+    def add_task(task_id, a, b):
+        return {"sum": a + b}
+
+    store = _make_store()
+    queue = TaskQueue(num_workers=1, store=store)
+    queue.start()
+    try:
+        queue.submit_registered("durable-add", "test_add", {"a": 2, "b": 3})
+        for _ in range(50):
+            if store.get("durable-add")["status"] == "completed":
+                break
+            time.sleep(0.1)
+
+        doc = store.get("durable-add")
+        assert doc["status"] == "completed"
+        assert doc["result"] == {"sum": 5}
+        assert queue.get_status("durable-add").status == "completed"
+        print("[OK] Registered task executed from durable store")
+    finally:
+        queue.stop()
+
+
+def test_status_shared_between_queues():
+    """A task run by one process is visible to another through the status store"""
+    print("\n" + "="*70)
+    print("SHARED TASK STATUS TEST")
+    print("="*70 + "\n")
+
+    from task_queue import TaskQueue
+    from task_store import TaskStatusStore
+
+    collection = mongomock.MongoClient().db.task_status
+    worker_a = TaskQueue(num_workers=1, status_store=TaskStatusStore(collection))
+    worker_b = TaskQueue(num_workers=1, status_store=TaskStatusStore(collection))
+    worker_a.start()
+    try:
+        worker_a.submit_task("shared-1", lambda: {"sent": 3, "failed": 0})
+        for _ in range(50):
+            if worker_b.get_status("shared-1").status == "completed":
+                break
+            time.sleep(0.1)
+
+        status = worker_b.get_status("shared-1")
+        assert status.status == "completed"
+        assert status.data == {"sent": 3, "failed": 0}
+        assert [t.task_id for t in worker_b.recent_tasks(10)] == ["shared-1"]
+        print("[OK] Status visible from another worker")
+    finally:
+        worker_a.stop()
+
+
+def test_progress_writes_are_throttled():
+    """Progress updates reach the status store at most once per interval"""
+    from task_queue import TaskQueue, TaskResult
+    from task_store import TaskStatusStore
+
+    store = TaskStatusStore(mongomock.MongoClient().db.task_status)
+    queue = TaskQueue(num_workers=1, status_store=store, progress_write_interval=60)
+    queue.results["throttled"] = TaskResult(task_id="throttled", status="running")
+    queue._publish("throttled")
+
+    queue.record_progress("throttled", 10, "Sending 1/10")
+    queue.record_progress("throttled", 20, "Sending 2/10")
+
+    assert queue.results["throttled"].progress == 20, "local cache always current"
+    assert store.load("throttled")["progress"] == 10, "second write within interval skipped"
+    print("[OK] Progress writes throttled")
+
+
+if __name__ == "__main__":
+    test_claim_is_exclusive()
+    test_expired_lease_is_redelivered()
+    test_exhausted_task_fails()
+    test_queue_runs_registered_task()
+    test_status_shared_between_queues()
+    test_progress_writes_are_throttled()
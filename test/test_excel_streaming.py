@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Test streaming Excel ingestion: fixed-size chunks and row streams for the send loop
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+
+import pytest
+
+openpyxl = pytest.importorskip("openpyxl")
+
+
+def _write_workbook(rows, trailing_blank=0):
+    fd, path = tempfile.mkstemp(suffix='.xlsx')
+    os.close(fd)
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.append(['chat_id', 'name'])
+    for row in rows:
+        sheet.append(row)
+    for i in range(trailing_blank):
+        # Formatted but empty cells still extend the sheet
+        sheet.cell(row=len(rows) + 2 + i, column=1).number_format = '0'
+    workbook.save(path)
+    return path
+
+
+def test_chunks_have_fixed_size():
+    """read_excel_chunked yields chunk_size rows at a time"""
+    print("\n" + "="*70)
+    print("STREAMING EXCEL READER TEST")
+    print("="*70 + "\n")
+
+    from excel_processor import ExcelProcessor, count_excel_rows
+
+    path = _write_workbook([[1000 + i, f"User {i}"] for i in range(250)], trailing_blank=3)
+    try:
+        chunks = list(ExcelProcessor.read_excel_chunked(path, chunk_size=100))
+        assert [len(c) for c in chunks] == [100, 100, 50]
+        assert list(chunks[0].columns) == ['chat_id', 'name']
+        assert chunks[2]['chat_id'].tolist()[-1] == 1249
+        assert count_excel_rows(path) == 250
+        print(f"[OK] {len(chunks)} chunks, {count_excel_rows(path)} rows")
+    finally:
+        os.remove(path)
+
+
+def test_row_stream_matches_full_read():
+    """ExcelRowStream yields the same prepared rows as preparing the whole file"""
+    import pandas as pd
+    from excel_processor import ExcelProcessor, ExcelRowStream, count_excel_rows
+
+    path = _write_workbook([[201285000000 + i, f"User {i}" if i % 7 else None] for i in range(120)])
+    try:
+        expected = ExcelProcessor.prepare_personalized_columns(pd.read_excel(path), 'chat_id', ['name']).rows()
+        stream = ExcelRowStream(path, 'chat_id', ['name'], count_excel_rows(path), chunk_size=25)
+
+        assert len(stream) == 120
+        assert list(stream) == expected
+        assert list(stream) == expected, "stream can be iterated again (resume after pause)"
+
+        chunked = ExcelProcessor.prepare_personalized_rows(
+            ExcelProcessor.read_excel_chunked(path, chunk_size=50), 'chat_id', ['name'], total_rows=120
+        )
+        assert chunked == expected
+        print(f"[OK] Streamed rows match: {expected[1]}")
+    finally:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    test_chunks_have_fixed_size()
+    test_row_stream_matches_full_read()
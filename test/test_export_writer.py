@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Test constant-memory export writers
+"""
+
+import os
+import csv
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+
+import pytest
+
+openpyxl = pytest.importorskip("openpyxl")
+pytest.importorskip("pandas")
+
+
+def _batches(num_batches, batch_size):
+    for b in range(num_batches):
+        yield [(b * batch_size + i, f"+2010{b * batch_size + i:08d}") for i in range(batch_size)]
+
+
+def test_xlsx_autosize_streams_batches():
+    """Batches are written in order and widths fit the longest value"""
+    print("\n" + "="*70)
+    print("EXPORT WRITER TEST")
+    print("="*70 + "\n")
+
+    from excel_processor import XlsxExportWriter
+
+    writer = XlsxExportWriter(['Chat ID', 'Phone Number'], 'Users with Phones', autosize=True)
+    for batch in _batches(3, 1000):
+        writer.write_rows(batch)
+    writer.write_rows([(123456789012345, None)])
+    path = writer.close()
+    try:
+        sheet = openpyxl.load_workbook(path)['Users with Phones']
+        rows = list(sheet.iter_rows(values_only=True))
+        assert rows[0] == ('Chat ID', 'Phone Number')
+        assert len(rows) == 3002 and writer.num_rows == 3001
+        assert rows[1] == (0, '+201000000000') and rows[-1] == (123456789012345, None)
+        assert sheet.column_dimensions['A'].width == 17
+        assert sheet.column_dimensions['B'].width == 15
+        print(f"[OK] {writer.num_rows} rows, widths A=17 B=15")
+    finally:
+        os.remove(path)
+
+
+def test_xlsx_and_csv_without_autosize():
+    """Plain exports write straight through to the file"""
+    from excel_processor import XlsxExportWriter, CsvExportWriter
+
+    writer = XlsxExportWriter(['chat_id', 'name'], 'Users')
+    writer.write_rows([(1, 'Ahmed'), (2, 'Sara')])
+    path = writer.close()
+    try:
+        rows = list(openpyxl.load_workbook(path)['Users'].iter_rows(values_only=True))
+        assert rows == [('chat_id', 'name'), (1, 'Ahmed'), (2, 'Sara')]
+    finally:
+        os.remove(path)
+
+    writer = CsvExportWriter(['Chat ID', 'Name'])
+    writer.write_rows([(1, 'أحمد'), (2, 'Sara, Jr.')])
+    path = writer.close()
+    try:
+        with open(path, newline='', encoding='utf-8') as f:
+            assert list(csv.reader(f)) == [['Chat ID', 'Name'], ['1', 'أحمد'], ['2', 'Sara, Jr.']]
+        print("[OK] Plain xlsx and csv exports")
+    finally:
+        os.remove(path)
+
+
+def test_failed_export_removes_its_file():
+    """An error while writing (e.g. a dropped cursor) leaves no partial file"""
+    import pytest
+    from excel_processor import XlsxExportWriter, CsvExportWriter
+
+    writers = [XlsxExportWriter(['a', 'b'], 'S'), XlsxExportWriter(['a', 'b'], 'S', autosize=True),
+               CsvExportWriter(['a', 'b'])]
+    for writer in writers:
+        with pytest.raises(ConnectionError):
+            with writer:
+                writer.write_rows([(1, 2)])
+                raise ConnectionError("cursor lost")
+        assert not os.path.exists(writer.path)
+    print("[OK] Partial exports removed")
+
+
+if __name__ == "__main__":
+    test_xlsx_autosize_streams_batches()
+    test_xlsx_and_csv_without_autosize()
+    test_failed_export_removes_its_file()
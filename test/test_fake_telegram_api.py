@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Test the local fake Telegram Bot API server through telebot
+"""
+
+import sys
+import time
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+
+import pytest
+
+telebot = pytest.importorskip("telebot")
+from telebot import apihelper
+from telebot.apihelper import ApiTelegramException
+
+
+@pytest.fixture
+def make_api(monkeypatch):
+    from fake_telegram_api import FakeTelegramAPI
+    servers = []
+
+    def make(**kwargs):
+        api = FakeTelegramAPI(**kwargs).start()
+        servers.append(api)
+        monkeypatch.setattr(apihelper, "API_URL", api.url + "/bot{0}/{1}")
+        return api, telebot.TeleBot("123:fake", threaded=False)
+
+    yield make
+    for api in servers:
+        api.stop()
+
+
+def test_bot_methods(make_api):
+    """getMe, sends, webhook and getUpdates answer like the Bot API"""
+    print("\n" + "="*70)
+    print("FAKE TELEGRAM API TEST")
+    print("="*70 + "\n")
+
+    api, bot = make_api()
+    assert bot.get_me().username == "fake_test_bot"
+    message = bot.send_message(42, "hello")
+    assert message.chat.id == 42 and message.text == "hello"
+    assert bot.send_photo(42, "photo-file-id", caption="pic").caption == "pic"
+    assert bot.copy_message(43, 42, message.message_id).message_id > message.message_id
+    assert bot.set_webhook(url="https://example.invalid/hook")
+    assert api.webhook_url == "https://example.invalid/hook"
+
+    api.push_message(7, "/start")
+    api.push_message(8, "hi")
+    updates = bot.get_updates(offset=0, timeout=5, long_polling_timeout=1)
+    assert [u.message.chat.id for u in updates] == [7, 8]
+    assert updates[0].message.text == "/start"
+    # Confirmed updates are not delivered again
+    api.push_message(9, "again")
+    updates = bot.get_updates(offset=updates[-1].update_id + 1, timeout=5, long_polling_timeout=1)
+    assert [u.message.chat.id for u in updates] == [9]
+
+    stats = api.get_stats()
+    assert stats['requests']['sendMessage'] == 1 and stats['requests']['getUpdates'] == 2
+    assert stats['recipients'] == 2 and stats['messages_delivered'] == 3
+    print(f"[OK] Stats: {stats}")
+
+
+def test_flood_and_blocked_injection(make_api):
+    """Sends beyond flood_rate get 429 with retry_after; blocked chats get 403"""
+    api, bot = make_api(flood_rate=5, retry_after=3, blocked_chats=[99])
+
+    with pytest.raises(ApiTelegramException) as blocked:
+        bot.send_message(99, "hi")
+    assert blocked.value.error_code == 403
+
+    codes = []
+    for _ in range(10):
+        try:
+            bot.send_message(1, "hi")
+            codes.append(200)
+        except ApiTelegramException as e:
+            codes.append(e.error_code)
+            assert e.result_json['parameters']['retry_after'] == 3
+    assert codes.count(429) >= 4
+    assert api.get_stats()['responses']['429'] == codes.count(429)
+    print(f"[OK] Responses: {api.get_stats()['responses']}")
+
+
+def test_latency_and_blocked_ratio_are_reproducible():
+    """Seeded latency samples and blocked_ratio picks repeat across runs"""
+    from fake_telegram_api import FakeTelegramAPI, LatencyModel
+
+    model_a, model_b = LatencyModel("uniform", 40, 10, seed=3), LatencyModel("uniform", 40, 10, seed=3)
+    samples = [model_a.sample() for _ in range(100)]
+    assert samples == [model_b.sample() for _ in range(100)]
+    assert all(0.03 <= s <= 0.05 for s in samples)
+    assert all(LatencyModel("normal", 5, 50, seed=3).sample() >= 0 for _ in range(100))
+
+    api = FakeTelegramAPI(blocked_ratio=0.1)
+    try:
+        blocked = [c for c in range(10000) if api.is_blocked(c)]
+        assert 800 < len(blocked) < 1200
+        assert blocked == [c for c in range(10000) if api.is_blocked(c)]
+    finally:
+        api.stop()
+
+    with pytest.raises(ValueError):
+        LatencyModel("pareto")
+    print("[OK] Reproducible")
+
+
+def test_long_poll_waits_for_updates(make_api):
+    """getUpdates returns as soon as an update arrives during the long poll"""
+    import threading
+    api, bot = make_api()
+
+    threading.Timer(0.2, api.push_message, args=(5, "late")).start()
+    start = time.monotonic()
+    updates = bot.get_updates(timeout=10, long_polling_timeout=5)
+    assert [u.message.text for u in updates] == ["late"]
+    assert time.monotonic() - start < 2
+    print("[OK] Long poll")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-q", "-s"])
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Test Server-Sent Events progress streams: coalescing and stream lifetime
+"""
+
+import sys
+import json
+import time
+import threading
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+
+
+def _parse(chunks):
+    """Turn yielded SSE chunks into (event, data) tuples"""
+    events = []
+    for chunk in chunks:
+        for message in chunk.split("\n\n"):
+            lines = dict(line.split(": ", 1) for line in message.splitlines() if ": " in line and not line.startswith(":"))
+            if 'event' in lines:
+                events.append((lines['event'], json.loads(lines['data'])))
+    return events
+
+
+def test_task_stream_is_coalesced():
+    """Hundreds of progress updates become a handful of events, ending with the final state"""
+    print("\n" + "="*70)
+    print("SSE PROGRESS STREAM TEST")
+    print("="*70 + "\n")
+
+    import config
+    from task_queue import TaskQueue
+    from progress_events import stream_task_events
+
+    config.SSE_MIN_INTERVAL = 0.2
+    queue = TaskQueue(num_workers=1)
+    queue.start()
+    release = threading.Event()
+    try:
+        def campaign():
+            release.wait(5)
+            for i in range(300):
+                queue.record_progress("stream-1", i // 3, f"Sending {i}/300")
+                time.sleep(0.005)
+            return {'sent': 300, 'failed': 0}
+
+        queue.submit_task("stream-1", campaign)
+        chunks = []
+        reader = threading.Thread(target=lambda: chunks.extend(stream_task_events(queue, "stream-1")))
+        reader.start()
+        time.sleep(0.1)
+        release.set()
+        reader.join(timeout=10)
+
+        events = _parse(chunks)
+        assert not reader.is_alive(), "stream must end when the task finishes"
+        assert events[-1][1]['status'] == "completed"
+        assert 2 < len(events) < 20, f"expected a few coalesced events, got {len(events)}"
+        print(f"[OK] 300 updates delivered as {len(events)} events")
+    finally:
+        config.SSE_MIN_INTERVAL = 0.25
+        release.set()
+        queue.stop()
+
+
+def test_dashboard_stream_reports_health():
+    """The dashboard stream sends health changes and task events"""
+    import config
+    from task_queue import TaskQueue
+    from progress_events import stream_task_events
+
+    config.SSE_MIN_INTERVAL = 0.05
+    config.SSE_KEEPALIVE_SECONDS = 0.5
+    config.SSE_MAX_STREAM_SECONDS = 1.5
+    queue = TaskQueue(num_workers=1)
+    queue.start()
+    try:
+        stream = stream_task_events(queue)
+        assert next(stream).startswith("retry:")
+        queue.submit_task("dash-1", lambda: "done")
+        events = _parse(list(stream))
+
+        kinds = {kind for kind, _ in events}
+        assert kinds == {"task", "health"}
+        assert any(data.get('completed_tasks') == 1 for kind, data in events if kind == "health")
+        print(f"[OK] Dashboard stream: {len(events)} events")
+    finally:
+        config.SSE_MIN_INTERVAL = 0.25
+        config.SSE_KEEPALIVE_SECONDS = 15
+        config.SSE_MAX_STREAM_SECONDS = 300
+        queue.stop()
+
+
+def test_stream_slots_cap_open_streams():
+    """Streams over the cap are refused until an open one closes"""
+    from progress_events import StreamSlots
+
+    slots = StreamSlots(2)
+    assert slots.acquire() and slots.acquire()
+    assert not slots.acquire(), "a third stream must be refused"
+    assert slots.rejected == 1
+
+    slots.release()
+    assert slots.acquire(), "a closed stream frees its slot"
+    assert slots.open == 2
+    print("[OK] Stream slots refuse streams over the cap")
+
+
+if __name__ == "__main__":
+    test_task_stream_is_coalesced()
+    test_dashboard_stream_reports_health()
+    test_stream_slots_cap_open_streams()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Test coalesced progress reporting with rate and ETA
+"""
+
+import sys
+import time
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+
+
+class RecordingQueue:
+    """Stands in for TaskQueue.record_progress"""
+
+    def __init__(self):
+        self.calls = []
+
+    def record_progress(self, task_id, progress, message="", rate=None, eta_seconds=None):
+        self.calls.append((progress, message, rate, eta_seconds))
+
+
+def test_updates_are_coalesced():
+    """A tight loop records only the first and last update; steps limit the rest"""
+    print("\n" + "="*70)
+    print("PROGRESS REPORTER TEST")
+    print("="*70 + "\n")
+
+    from task_queue import ProgressReporter
+
+    queue = RecordingQueue()
+    reporter = ProgressReporter("t1", queue=queue)
+    for i in range(1, 10001):
+        reporter(i, 10000)
+    assert len(queue.calls) <= 3, f"time-coalesced: {len(queue.calls)} writes"
+    assert queue.calls[-1][:2] == (100, "Sending 10000/10000")
+
+    queue = RecordingQueue()
+    reporter = ProgressReporter("t2", start_pct=10, min_interval=0, max_interval=3600, queue=queue)
+    for i in range(1, 1001):
+        reporter(i, 1000)
+    percents = [c[0] for c in queue.calls]
+    assert len(percents) == 91, "one write per 1% between 10% and 100%"
+    assert percents[0] == 10 and percents[-1] == 100
+    print(f"[OK] 10000 calls -> {len(queue.calls)} writes at 1% steps")
+
+
+def test_rate_and_eta():
+    """Rate is measured over the recorded samples and ETA follows from it"""
+    from task_queue import ProgressReporter
+
+    queue = RecordingQueue()
+    reporter = ProgressReporter("t3", min_interval=0, min_step=0, queue=queue)
+    for i in range(1, 21):
+        time.sleep(0.01)
+        reporter(i, 100)
+
+    _, _, rate, eta = queue.calls[-1]
+    assert 30 < rate < 110, f"~1 item per 10ms, got {rate:.1f}/s"
+    assert abs(eta - 80 / rate) < 1e-6
+    print(f"[OK] rate {rate:.1f}/s, ETA {eta:.1f}s")
+
+
+if __name__ == "__main__":
+    test_updates_are_coalesced()
+    test_rate_and_eta()
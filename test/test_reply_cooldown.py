@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Test the per-chat auto-reply cooldown
+"""
+
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+
+
+def test_repeated_replies_suppressed_within_window():
+    """One auto-reply per chat per window, the rest counted"""
+    print("\n" + "="*70)
+    print("REPLY COOLDOWN TEST")
+    print("="*70 + "\n")
+
+    from reply_cooldown import ReplyCooldown
+
+    cooldown = ReplyCooldown(window=60)
+    results = [cooldown.allow(1, now=t) for t in range(20)]
+    assert results == [True] + [False] * 19
+    assert cooldown.allow(2, now=5)
+    # The window has passed for chat 1, not for chat 2
+    assert cooldown.allow(1, now=61)
+    assert not cooldown.allow(2, now=61)
+
+    stats = cooldown.get_stats()
+    assert stats['replied'] == 3 and stats['suppressed'] == 20
+    assert stats['suppressed_pct'] == round(100 * 20 / 23, 1)
+    print(f"[OK] Stats: {stats}")
+
+
+def test_expired_chats_are_forgotten():
+    """Memory holds only the chats inside the window, at most max_chats"""
+    from reply_cooldown import ReplyCooldown
+
+    cooldown = ReplyCooldown(window=10, max_chats=1000)
+    for chat_id in range(500):
+        cooldown.allow(chat_id, now=chat_id * 0.1)
+    assert cooldown.get_stats()['chats_cooling_down'] == 100
+    cooldown.allow(-1, now=1000)
+    assert cooldown.get_stats()['chats_cooling_down'] == 1
+
+    capped = ReplyCooldown(window=10, max_chats=3)
+    for chat_id in range(5):
+        assert capped.allow(chat_id, now=0)
+    assert capped.get_stats()['chats_cooling_down'] == 3
+    # The oldest chats were forgotten first
+    assert capped.allow(0, now=1) and not capped.allow(4, now=1)
+    print("[OK] Expired and excess chats forgotten")
+
+
+def test_zero_window_disables_cooldown():
+    """REPLY_COOLDOWN_SECONDS=0 replies to every message"""
+    from reply_cooldown import ReplyCooldown
+
+    cooldown = ReplyCooldown(window=0)
+    assert all(cooldown.allow(1, now=0) for _ in range(5))
+    print("[OK] Disabled")
+
+
+if __name__ == "__main__":
+    test_repeated_replies_suppressed_within_window()
+    test_expired_chats_are_forgotten()
+    test_zero_window_disables_cooldown()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Test vectorized personalized row preparation
+"""
+
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+
+def test_values_match_per_cell_str():
+    """Columns convert like str() per cell, with missing values empty"""
+    print("\n" + "="*70)
+    print("VECTORIZED ROW PREPARATION TEST")
+    print("="*70 + "\n")
+
+    from excel_processor import ExcelProcessor
+
+    df = pd.DataFrame({
+        'chat_id': [' 111 ', 222, None],
+        'amount': [1.5, float('nan'), 3.0],
+        'due': pd.to_datetime(['2026-01-01', None, '2026-03-01 07:30'], format='mixed'),
+        'count': [1, 2, 3],
+    })
+    rows = ExcelProcessor.prepare_personalized_rows(df, 'chat_id', ['amount', 'due', 'count', 'missing'])
+
+    assert rows[0] == {'target': '111', 'amount': '1.5', 'due': '2026-01-01 00:00:00', 'count': '1', 'missing': ''}
+    assert rows[1]['amount'] == '' and rows[1]['due'] == ''
+    assert rows[2]['target'] == '', "missing targets are empty, not 'nan'"
+    assert rows[2]['due'] == '2026-03-01 07:30:00'
+    print(f"[OK] Prepared {len(rows)} rows: {rows[0]}")
+
+
+def test_progress_reported_per_chunk():
+    """Chunked input reports progress after each chunk"""
+    from excel_processor import ExcelProcessor
+
+    chunks = [pd.DataFrame({'chat_id': range(i, i + 10)}) for i in (0, 10, 20)]
+    calls = []
+    rows = ExcelProcessor.prepare_personalized_rows(iter(chunks), 'chat_id', [],
+                                                    progress_callback=lambda c, t: calls.append((c, t)),
+                                                    total_rows=30)
+    assert len(rows) == 30
+    assert calls == [(10, 30), (20, 30), (30, 30), (30, 30)]
+    print("[OK] Progress per chunk")
+
+
+if __name__ == "__main__":
+    test_values_match_per_cell_str()
+    test_progress_reported_per_chunk()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Test disk-spooled campaign rows
+"""
+
+import os
+import sys
+import tempfile
+import tracemalloc
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+
+def _write_csv(num_rows):
+    fd, path = tempfile.mkstemp(suffix='.csv')
+    os.close(fd)
+    pd.DataFrame({
+        'chat_id': [1000 + i if i % 10 else None for i in range(num_rows)],
+        'name': [f"User {i}" for i in range(num_rows)],
+    }).to_csv(path, index=False)
+    return path
+
+
+def test_spool_matches_in_memory_rows():
+    """Spooled rows and targets read back exactly as prepared in memory"""
+    print("\n" + "="*70)
+    print("ROW SPOOL TEST")
+    print("="*70 + "\n")
+
+    from excel_processor import load_personalized_columns
+    from row_spool import spool_rows, open_spool
+
+    path = _write_csv(2500)
+    spool_path = path + ".rows.sqlite"
+    try:
+        spooled = spool_rows(path, 'chat_id', ['name'], spool_path)
+        expected = load_personalized_columns(path, 'chat_id', ['name'])
+
+        assert len(spooled) == 2500
+        assert not os.path.exists(spool_path + ".part")
+        assert list(spooled.iter_targets()) == list(expected.iter_targets())
+
+        # Resuming reads from the position without skipping through earlier rows
+        resumed = list(open_spool(spool_path).iter_targets(2400))
+        assert resumed == list(expected.iter_targets(2400))
+        assert resumed[0][0] == {'target': '', 'name': 'User 2400'}
+        print(f"[OK] {len(spooled)} rows spooled; resumed at 2400 with {len(resumed)} left")
+    finally:
+        os.remove(path)
+        if os.path.exists(spool_path):
+            os.remove(spool_path)
+
+
+def test_iteration_memory_is_flat():
+    """Iterating a spool holds one fetch of rows, not the campaign"""
+    from row_spool import spool_rows
+
+    path = _write_csv(50000)
+    spool_path = path + ".rows.sqlite"
+    try:
+        spooled = spool_rows(path, 'chat_id', ['name'], spool_path)
+        tracemalloc.start()
+        count = sum(1 for _ in spooled.iter_targets())
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        assert count == 50000
+        assert peak < 2 * 1024 * 1024, f"peak {peak} bytes"
+        print(f"[OK] Iterated {count} rows with {peak / 1024:.0f} KiB peak")
+    finally:
+        os.remove(path)
+        os.remove(spool_path)
+
+
+def test_missing_or_partial_spool_is_ignored():
+    """Only complete spools are reused"""
+    from row_spool import open_spool
+
+    fd, path = tempfile.mkstemp(suffix='.rows.sqlite')
+    os.close(fd)
+    try:
+        assert open_spool(path) is None
+        assert open_spool(path + ".missing") is None
+        print("[OK] Unusable spools ignored")
+    finally:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    test_spool_matches_in_memory_rows()
+    test_iteration_memory_is_flat()
+    test_missing_or_partial_spool_is_ignored()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Test priority scheduling: fair-share send slots and high-priority overflow workers
+"""
+
+import sys
+import time
+import threading
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+
+
+def test_weighted_share_between_flows():
+    """A high-priority flow gets more send slots than a normal one"""
+    print("\n" + "="*70)
+    print("FAIR-SHARE SEND SCHEDULER TEST")
+    print("="*70 + "\n")
+
+    from send_scheduler import FairShareScheduler
+    from task_queue import PRIORITY_HIGH, PRIORITY_NORMAL
+
+    scheduler = FairShareScheduler(rate=200)
+    big = scheduler.open_flow("big-campaign", priority=PRIORITY_NORMAL)
+    urgent = scheduler.open_flow("urgent", priority=PRIORITY_HIGH)
+    stop = threading.Event()
+
+    def run(flow):
+        while not stop.is_set():
+            flow.wait()
+
+    threads = [threading.Thread(target=run, args=(f,), daemon=True) for f in (big, urgent)]
+    for t in threads:
+        t.start()
+    time.sleep(0.5)
+    stop.set()
+    for t in threads:
+        t.join(timeout=1)
+
+    print(f"  big: {big.sends} sends, urgent: {urgent.sends} sends")
+    assert big.sends > 0, "normal flow must not starve"
+    assert urgent.sends > 2 * big.sends, "high priority flow should get most slots"
+    assert scheduler.total_sends <= 200 * 0.5 + 5, "global rate must be respected"
+
+    big.close()
+    urgent.close()
+    assert scheduler.get_stats()['active_flows'] == 0
+    print("[OK] Slots shared by weight under the global rate")
+
+
+def test_min_interval_per_flow():
+    """A single flow is paced by its own min_interval"""
+    from send_scheduler import FairShareScheduler
+
+    scheduler = FairShareScheduler(rate=0)
+    with scheduler.open_flow("paced", min_interval=0.05) as flow:
+        start = time.monotonic()
+        for _ in range(4):
+            flow.wait()
+        elapsed = time.monotonic() - start
+    assert elapsed >= 0.14, f"expected ~0.15s, got {elapsed:.3f}s"
+    print(f"[OK] Flow paced: 4 sends in {elapsed:.2f}s")
+
+
+def test_high_priority_task_not_blocked():
+    """A high-priority task runs while every worker is busy with a long campaign"""
+    from task_queue import TaskQueue, PRIORITY_HIGH
+
+    queue = TaskQueue(num_workers=1, max_overflow_workers=1)
+    queue.start()
+    release = threading.Event()
+    try:
+        queue.submit_task("long-campaign", lambda: release.wait(5))
+        time.sleep(0.3)
+        queue.submit_task("urgent-announcement", lambda: "sent", priority=PRIORITY_HIGH)
+
+        for _ in range(30):
+            if queue.get_status("urgent-announcement").status == "completed":
+                break
+            time.sleep(0.1)
+        assert queue.get_status("urgent-announcement").status == "completed"
+        assert queue.get_status("long-campaign").status == "running"
+        print("[OK] Urgent task completed while campaign still running")
+    finally:
+        release.set()
+        queue.stop()
+
+
+if __name__ == "__main__":
+    test_weighted_share_between_flows()
+    test_min_interval_per_flow()
+    test_high_priority_task_not_blocked()
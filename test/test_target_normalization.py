@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Test lossless target ingestion and precomputed target kinds
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+
+import pytest
+
+openpyxl = pytest.importorskip("openpyxl")
+pd = pytest.importorskip("pandas")
+
+
+def test_normalize_targets():
+    """Targets are classified into chat IDs and phone lookups in one pass"""
+    print("\n" + "="*70)
+    print("TARGET NORMALIZATION TEST")
+    print("="*70 + "\n")
+
+    from excel_processor import (
+        normalize_targets, classify_target, TARGET_CHAT_ID, TARGET_PHONE, TARGET_MISSING
+    )
+
+    targets = ['201285177841', '2.01285E+11', '-1001234567', '123.0',
+               '+201001234567', '01001234567', 'Ahmed', '']
+    chat_ids, kinds = normalize_targets(targets)
+    assert chat_ids == [201285177841, 201285000000, -1001234567, 123, None, None, None, None]
+    assert kinds == [TARGET_CHAT_ID] * 4 + [TARGET_PHONE] * 3 + [TARGET_MISSING]
+
+    # Single values from plain row dicts follow the same rules
+    for target, chat_id, kind in zip(targets, chat_ids, kinds):
+        assert classify_target(target) == (kind, chat_id)
+    assert classify_target(201285177841.0) == (TARGET_CHAT_ID, 201285177841)
+    assert classify_target(None) == (TARGET_MISSING, None)
+    print(f"[OK] Kinds: {kinds}")
+
+
+def test_numeric_ids_read_losslessly():
+    """Numeric ID and phone cells keep all digits, even in columns with blanks"""
+    from excel_processor import ExcelRowStream, load_personalized_columns, TARGET_CHAT_ID
+
+    fd, path = tempfile.mkstemp(suffix='.xlsx')
+    os.close(fd)
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.append(['chat_id', 'name', 'phone', 'amount'])
+    sheet.append([201285177841.0, 'Ahmed', 201001234567.0, 12.5])
+    sheet.append([None, 'Blank', None, 100.0])
+    sheet.append([1243925693, 'Mohamed', '+201001234567', 7.25])
+    workbook.save(path)
+    try:
+        batch = load_personalized_columns(path, 'chat_id', ['name', 'phone', 'amount'])
+        assert batch.columns['target'] == ['201285177841', '', '1243925693']
+        assert batch.columns['phone'] == ['201001234567', '', '+201001234567']
+        assert batch.columns['amount'] == ['12.5', '100.0', '7.25']
+        assert batch.chat_ids == [201285177841, None, 1243925693]
+
+        streamed = list(ExcelRowStream(path, 'chat_id', ['name', 'phone', 'amount'], 3, chunk_size=2).iter_targets())
+        assert streamed == list(batch.iter_targets())
+        assert streamed[0][1:] == (TARGET_CHAT_ID, 201285177841)
+        print(f"[OK] Targets: {batch.columns['target']}")
+    finally:
+        os.remove(path)
+
+
+def test_float_dataframe_targets():
+    """Targets from a float column (pd.read_excel with blanks) lose their '.0'"""
+    from excel_processor import ExcelProcessor
+
+    df = pd.DataFrame({'chat_id': [201285177841.0, float('nan'), 5.5]})
+    batch = ExcelProcessor.prepare_personalized_columns(df, 'chat_id', [])
+    assert batch.columns['target'] == ['201285177841', '', '5.5']
+    assert batch.chat_ids == [201285177841, None, None]
+    print("[OK] Float column targets normalized")
+
+
+if __name__ == "__main__":
+    test_normalize_targets()
+    test_numeric_ids_read_losslessly()
+    test_float_dataframe_targets()
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Test per-task cancel, pause and resume
+"""
+
+import sys
+import time
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+
+import pytest
+
+
+def _wait_status(queue, task_id, status, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if queue.get_status(task_id).status == status:
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def _make_loop(queue, task_id, steps, seen):
+    """A task that checks its control token between steps, like the send loops"""
+    def loop(checkpoint=None):
+        control = queue.controls.get(task_id)
+        start = checkpoint['position'] if checkpoint else 0
+        for i in range(start, steps):
+            control.check({'position': i})
+            seen.append(i)
+            time.sleep(0.02)
+        return {'steps': len(seen)}
+    return loop
+
+
+def test_pause_frees_worker_and_resume_continues():
+    """A paused task releases its worker and resumes from its checkpoint"""
+    print("\n" + "="*70)
+    print("TASK PAUSE/RESUME TEST")
+    print("="*70 + "\n")
+
+    from task_queue import TaskQueue
+
+    queue = TaskQueue(num_workers=1)
+    queue.start()
+    seen = []
+    try:
+        queue.submit_task("campaign", _make_loop(queue, "campaign", 50, seen))
+        assert _wait_status(queue, "campaign", "running")
+        time.sleep(0.1)
+        assert queue.pause_task("campaign")
+        assert _wait_status(queue, "campaign", "paused")
+
+        # The only worker is free again
+        queue.submit_task("other", lambda: "done")
+        assert _wait_status(queue, "other", "completed")
+        paused_at = len(seen)
+        print(f"  paused after {paused_at} steps")
+
+        assert queue.resume_task("campaign")
+        assert _wait_status(queue, "campaign", "completed")
+        assert seen == list(range(50)), "resumed run must continue where it stopped"
+        print("[OK] Paused task freed its worker and resumed from checkpoint")
+    finally:
+        queue.stop()
+
+
+def test_cancel_running_and_pending():
+    """Cancel stops a running task at its next check and skips a queued one"""
+    from task_queue import TaskQueue
+
+    queue = TaskQueue(num_workers=1)
+    queue.start()
+    seen = []
+    try:
+        queue.submit_task("running", _make_loop(queue, "running", 500, seen))
+        queue.submit_task("queued", lambda: "should not run")
+        assert _wait_status(queue, "running", "running")
+
+        assert queue.cancel_task("queued")
+        assert queue.get_status("queued").status == "cancelled"
+        assert queue.cancel_task("running")
+        assert _wait_status(queue, "running", "cancelled")
+
+        status = queue.get_status("running")
+        assert status.data['position'] == len(seen) < 500
+        time.sleep(0.2)
+        assert queue.get_status("queued").data is None
+        assert queue.get_health_status()['cancelled_tasks'] == 2
+        assert not queue.cancel_task("running"), "finished tasks cannot be cancelled"
+        print(f"[OK] Cancelled after {len(seen)} steps; queued task skipped")
+    finally:
+        queue.stop()
+
+
+def test_durable_pause_resume_cancel():
+    """Durable tasks are parked with their checkpoint and claimed again on resume"""
+    mongomock = pytest.importorskip("mongomock")
+    from task_store import DurableTaskStore
+
+    store = DurableTaskStore(mongomock.MongoClient().db.tasks)
+    store.enqueue("durable-1", "noop", {"a": 1})
+    store.enqueue("durable-2", "noop", {})
+
+    doc = store.claim("worker-a")
+    assert doc["_id"] == "durable-1"
+    assert store.request_control("durable-1", "pause")
+    assert store.heartbeat("durable-1", "worker-a")["control"] == "pause"
+
+    store.park("durable-1", "worker-a", {"position": 7})
+    assert store.get("durable-1")["status"] == "paused"
+    assert store.claim("worker-b")["_id"] == "durable-2", "paused tasks are not claimed"
+
+    assert store.resume("durable-1")
+    doc = store.claim("worker-b")
+    assert doc["_id"] == "durable-1" and doc["checkpoint"] == {"position": 7}
+    assert doc["attempts"] == 1, "a pause does not use up a delivery attempt"
+
+    store.finish_cancelled("durable-1", "worker-b", {"position": 9})
+    assert store.get("durable-1")["status"] == "cancelled"
+    assert not store.cancel("durable-1")
+    print("[OK] Durable task paused, resumed and cancelled")
+
+
+def test_cancel_paused_task_runs_cleanup(tmp_path):
+    """Cancelling a paused task runs its type's cleanup hook, since the task never resumes"""
+    from task_queue import (
+        TaskQueue, TASK_TYPES, TASK_CLEANUPS, register_task_type, register_task_cleanup
+    )
+
+    upload = tmp_path / "upload.xlsx"
+    upload.write_text("rows")
+    queue = TaskQueue(num_workers=1)
+    seen = []
+
+    @register_task_type("test_cleanup_loop")
+    def cleanup_loop(task_id, file_path, checkpoint=None):
+        return _make_loop(queue, task_id, 500, seen)(checkpoint)
+
+    @register_task_cleanup("test_cleanup_loop")
+    def remove_upload(file_path, **kwargs):
+        Path(file_path).unlink()
+
+    queue.start()
+    try:
+        queue.submit_registered("upload-task", "test_cleanup_loop", {"file_path": str(upload)})
+        assert _wait_status(queue, "upload-task", "running")
+        assert queue.pause_task("upload-task")
+        assert _wait_status(queue, "upload-task", "paused")
+        assert upload.exists(), "a paused task keeps its file for resuming"
+
+        assert queue.cancel_task("upload-task")
+        assert queue.get_status("upload-task").status == "cancelled"
+        assert not upload.exists(), "cancelling a paused task must remove its file"
+        print("[OK] Paused then cancelled task cleaned up its file")
+    finally:
+        queue.stop()
+        TASK_TYPES.pop("test_cleanup_loop", None)
+        TASK_CLEANUPS.pop("test_cleanup_loop", None)
+
+
+def test_cancel_durable_paused_task_runs_cleanup(tmp_path):
+    """The cleanup hook also runs for parked tasks cancelled in the durable store"""
+    mongomock = pytest.importorskip("mongomock")
+    from task_store import DurableTaskStore
+    from task_queue import TaskQueue, TASK_CLEANUPS, register_task_cleanup
+
+    upload = tmp_path / "upload.xlsx"
+    upload.write_text("rows")
+    removed = []
+
+    @register_task_cleanup("test_durable_cleanup")
+    def remove_upload(file_path, **kwargs):
+        removed.append(file_path)
+        Path(file_path).unlink()
+
+    store = DurableTaskStore(mongomock.MongoClient().db.tasks)
+    queue = TaskQueue(num_workers=1, store=store)
+    try:
+        store.enqueue("durable-upload", "test_durable_cleanup", {"file_path": str(upload)})
+        store.claim("worker-a")
+        store.park("durable-upload", "worker-a", {"position": 3})
+
+        assert queue.cancel_task("durable-upload")
+        assert store.get("durable-upload")["status"] == "cancelled"
+        assert removed == [str(upload)] and not upload.exists()
+        print("[OK] Durable paused task cleaned up on cancel")
+    finally:
+        TASK_CLEANUPS.pop("test_durable_cleanup", None)
+
+
+if __name__ == "__main__":
+    test_pause_frees_worker_and_resume_continues()
+    test_cancel_running_and_pending()
+    test_durable_pause_resume_cancel()
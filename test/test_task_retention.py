@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Test TaskQueue result retention, status counters and recency index
+"""
+
+import sys
+import time
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+
+
+def _wait_idle(queue, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if queue.status_counts['pending'] == 0 and queue.status_counts['running'] == 0:
+            return
+        time.sleep(0.05)
+
+
+def test_max_results_evicts_oldest_finished():
+    """Only max_results results are kept; the oldest finished go first"""
+    print("\n" + "="*70)
+    print("TASK RETENTION TEST")
+    print("="*70 + "\n")
+
+    from task_queue import TaskQueue
+
+    queue = TaskQueue(num_workers=1, max_results=3, result_ttl=3600)
+    queue.start()
+    try:
+        for i in range(5):
+            queue.submit_task(f"keep-{i}", lambda: "done")
+            time.sleep(0.05)
+        _wait_idle(queue)
+        queue._prune()
+
+        assert len(queue.results) == 3
+        assert "keep-0" not in queue.results and "keep-4" in queue.results
+        assert queue.get_status("keep-0").status == "not_found"
+        print(f"[OK] Retained {len(queue.results)} of 5 results")
+    finally:
+        queue.stop()
+
+
+def test_ttl_evicts_finished():
+    """Finished results older than result_ttl are evicted"""
+    from task_queue import TaskQueue
+
+    queue = TaskQueue(num_workers=1, max_results=100, result_ttl=0)
+    queue.start()
+    try:
+        queue.submit_task("expire-me", lambda: "done")
+        _wait_idle(queue)
+        queue._prune()
+        assert "expire-me" not in queue.results
+        assert "expire-me" not in queue.submitted_tasks
+        print("[OK] Finished result expired after TTL")
+    finally:
+        queue.stop()
+
+
+def test_counters_and_recent_tasks():
+    """Status counters follow transitions and recent tasks come newest first"""
+    from task_queue import TaskQueue
+
+    queue = TaskQueue(num_workers=1)
+    queue.start()
+    try:
+        queue.submit_task("ok-1", lambda: "done")
+        queue.submit_task("bad-1", lambda: 1 / 0)
+        queue.submit_task("ok-2", lambda: "done")
+        _wait_idle(queue)
+
+        health = queue.get_health_status()
+        assert health['completed_tasks'] == 2
+        assert health['failed_tasks'] == 1
+        assert health['active_tasks'] == 0 and health['pending_tasks'] == 0
+
+        recent = [t.task_id for t in queue.recent_tasks(2)]
+        assert recent == ["ok-2", "bad-1"]
+        print(f"[OK] Counters: {dict(queue.status_counts)}")
+    finally:
+        queue.stop()
+
+
+if __name__ == "__main__":
+    test_max_results_evicts_oldest_finished()
+    test_ttl_evicts_finished()
+    test_counters_and_recent_tasks()
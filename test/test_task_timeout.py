@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Test task deadlines: cooperative abort and replacement of wedged workers
+"""
+
+import sys
+import time
+import threading
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+
+
+def _wait_status(queue, task_id, status, timeout=8):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if queue.get_status(task_id).status == status:
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def test_overdue_task_stops_at_next_check():
+    """A task past its deadline stops at its next check and keeps its partial result"""
+    print("\n" + "="*70)
+    print("TASK TIMEOUT TEST")
+    print("="*70 + "\n")
+
+    from task_queue import TaskQueue
+
+    queue = TaskQueue(num_workers=1, task_timeout=0.5, timeout_grace=30)
+    queue.start()
+    try:
+        def slow_campaign():
+            control = queue.controls.get("slow")
+            for i in range(1000):
+                control.check({'position': i})
+                time.sleep(0.02)
+
+        queue.submit_task("slow", slow_campaign)
+        assert _wait_status(queue, "slow", "failed")
+
+        status = queue.get_status("slow")
+        assert "Timed out" in status.error
+        assert 0 < status.data['position'] < 1000
+        health = queue.get_health_status()
+        assert health['timed_out_tasks'] == 1
+        assert health['replaced_workers'] == 0
+        print(f"[OK] Stopped at position {status.data['position']}: {status.error}")
+    finally:
+        queue.stop()
+
+
+def test_wedged_worker_is_replaced():
+    """A task that never checks in is failed and its worker replaced"""
+    from task_queue import TaskQueue
+
+    queue = TaskQueue(num_workers=1, timeout_grace=0.5)
+    queue.start()
+    hang = threading.Event()
+    try:
+        queue.submit_task("hung", lambda: hang.wait(30), timeout=0.2)
+        queue.submit_task("next", lambda: "done")
+        assert _wait_status(queue, "hung", "failed")
+        assert _wait_status(queue, "next", "completed"), "replacement worker must pick up queued work"
+
+        health = queue.get_health_status()
+        assert health['replaced_workers'] == 1
+        assert health['busy_workers'] == 0
+
+        # The wedged call finally returns; its outcome is ignored
+        hang.set()
+        time.sleep(0.3)
+        assert queue.get_status("hung").status == "failed"
+        assert queue.status_counts['failed'] == 1
+        print(f"[OK] Wedged worker replaced: {queue.get_status('hung').error}")
+    finally:
+        hang.set()
+        queue.stop()
+
+
+if __name__ == "__main__":
+    test_overdue_task_stops_at_next_check()
+    test_wedged_worker_is_replaced()
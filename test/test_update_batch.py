@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Test batched database work for polled update batches
+"""
+
+import sys
+import json
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+
+import pytest
+
+pytest.importorskip("telebot")
+mongomock = pytest.importorskip("mongomock")
+
+
+class CountingCollection:
+    """Users collection counting database round trips"""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.calls = []
+
+    def __getattr__(self, name):
+        attr = getattr(self.collection, name)
+        if name in ("find", "find_one", "update_one", "bulk_write"):
+            def counted(*args, **kwargs):
+                self.calls.append(name)
+                return attr(*args, **kwargs)
+            return counted
+        return attr
+
+
+@pytest.fixture
+def users(monkeypatch):
+    import pymongo
+    if "database" not in sys.modules:
+        # Importing the database module connects; no live MongoDB is needed here
+        monkeypatch.setattr(pymongo, "MongoClient", mongomock.MongoClient)
+    import bot_handler
+    from database import db
+
+    collection = CountingCollection(mongomock.MongoClient().db.users)
+    monkeypatch.setattr(db, "users_collection", collection)
+    sent = []
+    monkeypatch.setattr(bot_handler.bot, "send_message", lambda chat_id, text, **kwargs: sent.append(chat_id))
+    collection.sent = sent
+    return collection
+
+
+def _update(update_id, chat_id, text=None, contact_of=None):
+    message = {"message_id": update_id, "date": 0, "chat": {"id": chat_id, "type": "private"},
+               "from": {"id": chat_id, "is_bot": False, "first_name": f"User {chat_id}"}}
+    if contact_of is not None:
+        message["contact"] = {"phone_number": f"+20{contact_of}", "first_name": "A", "user_id": contact_of}
+    else:
+        message["text"] = text
+        if text.startswith("/"):
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text)}]
+    from telebot import types
+    return types.Update.de_json(json.dumps({"update_id": update_id, "message": message}))
+
+
+def test_burst_costs_two_round_trips(users):
+    """A burst of /start from new and registered users: one lookup, one bulk write"""
+    print("\n" + "="*70)
+    print("UPDATE BATCH TEST")
+    print("="*70 + "\n")
+
+    from bot_handler import bot, prepare_update_batch
+
+    users.collection.insert_many([{"chat_id": c, "name": "Old", "phone_number": f"+1{c}", "message_count": 3}
+                                  for c in range(100, 150)])
+    updates = [_update(i, 50 + i, "/start") for i in range(100)]
+    updates += [_update(1000, 120, "hello")]
+
+    prepare_update_batch(updates)
+    for update in updates:
+        bot.process_new_updates([update])
+
+    assert users.calls == ["find", "bulk_write"]
+    assert len(users.sent) == 101
+    assert users.collection.count_documents({}) == 100
+    registered = users.collection.find_one({"chat_id": 120})
+    assert registered["last_activity_type"] == "message" and registered["message_count"] == 4
+    assert users.collection.find_one({"chat_id": 110})["last_activity_type"] == "start"
+    new_user = users.collection.find_one({"chat_id": 50})
+    # New users were asked for their phone, which counts as a message
+    assert new_user["phone_number"] is None and new_user["message_count"] == 1
+    print(f"[OK] 101 updates, database calls: {users.calls}")
+
+
+def test_contact_unlocks_later_messages_in_batch(users):
+    """A shared contact counts for the sender's later messages in the same batch"""
+    from bot_handler import bot, prepare_update_batch
+
+    updates = [_update(1, 7, contact_of=7), _update(2, 7, "hi"), _update(3, 8, contact_of=9), _update(4, 8, "hi")]
+    prepare_update_batch(updates)
+    assert [u.message.batch_has_phone for u in updates] == [False, True, False, False]
+    for update in updates:
+        bot.process_new_updates([update])
+
+    user = users.collection.find_one({"chat_id": 7})
+    assert user["phone_number"] == "+207" and user["message_count"] == 1
+    assert users.collection.find_one({"chat_id": 8})["phone_number"] is None
+    print("[OK] Contact applied within the batch")
+
+
+def test_unbatched_updates_query_per_message(users):
+    """Updates that skipped the batch stage (webhook) are handled as before"""
+    from bot_handler import bot
+
+    bot.process_new_updates([_update(1, 5, "/start")])
+    assert users.calls == ["find_one", "update_one"]
+    assert users.collection.find_one({"chat_id": 5})["message_count"] == 1
+    print("[OK] Per-message fallback")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-q", "-s"])
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Test the per-chat update dispatcher: ordering, parallelism and backpressure
+"""
+
+import sys
+import threading
+import time
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+
+import pytest
+
+pytest.importorskip("telebot")
+
+
+def _update(update_id, chat_id=1):
+    from telebot import types
+    return types.Update.de_json(
+        '{"update_id": %d, "message": {"message_id": %d, "date": 0, "text": "hi",'
+        ' "chat": {"id": %d, "type": "private"}, "from": {"id": %d, "is_bot": false, "first_name": "A"}}}'
+        % (update_id, update_id, chat_id, chat_id)
+    )
+
+
+def test_updates_of_a_chat_stay_in_order():
+    """Each chat's updates are handled in arrival order, failures counted"""
+    print("\n" + "="*70)
+    print("UPDATE DISPATCHER TEST")
+    print("="*70 + "\n")
+
+    from update_dispatcher import UpdateDispatcher
+
+    handled = {}
+    lock = threading.Lock()
+    done = threading.Event()
+
+    def handler(updates):
+        update = updates[0]
+        # Uneven handler times would reorder updates on a shared pool
+        time.sleep(0.002 * (update.update_id % 3))
+        with lock:
+            handled.setdefault(update.message.chat.id, []).append(update.update_id)
+            if sum(map(len, handled.values())) == 60:
+                done.set()
+        if update.update_id == 5:
+            raise RuntimeError("handler failed")
+
+    dispatcher = UpdateDispatcher(handler, lanes=3, queue_size=100)
+    dispatcher.start()
+    try:
+        for i in range(60):
+            assert dispatcher.dispatch(_update(i, chat_id=100 + i % 6))
+        assert done.wait(5)
+        time.sleep(0.1)
+        for chat_id, update_ids in handled.items():
+            assert update_ids == sorted(update_ids), chat_id
+        stats = dispatcher.get_stats()
+        assert stats['processed'] == 59 and stats['failed'] == 1
+        assert [lane['processed'] + lane['failed'] for lane in stats['per_lane']] == [20, 20, 20]
+        print(f"[OK] Per-lane: {[(l['lane'], l['processed'], l['avg_latency_ms']) for l in stats['per_lane']]}")
+    finally:
+        dispatcher.stop()
+
+
+def test_slow_chat_does_not_block_other_lanes():
+    """A stuck handler only holds up its own lane"""
+    from update_dispatcher import UpdateDispatcher
+
+    release = threading.Event()
+    fast_done = threading.Event()
+
+    def handler(updates):
+        chat_id = updates[0].message.chat.id
+        if chat_id == 0:
+            release.wait(5)
+        else:
+            fast_done.set()
+
+    dispatcher = UpdateDispatcher(handler, lanes=2, queue_size=10)
+    dispatcher.start()
+    try:
+        dispatcher.dispatch(_update(1, chat_id=0))
+        dispatcher.dispatch(_update(2, chat_id=1))
+        assert fast_done.wait(2)
+        print("[OK] Other lane kept processing")
+    finally:
+        release.set()
+        dispatcher.stop()
+
+
+def test_full_lane_refuses_without_blocking():
+    """block=False refuses updates for a full lane and counts them"""
+    from update_dispatcher import UpdateDispatcher
+
+    release = threading.Event()
+    started = threading.Event()
+
+    def handler(updates):
+        started.set()
+        release.wait(5)
+
+    dispatcher = UpdateDispatcher(handler, lanes=2, queue_size=2)
+    dispatcher.start()
+    try:
+        assert dispatcher.dispatch(_update(0, chat_id=2), block=False)
+        assert started.wait(2)
+        results = [dispatcher.dispatch(_update(i, chat_id=2), block=False) for i in range(1, 6)]
+        # One update is being handled, two wait, the rest are refused
+        assert results == [True, True, False, False, False]
+        # The other lane still has room
+        assert dispatcher.dispatch(_update(10, chat_id=3), block=False)
+        stats = dispatcher.get_stats()
+        assert stats['rejected'] == 3 and stats['per_lane'][0]['rejected'] == 3
+        assert not dispatcher.dispatch(_update(11, chat_id=2), timeout=0.05)
+        print("[OK] Refused 3 of 6 updates")
+    finally:
+        release.set()
+        dispatcher.stop()
+
+
+def test_update_chat_id():
+    """Updates are keyed by chat, queries without a chat by their sender"""
+    from telebot import types
+    from update_dispatcher import update_chat_id
+
+    assert update_chat_id(_update(1, chat_id=-1005)) == -1005
+    inline = types.Update.de_json(
+        '{"update_id": 2, "inline_query": {"id": "q", "query": "", "offset": "",'
+        ' "from": {"id": 77, "is_bot": false, "first_name": "A"}}}'
+    )
+    assert update_chat_id(inline) == 77
+    print("[OK] Chat IDs extracted")
+
+
+if __name__ == "__main__":
+    test_updates_of_a_chat_stay_in_order()
+    test_slow_chat_does_not_block_other_lanes()
+    test_full_lane_refuses_without_blocking()
+    test_update_chat_id()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Test bounded Excel previews and the parse-once upload cache
+"""
+
+import os
+import sys
+import time
+import tempfile
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+
+import pytest
+
+openpyxl = pytest.importorskip("openpyxl")
+pytest.importorskip("pandas")
+
+
+def _write_workbook(num_rows, path=None):
+    if path is None:
+        fd, path = tempfile.mkstemp(suffix='.xlsx')
+        os.close(fd)
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.append(['chat_id', 'name', None])
+    for i in range(num_rows):
+        sheet.append([1000 + i, f"User {i}", None])
+    workbook.save(path)
+    return path
+
+
+def test_preview_reads_only_first_rows():
+    """Preview returns the header, a few rows and a row count without parsing the sheet"""
+    print("\n" + "="*70)
+    print("BOUNDED PREVIEW TEST")
+    print("="*70 + "\n")
+
+    from excel_processor import ExcelProcessor
+
+    path = _write_workbook(20000)
+    try:
+        start = time.perf_counter()
+        preview = ExcelProcessor.get_excel_preview(path)
+        elapsed = time.perf_counter() - start
+
+        assert preview['columns'] == ['chat_id', 'name', 'Unnamed: 2']
+        assert preview['sample_data'] == {'chat_id': '1000', 'name': 'User 0', 'Unnamed: 2': '[empty]'}
+        assert len(preview['sample_rows']) == 5
+        assert preview['row_count'] == 20000
+        print(f"[OK] Previewed 20000-row file in {elapsed * 1000:.1f} ms")
+    finally:
+        os.remove(path)
+
+
+def test_cache_reuses_parse_until_file_changes():
+    """Cached previews and rows are returned until the file's content changes"""
+    from excel_processor import ExcelProcessor, UploadCache, load_personalized_columns
+
+    path = _write_workbook(10)
+    cache = UploadCache(max_entries=2, max_rows=100)
+    try:
+        preview = ExcelProcessor.get_excel_preview(path)
+        cache.put_preview(path, preview)
+        assert cache.get_preview(path) is preview
+
+        assert cache.get_rows(path, 'chat_id', ['name']) is None
+        batch = load_personalized_columns(path, 'chat_id', ['name'])
+        cache.put_rows(path, 'chat_id', ['name'], batch)
+        assert cache.get_rows(path, 'chat_id', ['name']) is batch
+        assert cache.get_rows(path, 'name', []) is None, "other column mappings are separate"
+
+        # Same path, new content
+        _write_workbook(3, path)
+        assert cache.get_preview(path) is None
+        print(f"[OK] Cache hits {cache.hits}, misses {cache.misses}")
+    finally:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    test_preview_reads_only_first_rows()
+    test_cache_reuses_parse_until_file_changes()
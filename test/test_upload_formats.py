@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Test CSV, TSV and Parquet uploads produce the same rows as .xlsx
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+
+import pytest
+
+openpyxl = pytest.importorskip("openpyxl")
+pd = pytest.importorskip("pandas")
+
+HEADER = ['chat_id', 'name', 'phone']
+ROWS = [[201285177841, 'Ahmed', '+201001234567'],
+        [None, 'Blank', None],
+        [1243925693, 'Mohamed, Jr.', '01001234567']]
+
+
+def _temp_path(suffix):
+    fd, path = tempfile.mkstemp(suffix=suffix)
+    os.close(fd)
+    return path
+
+
+def _write(suffix):
+    path = _temp_path(suffix)
+    if suffix == '.xlsx':
+        workbook = openpyxl.Workbook()
+        workbook.active.append(HEADER)
+        for row in ROWS:
+            workbook.active.append(row)
+        workbook.save(path)
+    else:
+        df = pd.DataFrame(ROWS, columns=HEADER)
+        if suffix == '.parquet':
+            df.to_parquet(path, index=False)
+        else:
+            df.to_csv(path, sep='\t' if suffix == '.tsv' else ',', index=False)
+    return path
+
+
+@pytest.mark.parametrize("suffix", ['.csv', '.tsv', '.parquet'])
+def test_formats_match_xlsx(suffix):
+    """Every format previews, counts and prepares the same rows"""
+    print("\n" + "="*70)
+    print(f"UPLOAD FORMAT TEST ({suffix})")
+    print("="*70 + "\n")
+
+    if suffix == '.parquet':
+        pytest.importorskip("pyarrow")
+    from excel_processor import ExcelProcessor, ExcelRowStream, count_excel_rows, load_personalized_columns
+
+    expected_path = _write('.xlsx')
+    path = _write(suffix)
+    try:
+        preview = ExcelProcessor.get_excel_preview(path)
+        assert preview['columns'] == HEADER
+        assert preview['row_count'] == 3 == count_excel_rows(path)
+        assert preview['sample_rows'][1]['phone'] == '[empty]'
+
+        expected = load_personalized_columns(expected_path, 'chat_id', ['name', 'phone'])
+        batch = load_personalized_columns(path, 'chat_id', ['name', 'phone'])
+        assert batch.columns == expected.columns
+        assert batch.chat_ids == expected.chat_ids == [201285177841, None, 1243925693]
+
+        streamed = ExcelRowStream(path, 'chat_id', ['name', 'phone'], 3, chunk_size=2)
+        assert list(streamed) == expected.rows()
+        print(f"[OK] {suffix} rows: {batch.columns['target']}")
+    finally:
+        os.remove(path)
+        os.remove(expected_path)
+
+
+def test_unsupported_extension():
+    """Other file types are rejected with a clear error"""
+    from excel_processor import ExcelProcessor, upload_format
+
+    path = _temp_path('.xls')
+    try:
+        assert 'Unsupported file type' in ExcelProcessor.get_excel_preview(path)['error']
+        with pytest.raises(ValueError):
+            upload_format(path)
+        print("[OK] .xls rejected")
+    finally:
+        os.remove(path)
+
+
+def test_non_utf8_csv():
+    """Windows-1256 CSVs from Excel are read; undecodable text is a clear error"""
+    from excel_processor import ExcelProcessor, load_personalized_columns
+
+    path = _temp_path('.csv')
+    try:
+        with open(path, 'w', encoding='cp1256', newline='') as f:
+            f.write("chat_id,name\n201285177841,أحمد\n")
+        assert ExcelProcessor.get_excel_preview(path)['sample_rows'][0]['name'] == "أحمد"
+        batch = load_personalized_columns(path, 'chat_id', ['name'])
+        assert batch.columns['name'] == ["أحمد"]
+
+        # UTF-8 where the encoding is picked, invalid further into the file
+        with open(path, 'wb') as f:
+            f.write(b"chat_id,name\n" + b"1,a\n" * 300000 + b"2,\xff\xfe\n")
+        with pytest.raises(ValueError, match="not valid utf-8-sig text"):
+            load_personalized_columns(path, 'chat_id', ['name'])
+        print("[OK] cp1256 CSV read; undecodable CSV reported clearly")
+    finally:
+        os.remove(path)
+
+
+def test_large_csv_preview_estimates_row_count():
+    """A large CSV's preview counts a prefix and extrapolates instead of reading it through"""
+    from excel_processor import ExcelProcessor, DELIMITED_SCAN_BYTES, count_excel_rows
+
+    path = _temp_path('.csv')
+    try:
+        num_rows = 400000
+        with open(path, 'w', newline='') as f:
+            f.write("chat_id,name\n")
+            f.writelines(f"{201000000000 + i},Student {i:06d}\n" for i in range(num_rows))
+        assert os.path.getsize(path) > 5 * DELIMITED_SCAN_BYTES
+
+        preview = ExcelProcessor.get_excel_preview(path)
+        assert preview['row_count_estimated']
+        assert abs(preview['row_count'] - num_rows) < num_rows * 0.02
+        assert count_excel_rows(path) == num_rows
+        print(f"[OK] Estimated {preview['row_count']} of {num_rows} rows")
+
+        os.remove(path)
+        path = _write('.csv')
+        small = ExcelProcessor.get_excel_preview(path)
+        assert small['row_count'] == 3 and not small['row_count_estimated']
+    finally:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    for suffix in ('.csv', '.tsv', '.parquet'):
+        test_formats_match_xlsx(suffix)
+    test_unsupported_extension()
+    test_non_utf8_csv()
+    test_large_csv_preview_estimates_row_count()
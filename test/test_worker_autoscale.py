@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Test the autoscaling worker pool: growth under queue depth and idle shrink
+"""
+
+import sys
+import time
+import threading
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+
+
+def _wait_for(condition, timeout=8):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def test_pool_grows_and_shrinks():
+    """Waiting tasks start extra workers up to max_workers; idle extras exit"""
+    print("\n" + "="*70)
+    print("WORKER AUTOSCALE TEST")
+    print("="*70 + "\n")
+
+    from task_queue import TaskQueue
+
+    queue = TaskQueue(num_workers=1, max_workers=3, worker_idle_timeout=0.5)
+    queue.start()
+    release = threading.Event()
+    try:
+        for i in range(4):
+            queue.submit_task(f"job-{i}", lambda: release.wait(10))
+
+        assert _wait_for(lambda: queue.status_counts['running'] == 3), "pool must grow to max_workers"
+        health = queue.get_health_status()
+        assert health['workers'] == 3
+        assert health['scale_ups'] == 2
+        assert health['utilization'] == 1.0
+        assert queue.status_counts['pending'] == 1, "growth must stop at max_workers"
+        print(f"[OK] Grew to {health['workers']} workers with {health['queue_depth']} task waiting")
+
+        release.set()
+        assert _wait_for(lambda: queue.status_counts['completed'] == 4)
+        assert _wait_for(lambda: queue.get_health_status()['workers'] == 1), "idle extras must exit"
+        health = queue.get_health_status()
+        assert health['scale_downs'] == 2
+        print(f"[OK] Shrank back to {health['workers']} worker")
+    finally:
+        release.set()
+        queue.stop()
+
+
+def test_fixed_pool_does_not_scale():
+    """Without max_workers the pool keeps num_workers"""
+    from task_queue import TaskQueue
+
+    queue = TaskQueue(num_workers=1)
+    queue.start()
+    release = threading.Event()
+    try:
+        queue.submit_task("a", lambda: release.wait(10))
+        queue.submit_task("b", lambda: release.wait(10))
+        time.sleep(1.5)
+        assert queue.status_counts['running'] == 1
+        assert queue.get_health_status()['scale_ups'] == 0
+        print("[OK] Fixed-size pool unchanged")
+    finally:
+        release.set()
+        queue.stop()
+
+
+if __name__ == "__main__":
+    test_pool_grows_and_shrinks()
+    test_fixed_pool_does_not_scale()
@@ -0,0 +1,198 @@
+"""
+Per-chat ordered dispatch of bot updates
+Updates are sharded by chat ID onto single-threaded lanes: each chat's
+updates are handled in arrival order, different chats run in parallel,
+and the number of lanes caps concurrent handler (and database) work
+"""
+import logging
+import queue
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger("telegram_app.dispatcher")
+
+# Update fields whose object carries the chat (or, for queries, the user)
+CHAT_FIELDS = ("message", "edited_message", "channel_post", "edited_channel_post",
+               "my_chat_member", "chat_member", "chat_join_request")
+USER_FIELDS = ("callback_query", "inline_query", "chosen_inline_result",
+               "shipping_query", "pre_checkout_query", "poll_answer")
+
+# Weight of the newest sample in the per-lane latency average
+LATENCY_ALPHA = 0.1
+
+# Global dispatcher instance
+_update_dispatcher = None
+
+
+def update_chat_id(update) -> Optional[int]:
+    """
+    Chat an update belongs to, used as its ordering key
+
+    Queries without a chat (inline queries, poll answers) are keyed by the
+    user who sent them. Returns None for updates with neither.
+    """
+    for field in CHAT_FIELDS:
+        obj = getattr(update, field, None)
+        if obj is not None and getattr(obj, 'chat', None) is not None:
+            return obj.chat.id
+    for field in USER_FIELDS:
+        obj = getattr(update, field, None)
+        if obj is None:
+            continue
+        message = getattr(obj, 'message', None)
+        if message is not None and getattr(message, 'chat', None) is not None:
+            return message.chat.id
+        user = getattr(obj, 'from_user', None) or getattr(obj, 'user', None)
+        if user is not None:
+            return user.id
+    return None
+
+
+class _Lane:
+    """One single-threaded lane with its bounded queue and metrics"""
+
+    def __init__(self, index: int, queue_size: int):
+        self.index = index
+        self.queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self.thread: Optional[threading.Thread] = None
+        self.processed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.max_depth = 0
+        self.avg_latency = 0.0  # Seconds from dispatch to handled (EWMA)
+        self.busy_since: Optional[float] = None
+
+    def stats(self) -> Dict:
+        busy_since = self.busy_since
+        return {
+            'lane': self.index,
+            'queued': self.queue.qsize(),
+            'max_queued': self.max_depth,
+            'processed': self.processed,
+            'failed': self.failed,
+            'rejected': self.rejected,
+            'avg_latency_ms': round(self.avg_latency * 1000, 1),
+            'busy_seconds': round(time.monotonic() - busy_since, 1) if busy_since else 0,
+        }
+
+
+class UpdateDispatcher:
+    """
+    Shards updates by chat ID onto single-threaded lanes
+
+    A slow handler (e.g. a slow Mongo write) only delays later updates of
+    chats on the same lane. Lane queues are bounded: dispatch() blocks when
+    the lane is full, which slows the polling loop down, or with
+    block=False refuses the update so the webhook route can answer 503.
+    """
+
+    def __init__(self, handler: Callable[[List], None], lanes: int = 4, queue_size: int = 250):
+        """
+        Initialize dispatcher
+
+        Args:
+            handler: Called with a list of one update (bot.process_new_updates)
+            lanes: Lane threads (maximum concurrently running handlers)
+            queue_size: Updates waiting per lane
+        """
+        self.handler = handler
+        self.lanes = [_Lane(i, queue_size) for i in range(max(1, lanes))]
+        self.running = False
+        self._next_lane = 0
+
+    def start(self):
+        """Start lane threads"""
+        if self.running:
+            return
+        self.running = True
+        for lane in self.lanes:
+            lane.thread = threading.Thread(target=self._lane_loop, args=(lane,), daemon=True,
+                                           name=f"UpdateLane-{lane.index}")
+            lane.thread.start()
+        logger.info(f"Update dispatcher started with {len(self.lanes)} lanes")
+
+    def stop(self, timeout: float = 5):
+        """Stop lane threads after their queued updates"""
+        self.running = False
+        for lane in self.lanes:
+            lane.queue.put(None)
+        for lane in self.lanes:
+            if lane.thread is not None:
+                lane.thread.join(timeout=timeout)
+                lane.thread = None
+
+    def lane_for(self, update) -> _Lane:
+        """Lane of an update's chat; updates without a chat are spread round-robin"""
+        chat_id = update_chat_id(update)
+        if chat_id is None:
+            self._next_lane = (self._next_lane + 1) % len(self.lanes)
+            return self.lanes[self._next_lane]
+        return self.lanes[chat_id % len(self.lanes)]
+
+    def dispatch(self, update, block: bool = True, timeout: Optional[float] = None) -> bool:
+        """
+        Queue an update on its chat's lane
+
+        Args:
+            update: telebot Update
+            block: Wait for room when the lane is full
+            timeout: Longest wait when blocking (None = no limit)
+
+        Returns:
+            False if the lane was full and the update was refused
+        """
+        lane = self.lane_for(update)
+        try:
+            lane.queue.put((update, time.monotonic()), block=block, timeout=timeout)
+        except queue.Full:
+            lane.rejected += 1
+            logger.warning(f"Update lane {lane.index} full; refused update {update.update_id}")
+            return False
+        lane.max_depth = max(lane.max_depth, lane.queue.qsize())
+        return True
+
+    def _lane_loop(self, lane: _Lane):
+        while True:
+            item = lane.queue.get()
+            if item is None:
+                return
+            update, queued_at = item
+            lane.busy_since = time.monotonic()
+            try:
+                self.handler([update])
+                lane.processed += 1
+            except Exception as e:
+                lane.failed += 1
+                logger.exception(f"Error processing update {update.update_id} on lane {lane.index}: {e}")
+            finally:
+                latency = time.monotonic() - queued_at
+                lane.avg_latency += LATENCY_ALPHA * (latency - lane.avg_latency)
+                lane.busy_since = None
+
+    def get_stats(self) -> Dict:
+        """Get dispatcher statistics with per-lane metrics"""
+        lanes = [lane.stats() for lane in self.lanes]
+        return {
+            'lanes': len(lanes),
+            'queued': sum(l['queued'] for l in lanes),
+            'processed': sum(l['processed'] for l in lanes),
+            'failed': sum(l['failed'] for l in lanes),
+            'rejected': sum(l['rejected'] for l in lanes),
+            'per_lane': lanes,
+        }
+
+
+def get_update_dispatcher() -> UpdateDispatcher:
+    """Get or create the global update dispatcher"""
+    global _update_dispatcher
+    if _update_dispatcher is None:
+        import config
+        from bot_handler import bot
+        _update_dispatcher = UpdateDispatcher(
+            bot.process_new_updates,
+            lanes=config.UPDATE_LANES,
+            queue_size=config.UPDATE_LANE_QUEUE_SIZE
+        )
+        _update_dispatcher.start()
+    return _update_dispatcher
@@ -0,0 +1,59 @@
+"""
+Benchmark campaign upload ingestion
+Times load_personalized_columns on the same recipient list saved as
+.xlsx, .csv and .parquet (Parquet only when pyarrow is installed)
+"""
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from excel_processor import load_personalized_columns
+
+NUM_ROWS = 50_000
+
+
+def make_frame(num_rows):
+    """Recipient list: chat IDs, names, phones and amounts"""
+    return pd.DataFrame({
+        'chat_id': [201000000000 + i for i in range(num_rows)],
+        'name': [f"Student {i}" for i in range(num_rows)],
+        'phone': [f"+2010{i:08d}" for i in range(num_rows)],
+        'amount': [i % 1000 + 0.5 for i in range(num_rows)],
+    })
+
+
+def main():
+    df = make_frame(NUM_ROWS)
+    workdir = tempfile.mkdtemp()
+    writers = {
+        '.xlsx': lambda path: df.to_excel(path, index=False),
+        '.csv': lambda path: df.to_csv(path, index=False),
+        '.parquet': lambda path: df.to_parquet(path, index=False),
+    }
+    
+    timings = {}
+    for suffix, write in writers.items():
+        path = os.path.join(workdir, f"recipients{suffix}")
+        try:
+            write(path)
+        except ImportError as e:
+            print(f"{suffix:>9}: skipped ({e})")
+            continue
+        start = time.perf_counter()
+        batch = load_personalized_columns(path, 'chat_id', ['name', 'phone', 'amount'])
+        timings[suffix] = time.perf_counter() - start
+        assert len(batch) == NUM_ROWS
+        os.remove(path)
+    os.rmdir(workdir)
+    
+    print(f"{NUM_ROWS} rows")
+    for suffix, elapsed in timings.items():
+        print(f"{suffix:>9}: {elapsed:6.2f}s  ({timings['.xlsx'] / elapsed:4.1f}x vs .xlsx)")
+
+
+if __name__ == "__main__":
+    main()
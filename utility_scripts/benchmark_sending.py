@@ -0,0 +1,51 @@
+"""
+Benchmark campaign sending against the local fake Bot API
+Sends a chat-ID campaign through message_sender with fake_telegram_api.py
+standing in for api.telegram.org, so send-path changes can be compared
+offline with the same latency and error mix. Needs MongoDB like the app.
+
+    python utility_scripts/benchmark_sending.py --messages 2000 --latency-ms 40 --flood-rate 30
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from fake_telegram_api import FakeTelegramAPI, LatencyModel, LATENCY_DISTRIBUTIONS
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark message_sender against a fake Bot API")
+    parser.add_argument("--messages", type=int, default=1000)
+    parser.add_argument("--delay", type=float, default=0, help="Delay between sends (SEND_DELAY)")
+    parser.add_argument("--latency", choices=LATENCY_DISTRIBUTIONS, default="normal")
+    parser.add_argument("--latency-ms", type=float, default=40)
+    parser.add_argument("--jitter-ms", type=float, default=10)
+    parser.add_argument("--flood-rate", type=float, default=0, help="Sends per second before 429 (0 = unlimited)")
+    parser.add_argument("--blocked-ratio", type=float, default=0.02)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    api = FakeTelegramAPI(
+        latency=LatencyModel(args.latency, args.latency_ms, args.jitter_ms, seed=args.seed),
+        flood_rate=args.flood_rate, blocked_ratio=args.blocked_ratio, seed=args.seed
+    ).start()
+    # Must be set before bot_handler is imported
+    os.environ["TELEGRAM_API_URL"] = api.url
+    from message_sender import send_personalized_from_template_optimized
+
+    rows = [{"target": str(201000000000 + i), "name": f"Student {i}"} for i in range(args.messages)]
+    start = time.perf_counter()
+    result = send_personalized_from_template_optimized("Hello {name}", rows, delay=args.delay)
+    elapsed = time.perf_counter() - start
+    stats = api.get_stats()
+    api.stop()
+
+    print(f"{args.messages} messages in {elapsed:.2f}s ({args.messages / elapsed:.1f} msg/s)")
+    print(f"  sent: {result['sent']}  failed: {result['failed']}")
+    print(f"  server responses: {stats['responses']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+"""
+Standalone worker process for the durable task queue
+Claims and runs campaign tasks from MongoDB without serving the web dashboard
+"""
+import time
+import logging
+import config
+from config import LOG_FILE, LOG_LEVEL
+from task_queue import get_task_queue
+import campaign_tasks  # Registers durable task types
+
+logging.basicConfig(
+    filename=LOG_FILE,
+    level=getattr(logging, LOG_LEVEL),
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger("worker")
+
+
+def main():
+    """Run task queue workers until interrupted"""
+    if not config.TASK_QUEUE_DURABLE:
+        logger.error("TASK_QUEUE_DURABLE is disabled - a standalone worker has nothing to claim")
+        return
+
+    queue = get_task_queue()
+    logger.info(f"Worker process started ({queue.worker_prefix})")
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        queue.stop()
+
+
+if __name__ == "__main__":
+    main()